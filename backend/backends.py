@@ -0,0 +1,191 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from rate_limit import RateLimitExceeded, RateLimitScheduler, is_retryable_error
+
+T = TypeVar("T")
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def is_local_rejection(error: Exception) -> bool:
+    """Whether our own rate limiter refused the call before it reached the backend."""
+    # A RateLimitExceeded raised after an upstream 429 carries that error as its cause
+    return isinstance(error, RateLimitExceeded) and error.__cause__ is None
+
+
+def counts_against_backend(error: Exception) -> bool:
+    """Upstream outcomes that say something about the backend's health: 429s, 5xx and connection errors."""
+    if isinstance(error, RateLimitExceeded):
+        return not is_local_rejection(error)
+    return is_retryable_error(error)
+
+
+class Backend:
+    """One Azure endpoint/deployment with its own client, quota scheduler, circuit breaker and stats."""
+
+    def __init__(
+        self,
+        name: str,
+        client: Any,
+        deployment: str,
+        weight: float = 1.0,
+        scheduler: Optional[RateLimitScheduler] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.name = name
+        self.client = client
+        self.deployment = deployment
+        self.weight = weight
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.breaker = breaker or CircuitBreaker()
+        self.outstanding = 0
+        # Finished calls; calls cancelled mid-flight (losing hedges) are counted apart
+        self.requests = 0
+        self.errors = 0
+        self.cancelled = 0
+        self._latencies: Deque[float] = deque(maxlen=1000)
+
+    @property
+    def healthy(self) -> bool:
+        return self.breaker.state == CircuitBreaker.CLOSED
+
+    def record(self, success: bool, latency: float) -> None:
+        self.requests += 1
+        if not success:
+            self.errors += 1
+        self._latencies.append(latency)
+        self.breaker.record(success, latency)
+
+    def stats_dict(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+        stats = {
+            "deployment": self.deployment,
+            "weight": self.weight,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "error_rate": self.errors / self.requests if self.requests else 0.0,
+            "headroom": self.scheduler.headroom(),
+            "rate_limit": self.scheduler.stats.to_dict(),
+            "circuit": self.breaker.stats_dict(),
+        }
+        if latencies:
+            stats["latency_ms"] = {
+                "mean": 1000 * sum(latencies) / len(latencies),
+                "p50": 1000 * _percentile(latencies, 0.50),
+                "p95": 1000 * _percentile(latencies, 0.95),
+                "p99": 1000 * _percentile(latencies, 0.99),
+            }
+        return stats
+
+
+class BackendPool:
+    """
+    Route upstream calls across several backends.
+
+    ``least_outstanding`` picks the backend with the fewest in-flight
+    requests per unit of weight; ``remaining_quota`` picks the one with the
+    most rate-limit headroom. Backends whose circuit breaker is open are
+    skipped, a call that fails on one backend for a health-related reason
+    is retried on the next, and when every circuit is open the call fails
+    fast with CircuitOpenError instead of waiting on a degraded upstream.
+    """
+
+    STRATEGIES = ("least_outstanding", "remaining_quota")
+
+    def __init__(
+        self,
+        backends: Iterable[Backend],
+        strategy: str = "least_outstanding",
+    ):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown routing strategy: {strategy}")
+        self.backends = list(backends)
+        if not self.backends:
+            raise ValueError("BackendPool needs at least one backend")
+        self.strategy = strategy
+
+    def __len__(self) -> int:
+        return len(self.backends)
+
+    def _score(self, backend: Backend) -> Tuple[float, float, float]:
+        headroom = backend.scheduler.headroom()
+        load = (backend.outstanding + 1) / backend.weight
+        if self.strategy == "remaining_quota":
+            return (-headroom * backend.weight, load, random.random())
+        # Backends paused by a 429 go last even when idle
+        return (headroom <= 0, load, random.random())
+
+    def select(self, exclude: Iterable[str] = ()) -> Optional[Backend]:
+        """Pick the best backend not in ``exclude`` whose circuit lets a call through."""
+        excluded = set(exclude)
+        candidates = [b for b in self.backends if b.name not in excluded and b.breaker.available()]
+        if not candidates:
+            return None
+        return min(candidates, key=self._score)
+
+    def retry_after(self) -> float:
+        """Seconds until the first open circuit allows a probe."""
+        return min(backend.breaker.retry_after() for backend in self.backends)
+
+    async def call(
+        self,
+        fn: Callable[[Backend], Awaitable[T]],
+        estimated_tokens: int = 0,
+        exclude: Iterable[str] = (),
+    ) -> Tuple[Backend, T]:
+        """Run ``fn(backend)`` on the selected backend, failing over on backend errors."""
+        tried = set(exclude)
+        last_error: Optional[Exception] = None
+        while True:
+            backend = self.select(exclude=tried)
+            if backend is None:
+                if last_error is not None:
+                    raise last_error
+                raise CircuitOpenError(self.retry_after())
+            tried.add(backend.name)
+            # Fail over at once while other backends remain; retry in place on the last one
+            last_resort = self.select(exclude=tried) is None
+            backend.breaker.before_call()
+            backend.outstanding += 1
+            started = time.monotonic()
+            success = None
+            try:
+                result = await backend.scheduler.run(lambda: fn(backend), estimated_tokens, retry=last_resort)
+                success = True
+            except asyncio.CancelledError:
+                backend.cancelled += 1
+                raise
+            except Exception as e:
+                last_error = e
+                if is_local_rejection(e):
+                    # This backend's budget is spent; the backend itself was never called
+                    continue
+                # A rejected request still means the backend answered
+                success = not counts_against_backend(e)
+                if success:
+                    raise
+                continue
+            finally:
+                backend.outstanding -= 1
+                if success is None:
+                    # Cancelled (e.g. a losing hedge) or refused locally: no verdict on the backend
+                    backend.breaker.release()
+                else:
+                    backend.record(success, time.monotonic() - started)
+            return backend, result
+
+    def stats_dict(self) -> Dict[str, Any]:
+        return {
+            "strategy": self.strategy,
+            "backends": {backend.name: backend.stats_dict() for backend in self.backends},
+        }
@@ -0,0 +1,171 @@
+"""
+Local stand-in for the Azure OpenAI chat-completions API, for load tests.
+
+    python benchmarks/fake_azure.py --port 9100 --latency 0.4 --tokens-per-second 80 --rate-limit-rate 0.02
+
+Serves POST /openai/deployments/{deployment}/chat/completions, both plain
+and streamed (SSE), with a configurable time to first token, token rate,
+response size (number of thought steps) and share of 429 responses. The
+content follows the COT prompt format, or the structured-output JSON when
+a json_schema response_format is requested.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+
+@dataclass
+class FakeAzureConfig:
+    latency: float = 0.3
+    tokens_per_second: float = 100.0
+    steps: int = 3
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    # Streamed tokens are sent in bursts so sleeping does not dominate the server's own cost
+    stream_burst: int = 8
+
+
+def _steps(count: int) -> List[Dict]:
+    return [
+        {
+            "thought": f"Step {index + 1}: consider the next part of the problem in some detail.",
+            "supporting_facts": [f"fact {index}.{fact}" for fact in range(3)],
+            "confidence": round(0.6 + 0.05 * (index % 8), 2),
+            "next_steps": [f"follow up {index}.{step}" for step in range(2)],
+        }
+        for index in range(count)
+    ]
+
+
+def build_content(steps: int, structured: bool) -> str:
+    if structured:
+        return json.dumps({"steps": _steps(steps), "final_answer": "42"})
+    parts = [f"Step {index + 1}:\n{json.dumps(step, indent=2)}\n" for index, step in enumerate(_steps(steps))]
+    return "".join(parts) + "\nFinal Answer: 42\n"
+
+
+def _tokens(text: str) -> List[str]:
+    """Split text into ~4-character pieces, roughly one token each."""
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+
+def create_app(config: FakeAzureConfig) -> Starlette:
+    stats = {"requests": 0, "rate_limited": 0, "streamed": 0}
+
+    async def chat_completions(request: Request) -> Response:
+        body = await request.json()
+        stats["requests"] += 1
+        if config.rate_limit_rate and random.random() < config.rate_limit_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"code": "429", "message": "Rate limit is exceeded. Try again later."}},
+                status_code=429,
+                headers={
+                    "retry-after": str(max(1, round(config.retry_after))),
+                    "retry-after-ms": str(int(config.retry_after * 1000)),
+                },
+            )
+
+        structured = (body.get("response_format") or {}).get("type") == "json_schema"
+        content = build_content(config.steps, structured)
+        tokens = _tokens(content)
+        prompt_tokens = sum(len(message.get("content") or "") for message in body.get("messages", [])) // 4
+        max_tokens = body.get("max_tokens") or len(tokens)
+        finish_reason = "stop" if len(tokens) <= max_tokens else "length"
+        tokens = tokens[:max_tokens]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = request.path_params["deployment"]
+        headers = {"x-ratelimit-remaining-requests": "10000", "x-ratelimit-remaining-tokens": "10000000"}
+
+        if not body.get("stream"):
+            await asyncio.sleep(config.latency + len(tokens) / config.tokens_per_second)
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": finish_reason,
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": prompt_tokens + len(tokens),
+                },
+            }, headers=headers)
+
+        stats["streamed"] += 1
+
+        def chunk(delta: Dict, reason=None) -> bytes:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": reason}],
+            }
+            return f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+
+        async def events():
+            await asyncio.sleep(config.latency)
+            yield chunk({"role": "assistant", "content": ""})
+            burst = max(1, config.stream_burst)
+            for start in range(0, len(tokens), burst):
+                for token in tokens[start:start + burst]:
+                    yield chunk({"content": token})
+                await asyncio.sleep(burst / config.tokens_per_second)
+            yield chunk({}, finish_reason)
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+    async def stats_endpoint(request: Request) -> Response:
+        return JSONResponse(stats)
+
+    return Starlette(routes=[
+        Route("/openai/deployments/{deployment}/chat/completions", chat_completions, methods=["POST"]),
+        Route("/stats", stats_endpoint),
+    ])
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Fake Azure OpenAI chat-completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--steps", type=int, default=3, help="thought steps per response (response size)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds on injected 429s")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    import uvicorn
+
+    args = parse_args(argv)
+    config = FakeAzureConfig(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        steps=args.steps,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
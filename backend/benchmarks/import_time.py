@@ -0,0 +1,89 @@
+"""
+Import-time report and budget for the API module.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --module main --budget-ms 1200 --top 15 --output imports.json
+
+Runs ``python -X importtime -c "import <module>"`` in fresh interpreters
+(after one unmeasured run that writes the bytecode caches), takes the median
+of each module's cumulative time and prints the slowest direct imports and
+the modules with the highest self time. Exits 1 when the module's median
+cumulative import time exceeds --budget-ms, so cold-start regressions can
+be caught before they reach serverless or autoscaled deployments.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str) -> List[Tuple[str, int, int, int]]:
+    """One -X importtime run: (name, depth, self_us, cumulative_us) per imported module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def report(module: str, runs: int) -> Dict:
+    import_times(module)
+    samples: Dict[str, List[Tuple[int, int, int]]] = {}
+    for _ in range(runs):
+        for name, depth, self_us, cumulative_us in import_times(module):
+            samples.setdefault(name, []).append((depth, self_us, cumulative_us))
+
+    modules = {
+        name: {
+            "depth": values[0][0],
+            "self_ms": statistics.median(value[1] for value in values) / 1000,
+            "cumulative_ms": statistics.median(value[2] for value in values) / 1000,
+        }
+        for name, values in samples.items()
+    }
+    top = modules[module]
+    direct = {name: stats for name, stats in modules.items() if stats["depth"] == top["depth"] + 1}
+    return {"module": module, "runs": runs, "total_ms": top["cumulative_ms"], "direct_imports": direct, "modules": modules}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import-time report and budget.")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=1200.0, help="maximum median import time of --module")
+    parser.add_argument("--output", help="write the full report to this JSON file")
+    args = parser.parse_args(argv)
+
+    result = report(args.module, args.runs)
+    print(f"import {args.module}: {result['total_ms']:.1f}ms (median of {args.runs}, budget {args.budget_ms:.0f}ms)")
+    print("slowest direct imports:")
+    for name, stats in sorted(result["direct_imports"].items(), key=lambda item: -item[1]["cumulative_ms"])[:args.top]:
+        print(f"  {name:<32} {stats['cumulative_ms']:8.1f}ms")
+    print("highest self time:")
+    for name, stats in sorted(result["modules"].items(), key=lambda item: -item[1]["self_ms"])[:args.top]:
+        print(f"  {name:<32} {stats['self_ms']:8.1f}ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if result["total_ms"] > args.budget_ms:
+        print(f"over budget by {result['total_ms'] - args.budget_ms:.1f}ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
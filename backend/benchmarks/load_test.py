@@ -0,0 +1,315 @@
+"""
+Load test /api/reason against a local fake Azure OpenAI server.
+
+    python benchmarks/load_test.py --concurrency 1 8 32 64 --duration 15 --output bench.json
+    python benchmarks/load_test.py --stream --rate-limit-rate 0.05 --compare bench.json
+
+Starts benchmarks/fake_azure.py and the API (main.app under uvicorn) as
+subprocesses, then drives the API with a closed loop of workers at each
+concurrency level. Each level reports throughput, latency percentiles,
+error counts and the API's event-loop lag, sampled inside the server
+process. Results are written as JSON together with the git commit, and
+--compare prints the change against an earlier results file.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import httpx
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARK_DIR)
+
+
+def percentiles(values: List[float], scale: float = 1000.0) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def at(fraction: float) -> float:
+        return scale * ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "mean": scale * sum(ordered) / len(ordered),
+        "p50": at(0.50),
+        "p95": at(0.95),
+        "p99": at(0.99),
+        "max": scale * ordered[-1],
+    }
+
+
+class LoopLagMonitor:
+    """Samples how late a periodic sleep wakes up, i.e. how long the event loop was blocked."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def ensure_started(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def snapshot(self, reset: bool = False) -> Dict[str, float]:
+        stats = percentiles(self.samples)
+        stats["samples"] = len(self.samples)
+        if reset:
+            self.samples = []
+        return stats
+
+
+def create_bench_app():
+    """
+    main.app with an extra /_bench/loop_lag route (benchmark processes only).
+    An app factory, so that every uvicorn worker process builds its own.
+    """
+    import main
+
+    monitor = LoopLagMonitor()
+
+    @main.app.get("/_bench/loop_lag")
+    async def loop_lag(reset: bool = False):
+        monitor.ensure_started()
+        return monitor.snapshot(reset)
+
+    return main.app
+
+
+def serve(port: int) -> None:
+    """Run the API like main's __main__ does, honouring WORKERS."""
+    sys.path[:0] = [BACKEND_DIR, BENCHMARK_DIR]
+    import uvicorn
+
+    workers = int(os.getenv("WORKERS", "1"))
+    if workers > 1:
+        import main
+        main.configure_workers()
+        # With several workers the loop lag comes from whichever worker answers /_bench/loop_lag
+        uvicorn.run("load_test:create_bench_app", factory=True, host="127.0.0.1", port=port,
+                    workers=workers, log_level="warning")
+    else:
+        uvicorn.run(create_bench_app(), host="127.0.0.1", port=port, log_level="warning")
+
+
+def _start(args: List[str], env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], cwd=BACKEND_DIR, env=env)
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    concurrency: int,
+    duration: float,
+    stream: bool,
+    run_id: str,
+) -> Dict:
+    """Keep ``concurrency`` requests in flight for ``duration`` seconds."""
+    path = "/api/reason/stream" if stream else "/api/reason"
+    latencies: List[float] = []
+    first_bytes: List[float] = []
+    statuses: Counter = Counter()
+    counter = itertools.count()
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            # Distinct questions so caches and single-flight do not short-circuit the upstream
+            payload = {"question": f"{run_id} question {next(counter)}", "bypass_cache": True}
+            started = time.perf_counter()
+            try:
+                if stream:
+                    async with client.stream("POST", path, json=payload) as response:
+                        first_byte = None
+                        async for _ in response.aiter_raw():
+                            if first_byte is None:
+                                first_byte = time.perf_counter() - started
+                        status = str(response.status_code)
+                    if first_byte is not None and status == "200":
+                        first_bytes.append(first_byte)
+                else:
+                    response = await client.post(path, json=payload)
+                    status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            statuses[status] += 1
+            if status == "200":
+                latencies.append(time.perf_counter() - started)
+
+    await client.get("/_bench/loop_lag", params={"reset": "true"})
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    loop_lag = (await client.get("/_bench/loop_lag", params={"reset": "true"})).json()
+
+    requests = sum(statuses.values())
+    result = {
+        "concurrency": concurrency,
+        "duration_s": elapsed,
+        "requests": requests,
+        "ok": statuses.get("200", 0),
+        "statuses": dict(statuses),
+        "throughput_rps": statuses.get("200", 0) / elapsed,
+        "latency_ms": percentiles(latencies),
+        "loop_lag_ms": loop_lag,
+    }
+    if stream:
+        result["first_byte_ms"] = percentiles(first_bytes)
+    return result
+
+
+async def run_all(args: argparse.Namespace, api_url: str) -> List[Dict]:
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2, max_keepalive_connections=max(args.concurrency))
+    timeout = httpx.Timeout(args.request_timeout)
+    results = []
+    async with httpx.AsyncClient(base_url=api_url, limits=limits, timeout=timeout) as client:
+        if args.warmup:
+            await run_level(client, min(args.concurrency), args.warmup, args.stream, "warmup")
+        for concurrency in args.concurrency:
+            result = await run_level(client, concurrency, args.duration, args.stream, f"c{concurrency}-{time.time_ns()}")
+            results.append(result)
+            latency = result["latency_ms"]
+            print(
+                f"c={concurrency:<4} {result['throughput_rps']:8.1f} req/s  "
+                f"p50={latency.get('p50', 0):7.1f}ms p95={latency.get('p95', 0):7.1f}ms p99={latency.get('p99', 0):7.1f}ms  "
+                f"loop lag p99={result['loop_lag_ms'].get('p99', 0):6.1f}ms  errors={result['requests'] - result['ok']}",
+                file=sys.stderr,
+            )
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline_path: str, results: List[Dict]) -> None:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {result["concurrency"]: result for result in baseline["results"]}
+    print(f"vs {baseline_path} ({baseline.get('git_commit')}):", file=sys.stderr)
+    for result in results:
+        before = previous.get(result["concurrency"])
+        if before is None:
+            continue
+
+        def change(new: float, old: float) -> str:
+            return f"{100 * (new - old) / old:+.1f}%" if old else "n/a"
+
+        print(
+            f"c={result['concurrency']:<4} throughput {change(result['throughput_rps'], before['throughput_rps'])}  "
+            f"p95 {change(result['latency_ms'].get('p95', 0), before['latency_ms'].get('p95', 0))}  "
+            f"p99 {change(result['latency_ms'].get('p99', 0), before['latency_ms'].get('p99', 0))}",
+            file=sys.stderr,
+        )
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test the reasoning API against a fake Azure server.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of warmup before the first level")
+    parser.add_argument("--stream", action="store_true", help="drive /api/reason/stream instead of /api/reason")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake upstream time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--steps", type=int, default=3, help="thought steps per fake response")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of fake upstream 429s")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--workers", type=int, default=1, help="API worker processes")
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the API process, e.g. HEDGING_ENABLED=1")
+    parser.add_argument("--api-port", type=int, default=8765)
+    parser.add_argument("--fake-port", type=int, default=9100)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--output", default="load_test_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ["serve"]:
+        serve(int(argv[1]))
+        return 0
+
+    args = parse_args(argv)
+    fake_args = [
+        os.path.join(BENCHMARK_DIR, "fake_azure.py"),
+        "--port", str(args.fake_port),
+        "--latency", str(args.latency),
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--steps", str(args.steps),
+        "--rate-limit-rate", str(args.rate_limit_rate),
+        "--retry-after", str(args.retry_after),
+    ]
+    env = {key: value for key, value in os.environ.items() if not key.startswith(("AZURE_", "CHAIN_LOG_", "TRACE_"))}
+    env.update({
+        "AZURE_OPENAI_ENDPOINT": f"http://127.0.0.1:{args.fake_port}",
+        "AZURE_OPENAI_API_KEY": "load-test",
+        "AZURE_DEPLOYMENT_NAME": "load-test",
+        "WORKERS": str(args.workers),
+    })
+    env.update(item.split("=", 1) for item in args.app_env)
+
+    fake = _start(fake_args)
+    api = _start([os.path.abspath(__file__), "serve", str(args.api_port)], env)
+    api_url = f"http://127.0.0.1:{args.api_port}"
+    try:
+        _wait_ready(f"http://127.0.0.1:{args.fake_port}/stats", fake)
+        _wait_ready(api_url + "/", api)
+        results = asyncio.run(run_all(args, api_url))
+        fake_stats = httpx.get(f"http://127.0.0.1:{args.fake_port}/stats").json()
+    finally:
+        for process in (api, fake):
+            process.terminate()
+        for process in (api, fake):
+            process.wait(timeout=10)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "fake_server": fake_stats,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.output}", file=sys.stderr)
+    if args.compare:
+        compare(args.compare, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""
+Micro-benchmarks for response parsing, chain construction and analysis.
+
+    python benchmarks/micro_bench.py --save micro.json
+    python benchmarks/micro_bench.py --compare micro.json --max-regression 0.25
+    python benchmarks/micro_bench.py --filter parse_steps
+
+Each benchmark runs on a corpus of model outputs: a single step, 50 steps,
+a ~500 KB response, braces nested in objects, strings and prose, and
+malformed or truncated JSON. Time is measured like pytest-benchmark (calibrated
+inner loop, several rounds, gc off); allocations with tracemalloc (peak and
+retained bytes of one call). The parsed step count of every corpus entry is
+checked as well, so the run fails when the parser changes behaviour.
+
+With --compare the run fails (exit 1) when a benchmark's median time or peak
+allocation grew by more than --max-regression against the saved baseline,
+which makes it usable as a gate for changes to the parser or the models.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import main  # noqa: E402
+import openai_one  # noqa: E402
+from load_test import git_commit  # noqa: E402
+from step_parser import parse_thought_steps  # noqa: E402
+
+
+def _step(index: int, thought: Optional[str] = None, facts: int = 3) -> Dict[str, Any]:
+    return {
+        "thought": thought or f"Step {index + 1}: work out the next part of the problem from the facts so far.",
+        "supporting_facts": [f"Fact {index}.{fact} established earlier in the chain." for fact in range(facts)],
+        "confidence": round(0.55 + 0.05 * (index % 9), 2),
+        "next_steps": [f"Check consequence {index}.{step}." for step in range(2)],
+    }
+
+
+def _render(steps: List[str], final_answer: Optional[str] = "42") -> str:
+    text = "".join(f"Step {index + 1}:\n{step}\n\n" for index, step in enumerate(steps))
+    return text + (f"Final Answer: {final_answer}\n" if final_answer is not None else "")
+
+
+def _large_response(target_bytes: int = 500 * 1024) -> Tuple[str, int]:
+    filler = "Consider the quantities involved and how they constrain each other. " * 60
+    steps: List[str] = []
+    while sum(len(step) for step in steps) < target_bytes:
+        steps.append(json.dumps(_step(len(steps), filler, facts=8), indent=2))
+    return _render(steps), len(steps)
+
+
+def _nested_braces() -> Tuple[str, int]:
+    steps = []
+    for index in range(10):
+        step = _step(index, f'Let S = {{x | x > {index}}} and f("{{}}") = "}}{{"; a \\"quoted {{ brace\\" too.')
+        step["scratch"] = {"sets": [{"a": {"b": {"c": index}}}], "note": "{{}}"}
+        steps.append(f"The set {{1, 2, {index}}} matters here.\n{json.dumps(step, indent=2)}")
+    return _render(steps), 10
+
+
+def _malformed() -> Tuple[str, int]:
+    steps = []
+    valid = 0
+    for index in range(10):
+        text = json.dumps(_step(index), indent=2)
+        if index % 3 == 1:
+            text = text[:-2] + ",\n}"  # trailing comma
+        elif index % 3 == 2:
+            text = text.replace('"confidence"', '"certainty"')  # missing field
+        else:
+            valid += 1
+        steps.append(text)
+    # Output cut off at max_tokens in the middle of a step, without a final answer
+    steps.append(json.dumps(_step(10), indent=2)[:120])
+    return _render(steps, final_answer=None), valid
+
+
+def build_corpus() -> Dict[str, Tuple[str, int]]:
+    """Corpus name -> (model output, expected number of parsed steps)."""
+    return {
+        "one_step": (_render([json.dumps(_step(0), indent=2)]), 1),
+        "fifty_steps": (_render([json.dumps(_step(index), indent=2) for index in range(50)]), 50),
+        "large_500kb": _large_response(),
+        "nested_braces": _nested_braces(),
+        "malformed_json": _malformed(),
+    }
+
+
+def build_benchmarks(corpus: Dict[str, Tuple[str, int]]) -> List[Tuple[str, Callable[[], Any]]]:
+    reasoner = main.ChainOfThoughtReasoner()
+    dataclass_reasoner = openai_one.AzureChainOfThoughtReasoner(
+        azure_endpoint="http://127.0.0.1", azure_api_key="bench", deployment_name="bench"
+    )
+    benchmarks = []
+    for name, (text, _) in corpus.items():
+        step_dicts = parse_thought_steps(text, dict)
+        payload = {"question": name, "steps": step_dicts, "final_answer": "42", "metadata": {}}
+        dataclass_chain = openai_one.ReasoningChain(
+            question=name,
+            steps=[openai_one.ThoughtStep(**step) for step in step_dicts],
+            final_answer="42",
+            metadata={}
+        )
+
+        def build_chain(step_dicts=step_dicts, name=name):
+            return main.ReasoningChain(
+                question=name,
+                steps=[main.ThoughtStep(**step) for step in step_dicts],
+                final_answer="42",
+                metadata={}
+            )
+
+        benchmarks += [
+            (f"parse_steps[{name}]", lambda text=text: reasoner._parse_thought_steps(text)),
+            (f"parse_steps_dataclass[{name}]", lambda text=text: dataclass_reasoner._parse_thought_steps(text)),
+            (f"extract_final_answer[{name}]", lambda text=text: reasoner._extract_final_answer(text)),
+            (f"build_chain[{name}]", build_chain),
+            (f"validate_chain[{name}]", lambda payload=payload: main.ReasoningChain.model_validate(payload)),
+            (f"analyze_chain[{name}]", lambda chain=dataclass_chain: dataclass_reasoner.analyze_reasoning_chain(chain)),
+        ]
+    return benchmarks
+
+
+def check_corpus(corpus: Dict[str, Tuple[str, int]]) -> List[str]:
+    """Parse every corpus entry with both step types and report count mismatches."""
+    problems = []
+    for name, (text, expected) in corpus.items():
+        for step_factory in (main.ThoughtStep, openai_one.ThoughtStep):
+            parsed = len(parse_thought_steps(text, step_factory))
+            if parsed != expected:
+                problems.append(f"{name}: parsed {parsed} steps with {step_factory.__module__}, expected {expected}")
+    return problems
+
+
+def measure(func: Callable[[], Any], rounds: int, min_round_time: float) -> Dict[str, float]:
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_round_time:
+            break
+        number = max(number * 2, int(number * min_round_time / max(elapsed, 1e-9)))
+    times = sorted(timer.timeit(number) / number for _ in range(rounds))
+
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+
+    return {
+        "median_us": times[len(times) // 2] * 1e6,
+        "min_us": times[0] * 1e6,
+        "max_us": times[-1] * 1e6,
+        "ops_per_second": 1 / times[len(times) // 2],
+        "iterations": number * rounds,
+        "peak_kb": (peak - baseline) / 1024,
+        "retained_kb": (current - baseline) / 1024,
+    }
+
+
+def compare(baseline_path: str, results: Dict[str, Dict], max_regression: float) -> List[str]:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"vs {baseline_path} ({baseline.get('git_commit')}):")
+    regressions = []
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        time_change = result["median_us"] / before["median_us"] - 1
+        # Ignore allocation noise below 1 KB
+        peak_change = (result["peak_kb"] - before["peak_kb"]) / max(before["peak_kb"], 1.0)
+        flag = ""
+        if time_change > max_regression or peak_change > max_regression:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"  {name:<40} time {100 * time_change:+6.1f}%  peak {100 * peak_change:+6.1f}%{flag}")
+    return regressions
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for parsing and chain construction.")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-round-time", type=float, default=0.02, help="seconds per round, sets the inner loop")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline results file to gate against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed relative growth of median time or peak allocation")
+    return parser.parse_args(argv)
+
+
+def main_cli(argv=None) -> int:
+    args = parse_args(argv)
+    corpus = build_corpus()
+    problems = check_corpus(corpus)
+    for problem in problems:
+        print(f"corpus check failed: {problem}")
+
+    results: Dict[str, Dict] = {}
+    print(f"{'benchmark':<40} {'median':>11} {'min':>11} {'ops/s':>10} {'peak':>10} {'retained':>10}")
+    for name, func in build_benchmarks(corpus):
+        if args.filter not in name:
+            continue
+        result = results[name] = measure(func, args.rounds, args.min_round_time)
+        print(
+            f"{name:<40} {result['median_us']:9.1f}us {result['min_us']:9.1f}us {result['ops_per_second']:10.0f} "
+            f"{result['peak_kb']:8.1f}KB {result['retained_kb']:8.1f}KB"
+        )
+
+    if args.save:
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "corpus_bytes": {name: len(text) for name, (text, _) in corpus.items()},
+            "results": results,
+        }
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.save}")
+
+    regressions = compare(args.compare, results, args.max_regression) if args.compare else []
+    return 1 if problems or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,124 @@
+"""
+Calibrate SEMANTIC_CACHE_THRESHOLD for an embedder.
+
+    python benchmarks/semantic_calibration.py --embedder sentence-transformers
+    python benchmarks/semantic_calibration.py --embedder hashing --threshold 0.92
+
+Scores two sets of question pairs: rephrasings that should share a cached
+chain, and questions that read alike but need a different answer (negated,
+numbers swapped, one word changed). Pairs whose negations or numbers differ
+are rejected by the cache's guard whatever their similarity. The report
+lists every pair and suggests the lowest threshold at which no remaining
+different-answer pair would hit, with the rephrasing hit rate it gives.
+With --threshold the run fails (exit 1) if that threshold lets any
+different-answer pair through.
+"""
+import argparse
+import os
+import sys
+from typing import List, Tuple
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+from semantic_cache import _normalize, load_embedder, question_signature  # noqa: E402
+
+REPHRASINGS = [
+    ("How do I delete a git branch?", "How can I delete a git branch?"),
+    ("How do I delete a git branch?", "How do you delete a git branch"),
+    ("How do I delete a branch in git?", "How can I delete a git branch?"),
+    ("How do I undo the last git commit?", "How can I undo my last git commit?"),
+    ("What is the capital of France?", "What's the capital of France?"),
+    ("What is the capital of France?", "what is the capital city of france"),
+    ("How do I reverse a list in Python?", "How can I reverse a list in Python?"),
+    ("How do I reverse a list in Python?", "How to reverse a Python list?"),
+    ("Why is the sky blue?", "Why does the sky look blue?"),
+    ("What is 15% of 80?", "What's 15% of 80?"),
+    ("How many days are in a leap year?", "How many days does a leap year have?"),
+    ("Is it safe to mix bleach and ammonia?", "Is it safe to mix ammonia and bleach?"),
+    ("Is it safe to mix bleach and ammonia?", "Can I safely mix bleach and ammonia?"),
+    ("Should I use a list or a tuple in Python?", "Should I use a tuple or a list in Python?"),
+    ("How long does it take to boil an egg?", "How long should I boil an egg?"),
+    ("What causes inflation?", "What are the causes of inflation?"),
+    ("How does a hash table work?", "How do hash tables work?"),
+    ("Who wrote Pride and Prejudice?", "Who is the author of Pride and Prejudice?"),
+    ("What is the difference between TCP and UDP?", "What's the difference between TCP and UDP?"),
+    ("How can I center a div in CSS?", "How do I center a div with CSS?"),
+    ("Explain the Monty Hall problem.", "Can you explain the Monty Hall problem?"),
+    ("What is the boiling point of water at sea level?", "What's water's boiling point at sea level?"),
+    ("How do I convert Celsius to Fahrenheit?", "How can I convert from Celsius to Fahrenheit?"),
+]
+
+DIFFERENT_ANSWERS = [
+    ("Is it safe to mix bleach and ammonia?", "Is it not safe to mix bleach and ammonia?"),
+    ("Is it safe to mix bleach and ammonia?", "Isn't it safe to mix bleach and ammonia?"),
+    ("Is it safe to mix bleach and ammonia?", "Is it unsafe to mix bleach and ammonia?"),
+    ("Is it safe to mix bleach and ammonia?", "Is it safe to mix bleach and vinegar?"),
+    ("Should I take ibuprofen with food?", "Should I not take ibuprofen with food?"),
+    ("Should I take ibuprofen with food?", "Should I never take ibuprofen with food?"),
+    ("Should I take ibuprofen with food?", "Should I take ibuprofen without food?"),
+    ("Can dogs eat grapes?", "Can dogs not eat grapes?"),
+    ("Can dogs eat grapes?", "Can cats eat grapes?"),
+    ("How do I delete a git branch?", "How do I create a git branch?"),
+    ("How do I delete a git branch?", "How do I rename a git branch?"),
+    ("How do I delete a git branch?", "How do I delete a remote git branch?"),
+    ("How do I delete a git branch?", "How do I delete a git tag?"),
+    ("What is the capital of France?", "What is the capital of Germany?"),
+    ("What is the capital of France?", "What is the population of France?"),
+    ("What is 15% of 80?", "What is 15% of 90?"),
+    ("What is 15% of 80?", "What is 80% of 15?"),
+    ("Is 17 a prime number?", "Is 21 a prime number?"),
+    ("How do I reverse a list in Python?", "How do I sort a list in Python?"),
+    ("How do I reverse a list in Python?", "How do I reverse a string in Python?"),
+    ("How do I reverse a list in Python?", "How do I reverse a list in JavaScript?"),
+    ("How do I convert Celsius to Fahrenheit?", "How do I convert Fahrenheit to Celsius?"),
+    ("Who wrote Pride and Prejudice?", "Who wrote Sense and Sensibility?"),
+    ("Why is the sky blue?", "Why is the sea blue?"),
+    ("How many days are in a leap year?", "How many days are in a year?"),
+    ("What is the difference between TCP and UDP?", "What is the difference between HTTP and HTTPS?"),
+]
+
+
+def score(embedder, pairs: List[Tuple[str, str]]) -> List[Tuple[float, bool, str, str]]:
+    """(similarity, passes the guard, question, other question) per pair."""
+    vectors = _normalize(np.asarray(embedder([text for pair in pairs for text in pair]), dtype=np.float32))
+    return [
+        (float(vectors[2 * i] @ vectors[2 * i + 1]), question_signature(a) == question_signature(b), a, b)
+        for i, (a, b) in enumerate(pairs)
+    ]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Calibrate the semantic cache threshold for an embedder.")
+    parser.add_argument("--embedder", default="sentence-transformers", help="SEMANTIC_CACHE_EMBEDDER spec")
+    parser.add_argument("--threshold", type=float, help="check this threshold instead of only suggesting one")
+    args = parser.parse_args(argv)
+
+    embedder = load_embedder(args.embedder)
+    rephrasings = score(embedder, REPHRASINGS)
+    different = score(embedder, DIFFERENT_ANSWERS)
+    for label, rows in (("rephrasings", rephrasings), ("different answers", different)):
+        print(f"{label}:")
+        for similarity, passes, a, b in sorted(rows, reverse=True):
+            print(f"  {similarity:6.3f} {'' if passes else '(guard) '}{a} | {b}")
+
+    # Anything at or below the best-scoring different-answer pair the guard lets through would be a wrong hit
+    unsafe = max((similarity for similarity, passes, _, _ in different if passes), default=-1.0)
+    suggested = float(np.nextafter(np.float32(unsafe), np.float32(2.0)))
+
+    def hit_rate(threshold: float) -> float:
+        return sum(passes and similarity >= threshold for similarity, passes, _, _ in rephrasings) / len(rephrasings)
+
+    print(f"suggested threshold {suggested:.3f}: rephrasing hit rate {hit_rate(suggested):.0%}")
+    if args.threshold is None:
+        return 0
+    wrong = [(a, b) for similarity, passes, a, b in different if passes and similarity >= args.threshold]
+    print(f"threshold {args.threshold:.3f}: rephrasing hit rate {hit_rate(args.threshold):.0%}, "
+          f"{len(wrong)} of {len(different)} different-answer pairs would hit")
+    return 1 if wrong else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Per-request CPU of /api/reason response serialization.
+
+    python benchmarks/serialization_bench.py --requests 500
+
+Drives the real endpoint in-process (httpx ASGITransport) with a reasoner
+stub that returns a prebuilt chain, so the measured CPU is routing,
+serialization, compression and the middlewares, but no upstream work. Each
+chain size is run with the response_model path (FAST_SERIALIZATION off),
+the fast path, and the fast path with gzip; the report gives CPU per
+request, the saving against the response_model path, and body sizes.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Dict
+
+import httpx
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import main  # noqa: E402
+from micro_bench import build_corpus  # noqa: E402
+from step_parser import parse_thought_steps  # noqa: E402
+
+MODES = {
+    "response_model": {"fast": False, "min_bytes": -1, "accept_encoding": "identity"},
+    "fast": {"fast": True, "min_bytes": -1, "accept_encoding": "identity"},
+    "fast+gzip": {"fast": True, "min_bytes": 4096, "accept_encoding": "gzip"},
+}
+
+
+class StubReasoner:
+    """Stands in for ChainOfThoughtReasoner and returns the same chain every time."""
+
+    def __init__(self, chain: main.ReasoningChain):
+        self.chain = chain
+
+    async def reason(self, question: str, use_cache: bool = True, samples: int = 1) -> main.ReasoningChain:
+        return self.chain
+
+
+async def run_mode(chain: main.ReasoningChain, mode: Dict, requests: int) -> Dict[str, float]:
+    # ASGITransport does not run the lifespan, so the settings it would load are set here
+    main.app.state.fast_serialization = mode["fast"]
+    main.app.state.compression_min_bytes = mode["min_bytes"]
+    main.app.state.reasoner = StubReasoner(chain)
+    headers = {"Accept-Encoding": mode["accept_encoding"]}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # The client shares the process, so its own per-request CPU is measured
+        # against an endpoint that does no serialization work and subtracted
+        for _ in range(20):
+            await client.post("/api/reason", json={"question": "warmup"}, headers=headers)
+        started = time.process_time()
+        for _ in range(requests):
+            response = await client.post("/api/reason", json={"question": "bench"}, headers=headers)
+        cpu = time.process_time() - started
+
+        started = time.process_time()
+        for _ in range(requests):
+            await client.get("/")
+        overhead = time.process_time() - started
+
+    assert response.status_code == 200, response.text
+    return {
+        "cpu_us_per_request": 1e6 * (cpu - overhead) / requests,
+        # httpx decodes compressed bodies, so the wire size comes from the header
+        "wire_bytes": int(response.headers["content-length"]),
+    }
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Per-request CPU of /api/reason serialization.")
+    parser.add_argument("--requests", type=int, default=300, help="requests per chain size and mode")
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for name in ("one_step", "fifty_steps", "large_500kb"):
+        text, _ = build_corpus()[name]
+        chain = main.ReasoningChain(
+            question=name,
+            steps=parse_thought_steps(text, main.ThoughtStep),
+            final_answer="42",
+            metadata={"model": "bench", "finish_reason": "stop", "usage": {"total_tokens": len(text) // 4}}
+        )
+        results[name] = {mode: asyncio.run(run_mode(chain, config, args.requests)) for mode, config in MODES.items()}
+
+    print(f"{'chain':<14} {'mode':<16} {'cpu/request':>12} {'saved':>8} {'wire bytes':>11}")
+    for name, modes in results.items():
+        baseline = modes["response_model"]["cpu_us_per_request"]
+        for mode, result in modes.items():
+            saved = 100 * (1 - result["cpu_us_per_request"] / baseline) if baseline else 0.0
+            print(f"{name:<14} {mode:<16} {result['cpu_us_per_request']:10.1f}us {saved:7.1f}% {result['wire_bytes']:11d}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
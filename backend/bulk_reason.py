@@ -0,0 +1,193 @@
+"""
+Offline bulk reasoning over a JSONL file of questions.
+
+    python bulk_reason.py requests.jsonl results.jsonl --concurrency 16 --tpm 150000 --rpm 900
+
+Each input line is a JSON object with an id and a question. The defaults
+read the repo's requests.jsonl: the id is "request_id" and the question is
+the "title" and "body" fields joined by a blank line. For a file of
+{"id": ..., "question": ...} lines pass --id-field id --question-field question.
+
+Each output line holds the id, the ReasoningChain and its
+analyze_reasoning_chain() result, or an error. An input line that is not
+JSON or lacks a question field gets an error record keyed by its line
+number, and the job goes on. Re-running with the same output file skips
+every id that already has a chain, so an interrupted job resumes where it
+stopped.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict
+from typing import Dict, Iterator, Optional, Sequence, Set, Tuple
+
+from dotenv import load_dotenv
+
+from openai_one import AzureChainOfThoughtReasoner
+from rate_limit import RateLimitScheduler
+
+
+def read_questions(path: str, id_field: str, question_fields: Sequence[str]) -> Iterator[Tuple[str, Optional[str], Dict]]:
+    """
+    Yield (id, question, error) for each non-blank line. The question joins
+    ``question_fields`` with blank lines; lines without an id fall back to
+    their line number. A line that cannot be read yields no question and an
+    error record keyed by its line number instead.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield f"line:{line_number}", None, {"line": line_number, "error": f"invalid JSON: {e}"}
+                continue
+            if not isinstance(record, dict):
+                yield f"line:{line_number}", None, {"line": line_number, "error": "not a JSON object"}
+                continue
+            item_id = str(record.get(id_field, line_number))
+            missing = [field for field in question_fields if not isinstance(record.get(field), str)]
+            if missing:
+                error = f"missing or non-string field(s): {', '.join(missing)}"
+                yield item_id, None, {"id": item_id, "line": line_number, "error": error}
+                continue
+            yield item_id, "\n\n".join(record[field] for field in question_fields), {}
+
+
+def completed_ids(path: str) -> Set[str]:
+    """Collect ids that already have a chain in the results file, ignoring a torn last line."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "chain" in record:
+                done.add(str(record["id"]))
+    return done
+
+
+class BulkRunner:
+    """
+    Run questions through the reasoner on a thread pool. Request and token
+    budgets are enforced by the reasoner's RateLimitScheduler.
+    """
+
+    def __init__(self, reasoner: AzureChainOfThoughtReasoner, concurrency: int = 8):
+        self.reasoner = reasoner
+        self.concurrency = concurrency
+
+    def run_one(self, item_id: str, question: str) -> Dict:
+        try:
+            chain = self.reasoner.reason(question)
+        except Exception as e:
+            return {"id": item_id, "error": str(e)}
+        return {
+            "id": item_id,
+            "chain": asdict(chain),
+            "analysis": self.reasoner.analyze_reasoning_chain(chain)
+        }
+
+    def run(self, items: Iterator[Tuple[str, Optional[str], Dict]], output_path: str, skip: Set[str]) -> Dict[str, int]:
+        counts = {"completed": 0, "failed": 0, "skipped": 0}
+        started = time.monotonic()
+
+        # Append mode keeps earlier results; repair a torn final line first
+        needs_newline = False
+        if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            with open(output_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+
+        with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(self.concurrency) as pool:
+            if needs_newline:
+                out.write("\n")
+            in_flight: Set[Future] = set()
+
+            def drain(block: bool) -> None:
+                if block:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                else:
+                    done = {future for future in in_flight if future.done()}
+                for future in done:
+                    in_flight.discard(future)
+                    record = future.result()
+                    counts["failed" if "error" in record else "completed"] += 1
+                    out.write(json.dumps(record) + "\n")
+                out.flush()
+
+            for item_id, question, error in items:
+                if item_id in skip:
+                    counts["skipped"] += 1
+                    continue
+                if question is None:
+                    counts["failed"] += 1
+                    out.write(json.dumps(error) + "\n")
+                    continue
+                skip.add(item_id)
+                # Bound the number of queued futures so huge inputs stream through
+                while len(in_flight) >= self.concurrency * 2:
+                    drain(block=True)
+                in_flight.add(pool.submit(self.run_one, item_id, question))
+                drain(block=False)
+
+            while in_flight:
+                drain(block=True)
+
+        elapsed = time.monotonic() - started
+        print(
+            f"completed={counts['completed']} failed={counts['failed']} "
+            f"skipped={counts['skipped']} elapsed={elapsed:.1f}s",
+            file=sys.stderr
+        )
+        return counts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run chain-of-thought reasoning over a JSONL file of questions.")
+    parser.add_argument("input", help="JSONL file with one question per line")
+    parser.add_argument("output", help="JSONL results file; existing ids with a chain are skipped")
+    parser.add_argument("--id-field", default="request_id")
+    parser.add_argument(
+        "--question-field", default="title,body",
+        help="comma-separated fields joined into the question (default fits requests.jsonl)"
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rpm", type=float, default=None, help="requests-per-minute budget")
+    parser.add_argument("--tpm", type=float, default=None, help="tokens-per-minute budget")
+    parser.add_argument("--max-tokens", type=int, default=2000)
+    parser.add_argument("--deadline", type=float, default=300.0, help="seconds to keep retrying one question")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    reasoner = AzureChainOfThoughtReasoner(
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        azure_api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        deployment_name=os.getenv("AZURE_DEPLOYMENT_NAME", "gpt-4o"),
+        api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-08-01-preview"),
+        max_tokens=args.max_tokens,
+        scheduler=RateLimitScheduler(
+            requests_per_minute=args.rpm,
+            tokens_per_minute=args.tpm,
+            deadline=args.deadline
+        )
+    )
+    runner = BulkRunner(reasoner, concurrency=args.concurrency)
+    counts = runner.run(
+        read_questions(args.input, args.id_field, args.question_field.split(",")),
+        args.output,
+        completed_ids(args.output)
+    )
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def make_cache_key(deployment: str, prompt: str, temperature: float, max_tokens: int, samples: int = 1) -> str:
+    """Hash everything that determines a completion into a fixed-size key."""
+    parts = [deployment, prompt, temperature, max_tokens]
+    if samples != 1:
+        # Single-sample keys stay as they were, so existing cache entries remain valid
+        parts.append(samples)
+    payload = json.dumps(parts, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    disk_hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    writes: int = 0
+    disk_pruned: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        stats = asdict(self)
+        lookups = self.hits + self.misses
+        stats["hit_rate"] = self.hits / lookups if lookups else 0.0
+        return stats
+
+
+class ResponseCache(Generic[T]):
+    """
+    Two-tier exact-match cache: an in-memory LRU with TTL in front of an
+    optional SQLite table that survives restarts.
+
+    Memory entries hold the value object itself so hits cost a dict lookup.
+    The disk tier stores ``encode(value)`` and rebuilds it with ``decode`` on
+    a memory miss, after which the entry is promoted back into memory.
+    Expired rows stay on disk for ``stale_ttl`` seconds so they can still be
+    served stale, and the table is held to about ``disk_max_rows`` rows by
+    dropping the entries closest to expiry; both are pruned every
+    ``disk_max_rows // 10`` writes (per process), starting with the first.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 3600.0,
+        path: Optional[str] = None,
+        encode: Callable[[T], str] = json.dumps,
+        decode: Callable[[str], T] = json.loads,
+        disk_max_rows: int = 100_000,
+        stale_ttl: float = 86400.0,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.encode = encode
+        self.decode = decode
+        self.disk_max_rows = disk_max_rows
+        self.stale_ttl = stale_ttl
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[str, Tuple[float, T]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._prune_every = max(1, disk_max_rows // 10)
+        # The first write prunes whatever earlier runs left behind
+        self._writes_since_prune = self._prune_every
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_memory(self, key: str, allow_stale: bool = False) -> Optional[T]:
+        """
+        Look up the in-memory tier only. Expired entries are left in place
+        until evicted so they can still be served with allow_stale=True.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time() and not allow_stale:
+            self.stats.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set_memory(self, key: str, value: T, expires_at: Optional[float] = None) -> None:
+        """Insert into the in-memory tier, evicting least recently used entries."""
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (expires_at or time.time() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _disk_get(self, key: str, allow_stale: bool = False) -> Optional[Tuple[float, str]]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT expires_at, value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is not None and row[0] < time.time() and not allow_stale:
+            self.stats.expirations += 1
+            return None
+        return row
+
+    def _disk_set(self, key: str, expires_at: float, value: str) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, expires_at, value),
+            )
+            self._db.commit()
+            self._writes_since_prune += 1
+            due = self._writes_since_prune >= self._prune_every
+        if due:
+            self._disk_prune()
+
+    def _disk_prune(self) -> int:
+        """Delete rows past their stale window, then the oldest rows beyond disk_max_rows."""
+        with self._db_lock:
+            self._writes_since_prune = 0
+            pruned = self._db.execute(
+                "DELETE FROM responses WHERE expires_at < ?", (time.time() - self.stale_ttl,)
+            ).rowcount
+            # Every row gets the same TTL, so the earliest expiry is the oldest write
+            pruned += self._db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (max(0, self.disk_max_rows),),
+            ).rowcount
+            self._db.commit()
+        self.stats.disk_pruned += pruned
+        return pruned
+
+    async def get(self, key: str, allow_stale: bool = False) -> Optional[T]:
+        """
+        Return a cached value, checking memory first and then disk. With
+        allow_stale=True expired entries are returned too, as a fallback when
+        the upstream is unavailable.
+        """
+        value = self.get_memory(key, allow_stale)
+        if value is None and self._db is not None:
+            # SQLite calls block, so keep them off the event loop
+            row = await asyncio.to_thread(self._disk_get, key, allow_stale)
+            if row is not None:
+                value = self.decode(row[1])
+                self.set_memory(key, value, expires_at=row[0])
+                self.stats.disk_hits += 1
+        if value is None:
+            self.stats.misses += 1
+            return None
+        if allow_stale:
+            self.stats.stale_hits += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    async def set(self, key: str, value: T) -> None:
+        """Store a value in both tiers."""
+        expires_at = time.time() + self.ttl
+        self.set_memory(key, value, expires_at=expires_at)
+        self.stats.writes += 1
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_set, key, expires_at, self.encode(value))
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+        self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats_dict(self) -> Dict[str, Any]:
+        stats = self.stats.to_dict()
+        stats["entries"] = len(self._entries)
+        stats["max_entries"] = self.max_entries
+        stats["disk"] = self._db is not None
+        return stats
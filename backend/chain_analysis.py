@@ -0,0 +1,168 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    import numpy as np
+
+PERCENTILES = (0.10, 0.25, 0.50, 0.75, 0.90)
+LOW_CONFIDENCE_THRESHOLD = 0.7
+
+
+@dataclass
+class StepColumns:
+    """
+    Flattened steps of many chains, one array entry per step. ``lengths[i]``
+    is the number of steps in chain ``i``; steps are stored chain by chain.
+    """
+    lengths: "np.ndarray"
+    confidence: "np.ndarray"
+    fact_counts: "np.ndarray"
+    next_step_counts: "np.ndarray"
+
+    @classmethod
+    def from_chains(cls, chains: Sequence[Any]) -> "StepColumns":
+        """Flatten chains whose steps have confidence, supporting_facts and next_steps attributes."""
+        import numpy as np
+
+        lengths = np.fromiter((len(chain.steps) for chain in chains), dtype=np.int64, count=len(chains))
+        total = int(lengths.sum())
+        steps = [step for chain in chains for step in chain.steps]
+        return cls(
+            lengths=lengths,
+            confidence=np.fromiter((step.confidence for step in steps), dtype=np.float64, count=total),
+            fact_counts=np.fromiter((len(step.supporting_facts) for step in steps), dtype=np.int64, count=total),
+            next_step_counts=np.fromiter((len(step.next_steps) for step in steps), dtype=np.int64, count=total),
+        )
+
+
+def _nearest_rank(ordered: "np.ndarray", starts: "np.ndarray", lengths: "np.ndarray", fraction: float) -> "np.ndarray":
+    """Per-group nearest-rank percentile of ``ordered``, which is sorted within each group."""
+    import numpy as np
+
+    return ordered[starts + np.minimum(lengths - 1, (fraction * lengths).astype(np.int64))]
+
+
+def analyze_columns(
+    columns: StepColumns,
+    low_confidence_threshold: float = LOW_CONFIDENCE_THRESHOLD,
+    finish_reasons: Optional[Sequence[Optional[str]]] = None,
+) -> Dict[str, Any]:
+    """
+    Analyze every chain at once. Per-chain sums come from ``np.add.reduceat``
+    over the flattened step arrays and per-chain percentiles from one
+    lexsort, so the cost is a few array passes regardless of chain count.
+    Returns {"chains": [per-chain analysis], "summary": {...}}.
+    """
+    # NumPy is only needed for batches; single chains go through analyze_chain,
+    # so importing the API does not pay for it
+    import numpy as np
+
+    lengths = columns.lengths
+    confidence = columns.confidence
+    num_chains = len(lengths)
+    starts = np.zeros(num_chains, dtype=np.int64)
+    if num_chains > 1:
+        np.cumsum(lengths[:-1], out=starts[1:])
+    non_empty = lengths > 0
+    chain_of_step = np.repeat(np.arange(num_chains), lengths)
+
+    def per_chain_sum(values: "np.ndarray") -> "np.ndarray":
+        sums = np.zeros(num_chains, dtype=np.float64)
+        if len(values):
+            sums[non_empty] = np.add.reduceat(values, starts[non_empty])
+        return sums
+
+    safe_lengths = np.maximum(lengths, 1)
+    fact_usage = per_chain_sum(columns.fact_counts).astype(np.int64)
+    average_confidence = per_chain_sum(confidence) / safe_lengths
+    branching_factor = per_chain_sum(columns.next_step_counts) / safe_lengths
+
+    low = confidence < low_confidence_threshold
+    low_positions = (np.arange(len(confidence)) - starts[chain_of_step])[low]
+    low_counts = np.bincount(chain_of_step[low], minlength=num_chains)
+    low_by_chain = np.split(low_positions, np.cumsum(low_counts)[:-1]) if num_chains else []
+
+    # Sort confidences within each chain so percentiles are plain indexing
+    ordered = confidence[np.lexsort((confidence, chain_of_step))]
+    chain_percentiles = {}
+    if non_empty.any():
+        for fraction in PERCENTILES:
+            values = np.full(num_chains, np.nan)
+            values[non_empty] = _nearest_rank(ordered, starts[non_empty], lengths[non_empty], fraction)
+            chain_percentiles[f"p{round(fraction * 100)}"] = values
+
+    # Convert to Python lists once rather than boxing NumPy scalars per chain
+    columns_out = zip(
+        lengths.tolist(),
+        average_confidence.tolist(),
+        fact_usage.tolist(),
+        branching_factor.tolist(),
+        *(values.tolist() for values in chain_percentiles.values()),
+    )
+    chains: List[Dict[str, Any]] = []
+    for i, (length, average, facts, branching, *percentiles) in enumerate(columns_out):
+        if not length:
+            chains.append({"error": "No reasoning steps found in the chain"})
+            continue
+        analysis = {
+            "chain_length": length,
+            "average_confidence": average,
+            "fact_usage": facts,
+            "branching_factor": branching,
+            "low_confidence_steps": low_by_chain[i].tolist(),
+            "confidence_percentiles": dict(zip(chain_percentiles, percentiles)),
+        }
+        if finish_reasons is not None:
+            analysis["finish_reason"] = finish_reasons[i]
+        chains.append(analysis)
+
+    summary: Dict[str, Any] = {
+        "chains": num_chains,
+        "empty_chains": int(num_chains - non_empty.sum()),
+        "steps": int(len(confidence)),
+        "low_confidence_steps": int(low.sum()),
+        "fact_usage": int(fact_usage.sum()),
+    }
+    if len(confidence):
+        overall = np.sort(confidence)
+        summary.update({
+            "mean_chain_length": float(lengths[non_empty].mean()),
+            "average_confidence": float(confidence.mean()),
+            "branching_factor": float(columns.next_step_counts.sum() / len(confidence)),
+            "confidence_percentiles": {
+                f"p{round(fraction * 100)}": float(overall[min(len(overall) - 1, int(fraction * len(overall)))])
+                for fraction in PERCENTILES
+            },
+        })
+    return {"chains": chains, "summary": summary}
+
+
+def analyze_chains(chains: Iterable[Any], low_confidence_threshold: float = LOW_CONFIDENCE_THRESHOLD) -> Dict[str, Any]:
+    """Flatten chains (pydantic models or dataclasses) into columns and analyze them together."""
+    chains = list(chains)
+    finish_reasons = [(chain.metadata or {}).get("finish_reason") for chain in chains]
+    return analyze_columns(StepColumns.from_chains(chains), low_confidence_threshold, finish_reasons)
+
+
+def analyze_chain(chain: Any, low_confidence_threshold: float = LOW_CONFIDENCE_THRESHOLD) -> Dict[str, Any]:
+    """
+    Analyze one chain in plain Python; same result as its entry in
+    ``analyze_chains``, without the cost of building arrays for a few steps.
+    """
+    steps = chain.steps
+    if not steps:
+        return {"error": "No reasoning steps found in the chain"}
+    confidences = [step.confidence for step in steps]
+    ordered = sorted(confidences)
+    length = len(steps)
+    return {
+        "chain_length": length,
+        "average_confidence": sum(confidences) / length,
+        "fact_usage": sum(len(step.supporting_facts) for step in steps),
+        "branching_factor": sum(len(step.next_steps) for step in steps) / length,
+        "low_confidence_steps": [i for i, confidence in enumerate(confidences) if confidence < low_confidence_threshold],
+        "confidence_percentiles": {
+            f"p{round(fraction * 100)}": ordered[min(length - 1, int(fraction * length))] for fraction in PERCENTILES
+        },
+        "finish_reason": (chain.metadata or {}).get("finish_reason"),
+    }
@@ -0,0 +1,376 @@
+"""
+Durable append-only log of reasoning chains.
+
+    python chain_log.py compact /var/lib/cot/chains
+
+Chains are appended as JSON records to numbered segment files and found
+through two memory-mapped hash indexes: one by chain id and one by
+normalized question plus deployment. Both indexes can be rebuilt from the
+segments, so a crash at worst costs replaying the tail of the log.
+
+One process owns a log directory at a time: ChainLog takes an exclusive
+lock on it, so a second server worker or a compaction run from the command
+line fails with ChainLogLocked instead of writing under the owner.
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import zlib
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# length, crc32 of payload, chain id, question hash
+RECORD_HEADER = struct.Struct("<IIQQ")
+# magic, capacity, count, covered segment, covered offset, next chain id
+INDEX_HEADER = struct.Struct("<8sQQQQQ")
+INDEX_SLOT = struct.Struct("<QQQ")
+INDEX_MAGIC = b"CHNIDX01"
+INDEX_HEADER_SIZE = 64
+_SEGMENT_PATTERN = re.compile(r"segment-(\d{6})\.log$")
+_LOCK_FILE = "lock"
+
+
+class ChainLogLocked(RuntimeError):
+    """Raised when another process already has the log directory open."""
+
+
+def _lock_directory(directory: str) -> IO[bytes]:
+    """Take an exclusive, non-blocking lock on a log directory; the lock lasts until the file is closed."""
+    lock_file = open(os.path.join(directory, _LOCK_FILE), "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError as e:
+        lock_file.close()
+        raise ChainLogLocked(f"{directory} is in use by another process") from e
+    return lock_file
+
+
+def normalize_question(question: str) -> str:
+    """Case- and whitespace-insensitive form of a question."""
+    return " ".join(question.lower().split())
+
+
+def question_hash(question: str, deployment: str) -> int:
+    """Non-zero 64-bit key for a normalized question asked of a deployment."""
+    digest = hashlib.blake2b(f"{deployment}\0{normalize_question(question)}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class HashIndex:
+    """
+    Open-addressing hash table from 64-bit keys to (segment, offset),
+    stored in a memory-mapped file. Lookups probe the mapping in place.
+    Key 0 marks an empty slot, so callers must avoid it. The header also
+    records how far into the log the index is up to date and the next chain
+    id, so reopening only replays newer records. The table doubles when it
+    is half full.
+    """
+
+    def __init__(self, path: str, capacity: int = 1 << 16):
+        self.path = path
+        if not os.path.exists(path):
+            self._create(path, capacity)
+        self._open()
+        magic, self.capacity, self.count, segment, offset, self.next_id = INDEX_HEADER.unpack_from(self._map, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{path} is not a chain log index")
+        self.covered = (segment, offset)
+
+    @staticmethod
+    def _create(path: str, capacity: int) -> None:
+        with open(path, "wb") as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, capacity, 0, 0, 0, 1).ljust(INDEX_HEADER_SIZE, b"\0"))
+            f.truncate(INDEX_HEADER_SIZE + capacity * INDEX_SLOT.size)
+
+    def _open(self) -> None:
+        self._file = open(self.path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def close(self) -> None:
+        self._write_header()
+        self._map.close()
+        self._file.close()
+
+    def flush(self) -> None:
+        self._write_header()
+        self._map.flush()
+
+    def _write_header(self) -> None:
+        INDEX_HEADER.pack_into(self._map, 0, INDEX_MAGIC, self.capacity, self.count, *self.covered, self.next_id)
+
+    def _slot(self, key: int) -> Tuple[int, int]:
+        """Return (slot position, stored key) of the slot holding ``key`` or the empty slot it would go in."""
+        mask = self.capacity - 1
+        index = key & mask
+        while True:
+            position = INDEX_HEADER_SIZE + index * INDEX_SLOT.size
+            stored = struct.unpack_from("<Q", self._map, position)[0]
+            if stored == key or stored == 0:
+                return position, stored
+            index = (index + 1) & mask
+
+    def get(self, key: int) -> Optional[Tuple[int, int]]:
+        position, stored = self._slot(key)
+        if stored == 0:
+            return None
+        _, segment, offset = INDEX_SLOT.unpack_from(self._map, position)
+        return segment, offset
+
+    def put(self, key: int, segment: int, offset: int) -> None:
+        position, stored = self._slot(key)
+        INDEX_SLOT.pack_into(self._map, position, key, segment, offset)
+        if stored == 0:
+            self.count += 1
+            if self.count * 2 > self.capacity:
+                self._grow()
+
+    def items(self) -> Iterator[Tuple[int, int, int]]:
+        for index in range(self.capacity):
+            key, segment, offset = INDEX_SLOT.unpack_from(self._map, INDEX_HEADER_SIZE + index * INDEX_SLOT.size)
+            if key:
+                yield key, segment, offset
+
+    def _grow(self) -> None:
+        entries = list(self.items())
+        tmp_path = self.path + ".tmp"
+        self._create(tmp_path, self.capacity * 2)
+        bigger = HashIndex(tmp_path)
+        for key, segment, offset in entries:
+            bigger.put(key, segment, offset)
+        bigger.covered, bigger.next_id = self.covered, self.next_id
+        bigger.close()
+        self._map.close()
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._open()
+        self.capacity *= 2
+
+
+class ChainLog:
+    """
+    Segmented append-only log of chain JSON with O(1) lookups.
+
+    Each record is a fixed header (payload length, CRC32, chain id, question
+    hash) followed by the chain's JSON bytes, which are served as-is. The
+    active segment rolls over after ``segment_bytes``. Sealed segments are
+    read through cached memory maps and the active one is remapped as it
+    grows. ``compact`` rewrites sealed segments keeping only the latest
+    chain per question. The directory is locked for the log's lifetime.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024, fsync: bool = False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        # Before replay, which may truncate the active segment
+        self._directory_lock = _lock_directory(directory)
+        self._lock = threading.Lock()
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._open_indexes()
+        segments = self._segments()
+        self._active = segments[-1] if segments else 1
+        self._replay(min(self._by_id.covered, self._by_question.covered))
+        self._writer = open(self._segment_path(self._active), "ab", buffering=0)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment:06d}.log")
+
+    def _segments(self) -> List[int]:
+        return sorted(
+            int(match.group(1))
+            for match in map(_SEGMENT_PATTERN.match, os.listdir(self.directory))
+            if match
+        )
+
+    def _open_indexes(self) -> None:
+        self._by_id = HashIndex(os.path.join(self.directory, "by_id.idx"))
+        self._by_question = HashIndex(os.path.join(self.directory, "by_question.idx"))
+
+    def _index(self, chain_id: int, key: int, segment: int, offset: int, end: int) -> None:
+        self._by_id.put(chain_id, segment, offset)
+        self._by_question.put(key, segment, offset)
+        for index in (self._by_id, self._by_question):
+            index.covered = (segment, end)
+            index.next_id = max(index.next_id, chain_id + 1)
+
+    def _scan(self, segment: int, start: int = 0) -> Iterator[Tuple[int, int, int, int, int]]:
+        """Yield (offset, end, chain id, question hash, payload length) for intact records from ``start``."""
+        path = self._segment_path(segment)
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            f.seek(start)
+            offset = start
+            while offset + RECORD_HEADER.size <= size:
+                length, crc, chain_id, key = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+                end = offset + RECORD_HEADER.size + length
+                yield offset, end, chain_id, key, length
+                offset = end
+
+    def _replay(self, covered: Tuple[int, int]) -> None:
+        """Index records written after ``covered`` and cut off a torn write at the end of the log."""
+        for segment in self._segments():
+            if segment < covered[0]:
+                continue
+            intact = covered[1] if segment == covered[0] else 0
+            for offset, intact, chain_id, key, _ in self._scan(segment, intact):
+                self._index(chain_id, key, segment, offset, intact)
+            if segment == self._active and intact < os.path.getsize(self._segment_path(segment)):
+                os.truncate(self._segment_path(segment), intact)
+        self._flush_indexes()
+
+    def _flush_indexes(self) -> None:
+        self._by_id.flush()
+        self._by_question.flush()
+
+    @property
+    def next_id(self) -> int:
+        return self._by_id.next_id
+
+    def append(self, question: str, deployment: str, payload: bytes) -> int:
+        """Append a chain's JSON and return its id. Blocking; call it from a thread in async code."""
+        key = question_hash(question, deployment)
+        with self._lock:
+            if self._writer.tell() >= self.segment_bytes:
+                self._writer.close()
+                self._active += 1
+                self._writer = open(self._segment_path(self._active), "ab", buffering=0)
+            chain_id = self.next_id
+            offset = self._writer.tell()
+            self._writer.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload), chain_id, key) + payload)
+            if self.fsync:
+                os.fsync(self._writer.fileno())
+            self._index(chain_id, key, self._active, offset, offset + RECORD_HEADER.size + len(payload))
+        return chain_id
+
+    def _read(self, location: Optional[Tuple[int, int]]) -> Optional[Tuple[int, memoryview]]:
+        if location is None:
+            return None
+        segment, offset = location
+        # Maps are dropped rather than closed: views handed out may still point into them
+        segment_map = self._maps.get(segment)
+        if segment_map is None or offset + RECORD_HEADER.size > len(segment_map):
+            with open(self._segment_path(segment), "rb") as f:
+                segment_map = self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        length, _, chain_id, _ = RECORD_HEADER.unpack_from(segment_map, offset)
+        start = offset + RECORD_HEADER.size
+        if start + length > len(segment_map):
+            # Written after the active segment was mapped
+            del self._maps[segment]
+            return self._read(location)
+        return chain_id, memoryview(segment_map)[start:start + length]
+
+    def get(self, chain_id: int) -> Optional[Tuple[int, memoryview]]:
+        """
+        (id, JSON bytes) of a chain by id, the bytes as a view into the mapped
+        segment. Waits for a running append, so async code calls it from a thread.
+        """
+        with self._lock:
+            return self._read(self._by_id.get(chain_id))
+
+    def latest(self, question: str, deployment: str) -> Optional[Tuple[int, memoryview]]:
+        """(id, JSON bytes) of the most recent chain for a question; like ``get``."""
+        with self._lock:
+            return self._read(self._by_question.get(question_hash(question, deployment)))
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Rewrite sealed segments keeping only the latest chain per question,
+        then rebuild both indexes. Ids of dropped chains stop resolving.
+        Only the process that owns the directory can compact it, and appends
+        and lookups wait until it is done.
+        """
+        removed = kept = 0
+        with self._lock:
+            latest_ids = {}
+            for segment in self._segments():
+                for _, _, chain_id, key, _ in self._scan(segment):
+                    latest_ids[key] = chain_id
+            self._maps.clear()
+            for segment in self._segments():
+                if segment == self._active:
+                    continue
+                path = self._segment_path(segment)
+                tmp_path = path + ".tmp"
+                with open(path, "rb") as source, open(tmp_path, "wb") as target:
+                    for offset, end, chain_id, key, _ in self._scan(segment):
+                        source.seek(offset)
+                        record = source.read(end - offset)
+                        if latest_ids[key] == chain_id:
+                            target.write(record)
+                            kept += 1
+                        else:
+                            removed += 1
+                    target.flush()
+                    os.fsync(target.fileno())
+                    empty = target.tell() == 0
+                if empty:
+                    os.remove(tmp_path)
+                    os.remove(path)
+                else:
+                    os.replace(tmp_path, path)
+
+            next_id = self.next_id
+            for index in (self._by_id, self._by_question):
+                index.close()
+                os.remove(index.path)
+            self._open_indexes()
+            self._by_id.next_id = self._by_question.next_id = next_id
+            self._replay((0, 0))
+        return {"kept": kept, "removed": removed}
+
+    def close(self) -> None:
+        with self._lock:
+            self._writer.close()
+            self._maps.clear()
+            self._by_id.close()
+            self._by_question.close()
+            self._directory_lock.close()
+
+    def stats_dict(self) -> Dict[str, int]:
+        return {
+            "segments": len(self._segments()),
+            "active_segment": self._active,
+            "chains": self._by_id.count,
+            "questions": self._by_question.count,
+            "next_id": self.next_id,
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain a reasoning-chain log.")
+    parser.add_argument("command", choices=["compact", "stats"])
+    parser.add_argument("directory")
+    args = parser.parse_args(argv)
+
+    try:
+        log = ChainLog(args.directory)
+    except ChainLogLocked as e:
+        print(f"{e}; stop the server before running {args.command}", file=sys.stderr)
+        return 1
+    try:
+        result = log.compact() if args.command == "compact" else log.stats_dict()
+    finally:
+        log.close()
+    print(result, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
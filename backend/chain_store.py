@@ -0,0 +1,210 @@
+import json
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from chain_analysis import LOW_CONFIDENCE_THRESHOLD, StepColumns, analyze_columns
+
+
+class StringTable:
+    """Interned strings: each distinct string is stored once and referred to by an int id."""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def intern(self, value: str) -> int:
+        index = self._ids.get(value)
+        if index is None:
+            index = len(self.strings)
+            self._ids[value] = index
+            self.strings.append(value)
+        return index
+
+    def __getitem__(self, index: int) -> str:
+        return self.strings[index]
+
+
+def _view(column: array, dtype) -> np.ndarray:
+    """
+    Zero-copy NumPy view of an array.array column. While a view is alive the
+    column cannot grow (append raises BufferError), so views stay inside the
+    methods that use them and are never handed out.
+    """
+    return np.frombuffer(column, dtype=dtype) if len(column) else np.zeros(0, dtype=dtype)
+
+
+class ChainStore:
+    """
+    Columnar container for many reasoning chains.
+
+    Steps of all chains live in flat columns: float32 confidences, int32 ids
+    into interned string tables for thoughts, supporting facts and next
+    steps, and int64 offset arrays marking where each chain's steps and each
+    step's lists begin. Chains are appended with ``append``/``extend`` and
+    rebuilt on demand with ``step_factory``/``chain_factory`` (the pydantic
+    or dataclass models), while filters and aggregates run on NumPy views of
+    the columns without materializing any chain. Confidences are kept at
+    float32 precision.
+    """
+
+    def __init__(self, step_factory: Callable[..., Any], chain_factory: Callable[..., Any]):
+        self.step_factory = step_factory
+        self.chain_factory = chain_factory
+        self.strings = StringTable()
+        self._questions = array("i")
+        self._final_answers = array("i")
+        self._metadata: List[bytes] = []
+        self._step_offsets = array("q", [0])
+        self._confidence = array("f")
+        self._thoughts = array("i")
+        self._fact_offsets = array("q", [0])
+        self._facts = array("i")
+        self._next_offsets = array("q", [0])
+        self._next_steps = array("i")
+
+    @classmethod
+    def from_chains(cls, chains: Iterable[Any], step_factory: Callable[..., Any], chain_factory: Callable[..., Any]) -> "ChainStore":
+        store = cls(step_factory, chain_factory)
+        store.extend(chains)
+        return store
+
+    def __len__(self) -> int:
+        return len(self._questions)
+
+    @property
+    def num_steps(self) -> int:
+        return len(self._confidence)
+
+    def append(self, chain: Any) -> int:
+        """Add a chain and return its index."""
+        intern = self.strings.intern
+        self._questions.append(intern(chain.question))
+        self._final_answers.append(intern(chain.final_answer))
+        self._metadata.append(json.dumps(chain.metadata or {}, separators=(",", ":")).encode("utf-8"))
+        for step in chain.steps:
+            self._confidence.append(step.confidence)
+            self._thoughts.append(intern(step.thought))
+            self._facts.extend(intern(fact) for fact in step.supporting_facts)
+            self._fact_offsets.append(len(self._facts))
+            self._next_steps.extend(intern(next_step) for next_step in step.next_steps)
+            self._next_offsets.append(len(self._next_steps))
+        self._step_offsets.append(len(self._confidence))
+        return len(self._questions) - 1
+
+    def extend(self, chains: Iterable[Any]) -> None:
+        for chain in chains:
+            self.append(chain)
+
+    def get(self, index: int) -> Any:
+        """Rebuild chain ``index`` as a ``chain_factory`` object."""
+        strings = self.strings.strings
+        steps = []
+        for step in range(self._step_offsets[index], self._step_offsets[index + 1]):
+            steps.append(self.step_factory(
+                thought=strings[self._thoughts[step]],
+                supporting_facts=[strings[i] for i in self._facts[self._fact_offsets[step]:self._fact_offsets[step + 1]]],
+                # Shortest decimal that round-trips through float32, so 0.9 comes back as 0.9
+                confidence=float(str(np.float32(self._confidence[step]))),
+                next_steps=[strings[i] for i in self._next_steps[self._next_offsets[step]:self._next_offsets[step + 1]]],
+            ))
+        return self.chain_factory(
+            question=strings[self._questions[index]],
+            steps=steps,
+            final_answer=strings[self._final_answers[index]],
+            metadata=json.loads(self._metadata[index]),
+        )
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("chain index out of range")
+        return self.get(index)
+
+    def __iter__(self) -> Iterator[Any]:
+        return (self.get(index) for index in range(len(self)))
+
+    def to_chains(self, indices: Optional[Sequence[int]] = None) -> List[Any]:
+        """Materialize the given chains (all of them by default)."""
+        return [self.get(int(index)) for index in (range(len(self)) if indices is None else indices)]
+
+    # Copies of the columns, so callers can keep them across appends
+
+    @property
+    def confidence(self) -> np.ndarray:
+        return _view(self._confidence, np.float32).copy()
+
+    @property
+    def step_offsets(self) -> np.ndarray:
+        return _view(self._step_offsets, np.int64).copy()
+
+    def lengths(self) -> np.ndarray:
+        return np.diff(_view(self._step_offsets, np.int64))
+
+    def _reduce_confidence(self, ufunc: np.ufunc, empty: float) -> np.ndarray:
+        result = np.full(len(self), empty, dtype=np.float32)
+        lengths = self.lengths()
+        non_empty = lengths > 0
+        if non_empty.any():
+            offsets = _view(self._step_offsets, np.int64)[:-1][non_empty]
+            result[non_empty] = ufunc.reduceat(_view(self._confidence, np.float32), offsets)
+        return result
+
+    def min_confidence(self) -> np.ndarray:
+        """Lowest step confidence per chain (+inf for chains without steps)."""
+        return self._reduce_confidence(np.minimum, np.inf)
+
+    def max_confidence(self) -> np.ndarray:
+        """Highest step confidence per chain (-inf for chains without steps)."""
+        return self._reduce_confidence(np.maximum, -np.inf)
+
+    def any_step_below(self, threshold: float) -> np.ndarray:
+        """Indices of chains with at least one step below ``threshold`` confidence."""
+        return np.flatnonzero(self.min_confidence() < np.float32(threshold))
+
+    def all_steps_at_least(self, threshold: float) -> np.ndarray:
+        """Indices of non-empty chains whose every step has at least ``threshold`` confidence."""
+        minimum = self.min_confidence()
+        return np.flatnonzero((minimum >= np.float32(threshold)) & np.isfinite(minimum))
+
+    def step_columns(self) -> StepColumns:
+        """The columns chain_analysis.analyze_columns works on."""
+        return StepColumns(
+            lengths=self.lengths(),
+            confidence=_view(self._confidence, np.float32).astype(np.float64),
+            fact_counts=np.diff(_view(self._fact_offsets, np.int64)),
+            next_step_counts=np.diff(_view(self._next_offsets, np.int64)),
+        )
+
+    def finish_reasons(self) -> List[Optional[str]]:
+        return [json.loads(metadata).get("finish_reason") for metadata in self._metadata]
+
+    def analyze(self, low_confidence_threshold: float = LOW_CONFIDENCE_THRESHOLD) -> Dict[str, Any]:
+        """Run chain_analysis over every stored chain without materializing them."""
+        # Compare at the stored precision so a step at exactly the threshold is not "below" it
+        threshold = float(np.float32(low_confidence_threshold))
+        return analyze_columns(self.step_columns(), threshold, self.finish_reasons())
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the columns, metadata and string table."""
+        columns = (
+            self._questions, self._final_answers, self._step_offsets, self._confidence, self._thoughts,
+            self._fact_offsets, self._facts, self._next_offsets, self._next_steps,
+        )
+        total = sum(column.itemsize * len(column) for column in columns)
+        total += sum(len(metadata) for metadata in self._metadata)
+        total += sum(len(value.encode("utf-8")) for value in self.strings.strings)
+        return total
+
+    def stats_dict(self) -> Dict[str, Any]:
+        return {
+            "chains": len(self),
+            "steps": self.num_steps,
+            "strings": len(self.strings),
+            "memory_bytes": self.memory_bytes(),
+        }
@@ -0,0 +1,131 @@
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Tuple
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose circuit is open."""
+
+    def __init__(self, retry_after: float, message: str = "Circuit open"):
+        super().__init__(f"{message}; retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker over a rolling window of recent calls.
+
+    The circuit opens when, over at least ``min_calls`` of the last
+    ``window`` calls, the failure rate reaches ``failure_rate_threshold`` or
+    the share of calls slower than ``slow_call_seconds`` reaches
+    ``slow_call_rate_threshold``. After ``open_seconds`` it lets
+    ``half_open_probes`` calls through; if they all succeed it closes,
+    otherwise it opens again. Every transition is counted.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        slow_call_rate_threshold: float = 1.0,
+        slow_call_seconds: float = 60.0,
+        window: int = 20,
+        min_calls: int = 5,
+        open_seconds: float = 30.0,
+        half_open_probes: int = 1,
+    ):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.transitions: Counter = Counter()
+        self.rejected = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._calls: Deque[Tuple[bool, bool]] = deque(maxlen=window)
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    def _transition(self, state: str) -> None:
+        self.transitions[f"{self._state}->{state}"] += 1
+        self._state = state
+        if state == self.OPEN:
+            self._opened_at = time.monotonic()
+        elif state == self.HALF_OPEN:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        else:
+            self._calls.clear()
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._transition(self.HALF_OPEN)
+        return self._state
+
+    def available(self) -> bool:
+        """Whether a call would currently be let through."""
+        state = self.state
+        if state == self.OPEN:
+            return False
+        if state == self.HALF_OPEN:
+            return self._probes_in_flight < self.half_open_probes
+        return True
+
+    def retry_after(self) -> float:
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+
+    def before_call(self) -> None:
+        """Claim a slot for a call; raise CircuitOpenError if none is available."""
+        if not self.available():
+            self.rejected += 1
+            raise CircuitOpenError(self.retry_after())
+        if self._state == self.HALF_OPEN:
+            self._probes_in_flight += 1
+
+    def release(self) -> None:
+        """Give back a slot for a call that ended without an outcome (e.g. cancelled)."""
+        if self._state == self.HALF_OPEN and self._probes_in_flight > 0:
+            self._probes_in_flight -= 1
+
+    def record(self, success: bool, latency: float) -> None:
+        slow = latency >= self.slow_call_seconds
+        if self._state == self.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if not success or slow:
+                self._transition(self.OPEN)
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._transition(self.CLOSED)
+            return
+        if self._state == self.OPEN:
+            # Outcome of a call admitted before the circuit opened
+            return
+
+        self._calls.append((success, slow))
+        if len(self._calls) < self.min_calls:
+            return
+        failures = sum(1 for ok, _ in self._calls if not ok)
+        slow_calls = sum(1 for _, was_slow in self._calls if was_slow)
+        if (failures / len(self._calls) >= self.failure_rate_threshold
+                or slow_calls / len(self._calls) >= self.slow_call_rate_threshold):
+            self._transition(self.OPEN)
+
+    def stats_dict(self) -> Dict[str, Any]:
+        calls = len(self._calls)
+        return {
+            "state": self.state,
+            "retry_after": self.retry_after(),
+            "rejected": self.rejected,
+            "failure_rate": sum(1 for ok, _ in self._calls if not ok) / calls if calls else 0.0,
+            "slow_call_rate": sum(1 for _, slow in self._calls if slow) / calls if calls else 0.0,
+            "transitions": dict(self.transitions),
+        }
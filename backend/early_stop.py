@@ -0,0 +1,126 @@
+import re
+import time
+from typing import Dict, Iterable, Optional
+
+_FINAL_ANSWER_MARKER = re.compile(r"final answer:", re.IGNORECASE)
+_MARKER_LENGTH = len("final answer:")
+
+
+class EarlyStopPolicy:
+    """
+    When to stop reading a streamed completion: once the final answer line is
+    complete (``final_answer``), once ``max_steps`` steps have been parsed, or
+    once a step reaches ``min_confidence``. The step and confidence conditions
+    end the chain where it is, so the final answer is usually empty; they are
+    off by default.
+    """
+
+    def __init__(self, final_answer: bool = True, max_steps: int = 0, min_confidence: Optional[float] = None):
+        self.final_answer = final_answer
+        self.max_steps = max_steps
+        self.min_confidence = min_confidence
+
+    @property
+    def enabled(self) -> bool:
+        return self.final_answer or self.max_steps > 0 or self.min_confidence is not None
+
+    def watcher(self) -> "EarlyStopWatcher":
+        return EarlyStopWatcher(self)
+
+
+class EarlyStopWatcher:
+    """
+    Follows one streamed completion and reports the first stop condition it
+    meets. Meeting a condition is not yet a saving: the stream is only cut
+    (``stopped``) once content beyond the stop point arrives, which the
+    caller reports through ``after_stop``.
+    """
+
+    def __init__(self, policy: EarlyStopPolicy):
+        self.policy = policy
+        self.reason: Optional[str] = None
+        self.stopped = False
+        self.chunks = 0
+        self.steps = 0
+        # Only the last few characters are kept while looking for the marker
+        self._tail = ""
+        self._in_answer = False
+        self._answer_started = False
+        self._first_chunk_at: Optional[float] = None
+
+    def feed(self, chunk: str, confidences: Iterable[float], in_object: bool) -> Optional[str]:
+        """
+        Add a content chunk and the confidences of the steps that closed in
+        it; ``in_object`` says whether a JSON object is still open, in which
+        case "Final Answer:" is part of a step rather than the answer.
+        Returns the stop reason once one applies.
+        """
+        if self.reason is not None:
+            return self.reason
+        if self._first_chunk_at is None:
+            self._first_chunk_at = time.perf_counter()
+        self.chunks += 1
+
+        policy = self.policy
+        for confidence in confidences:
+            self.steps += 1
+            if policy.min_confidence is not None and confidence >= policy.min_confidence:
+                self.reason = "confidence"
+            elif policy.max_steps and self.steps >= policy.max_steps:
+                self.reason = "max_steps"
+            if self.reason is not None:
+                return self.reason
+
+        if policy.final_answer:
+            answer = chunk
+            if not self._in_answer:
+                # Search from the kept tail in case the marker was split across chunks
+                text = self._tail + chunk
+                match = None if in_object else _FINAL_ANSWER_MARKER.search(text)
+                if match is None:
+                    self._tail = text[-_MARKER_LENGTH:]
+                    return None
+                self._in_answer = True
+                self._tail = ""
+                answer = text[match.end():]
+            if not self._answer_started:
+                answer = answer.lstrip()
+                self._answer_started = bool(answer)
+            if self._answer_started and "\n" in answer:
+                self.reason = "final_answer"
+        return self.reason
+
+    def after_stop(self, chunk: str) -> bool:
+        """
+        Add a content chunk that arrived after the stop condition was met.
+        Returns True, and marks the stream as stopped, once it has anything
+        but whitespace, i.e. once cutting the stream actually saves output.
+        """
+        if chunk.strip():
+            self.stopped = True
+        return self.stopped
+
+    def summary(self, max_tokens: int, upstream_finish_reason: Optional[str]) -> Dict:
+        """
+        Metadata for a stream that met a stop condition. When it was cut, the
+        model might have finished sooner than max_tokens, so the savings are
+        upper bounds and the time saved assumes the observed token rate (one
+        chunk is roughly one token). When the model finished on its own right
+        after the condition, nothing was saved and the savings are null.
+        """
+        summary = {
+            "reason": self.reason,
+            "stopped": self.stopped,
+            "upstream_finish_reason": upstream_finish_reason,
+            "steps": self.steps,
+            "completion_tokens": self.chunks,
+            "tokens_saved_upper_bound": None,
+            "seconds_saved_upper_bound": None,
+        }
+        if self.stopped:
+            tokens_saved = max(0, max_tokens - self.chunks)
+            elapsed = time.perf_counter() - self._first_chunk_at if self._first_chunk_at is not None else 0.0
+            rate = self.chunks / elapsed if elapsed > 0 else 0.0
+            summary["tokens_saved_upper_bound"] = tokens_saved
+            summary["seconds_saved_upper_bound"] = tokens_saved / rate if rate else None
+        return summary
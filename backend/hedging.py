@@ -0,0 +1,77 @@
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Any, Deque, Dict
+
+
+@dataclass
+class HedgeStats:
+    requests: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    budget_denied: int = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class HedgePolicy:
+    """
+    Decide when to send a duplicate request and whether the budget allows it.
+
+    The hedge delay tracks the ``percentile`` of recently observed
+    time-to-first-token (falling back to ``initial_delay`` until
+    ``min_samples`` have been seen, and never going below ``min_delay``).
+    The budget works like a retry budget: every request earns
+    ``max_ratio`` of a hedge, up to ``burst`` saved hedges, and each hedge
+    spends one, so hedges stay below ``max_ratio`` of traffic.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.9,
+        max_ratio: float = 0.05,
+        initial_delay: float = 2.0,
+        min_delay: float = 0.1,
+        min_samples: int = 20,
+        burst: float = 10.0,
+        window: int = 1000,
+    ):
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.burst = burst
+        self.stats = HedgeStats()
+        self._credits = 0.0
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def observe_first_token(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def delay(self) -> float:
+        """Seconds to wait for a first token before hedging."""
+        if len(self._samples) < self.min_samples:
+            return self.initial_delay
+        ordered = sorted(self._samples)
+        value = ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+        return max(self.min_delay, value)
+
+    def start_request(self) -> None:
+        self.stats.requests += 1
+        self._credits = min(self.burst, self._credits + self.max_ratio)
+
+    def try_hedge(self) -> bool:
+        """Spend one hedge from the budget if there is one."""
+        if self._credits < 1.0:
+            self.stats.budget_denied += 1
+            return False
+        self._credits -= 1.0
+        self.stats.hedges += 1
+        return True
+
+    def stats_dict(self) -> Dict[str, Any]:
+        stats = self.stats.to_dict()
+        stats["delay"] = self.delay()
+        stats["hedge_rate"] = self.stats.hedges / self.stats.requests if self.stats.requests else 0.0
+        return stats
@@ -4,6 +4,7 @@ from dataclasses import dataclass
 import neo4j
 from neo4j import GraphDatabase
 from datetime import datetime
+from tracing import span
 
 @dataclass
 class KnowledgeGraphConfig:
@@ -51,52 +52,60 @@ class RepositoryQASystem:
         Generate Cypher query from natural language question
         Implements the Query Generator component
         """
-        # Template for query generation prompt
-        prompt = f"""
-        Given this question about a software repository: {question}
-        Generate a Cypher query to retrieve the relevant information.
-        The knowledge graph has the following schema:
-        - Nodes: Commit, User, Issue, File
-        - Relationships: AUTHOR_OF, FIXED, INTRODUCES, CHANGES
-        """
-        
-        # Call LLM API to generate query
-        # Implementation would use actual LLM API
-        query = "MATCH ..."  # Placeholder
-        return query
+        with span("kg.generate_query") as stage_span:
+            # Template for query generation prompt
+            prompt = f"""
+            Given this question about a software repository: {question}
+            Generate a Cypher query to retrieve the relevant information.
+            The knowledge graph has the following schema:
+            - Nodes: Commit, User, Issue, File
+            - Relationships: AUTHOR_OF, FIXED, INTRODUCES, CHANGES
+            """
+            
+            # Call LLM API to generate query
+            # Implementation would use actual LLM API
+            query = "MATCH ..."  # Placeholder
+            stage_span.set_attributes(prompt_tokens_estimate=len(prompt) // 4, query_chars=len(query))
+            return query
         
     def execute_query(self, query: str) -> List:
         """
         Execute Cypher query and return results
         Implements the Query Executor component
         """
-        with self.driver.session() as session:
-            result = session.run(query)
-            return [record.data() for record in result]
+        with span("kg.execute_query", query_chars=len(query)) as stage_span:
+            with self.driver.session() as session:
+                result = session.run(query)
+                rows = [record.data() for record in result]
+            stage_span.set_attribute("row_count", len(rows))
+            return rows
             
     def generate_response(self, question: str, query_result: List) -> str:
         """
         Generate natural language response from query results
         Implements the Response Generator component
         """
-        # Template for response generation prompt
-        prompt = f"""
-        Question: {question}
-        Data from repository: {query_result}
-        Generate a natural language response to the question.
-        """
-        
-        # Call LLM API to generate response
-        # Implementation would use actual LLM API
-        response = "The analysis shows..."  # Placeholder
-        return response
+        with span("kg.generate_response", row_count=len(query_result)) as stage_span:
+            # Template for response generation prompt
+            prompt = f"""
+            Question: {question}
+            Data from repository: {query_result}
+            Generate a natural language response to the question.
+            """
+            
+            # Call LLM API to generate response
+            # Implementation would use actual LLM API
+            response = "The analysis shows..."  # Placeholder
+            stage_span.set_attributes(prompt_tokens_estimate=len(prompt) // 4, response_chars=len(response))
+            return response
         
     def answer_question(self, question: str) -> str:
         """Main method to process a question and generate an answer"""
-        query = self.generate_query(question)
-        results = self.execute_query(query)
-        response = self.generate_response(question, results)
-        return response
+        with span("kg.answer_question", question_chars=len(question)):
+            query = self.generate_query(question)
+            results = self.execute_query(query)
+            response = self.generate_response(question, results)
+            return response
         
     def close(self):
         """Clean up resources"""
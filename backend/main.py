@@ -1,14 +1,48 @@
 # main.py
-from fastapi import FastAPI, HTTPException
+from contextlib import aclosing, asynccontextmanager
+from dataclasses import dataclass, field
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import TYPE_CHECKING, Any, Awaitable, List, Dict, Optional, AsyncIterator, Callable, Tuple, TypeVar, Union
+import asyncio
+import json
+import math
 import os
+import tempfile
+import time
+import httpx
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from backends import Backend, BackendPool
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from early_stop import EarlyStopPolicy, EarlyStopWatcher
+from cache import ResponseCache, make_cache_key
+from chain_analysis import LOW_CONFIDENCE_THRESHOLD, analyze_chain, analyze_chains
+from chain_log import ChainLog, ChainLogLocked
+from hedging import HedgePolicy
+from metrics import REGISTRY, MetricsMiddleware, TimedRoute, record_stage, record_upstream, stage
+from rate_limit import RateLimitExceeded, RateLimitScheduler, SharedRateLimitState, estimate_tokens
+from self_consistency import vote
+from serialization import FastJSONResponse, dumps, encoded_response
+from singleflight import SingleFlight
+from step_parser import (
+    ParseStats,
+    ThoughtStepParser,
+    extract_final_answer,
+    parse_structured_output,
+    parse_thought_steps,
+    strict_json_schema,
+)
+from tracing import TracingMiddleware, load_exporter, set_exporter, span
+
+if TYPE_CHECKING:
+    from openai import AsyncAzureOpenAI
+    from semantic_cache import SemanticCache
 
-# Load environment variables
-load_dotenv()
+MAX_SAMPLES = 16
+
+T = TypeVar("T")
 
 class ThoughtStep(BaseModel):
     thought: str
@@ -22,11 +56,278 @@ class ReasoningChain(BaseModel):
     final_answer: str
     metadata: Dict
 
+class ReasoningOutput(BaseModel):
+    """The part of a ReasoningChain the model writes itself, requested as structured output."""
+    steps: List[ThoughtStep]
+    final_answer: str
+
+# JSON-schema response_format derived from the models above
+STRUCTURED_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "reasoning_chain",
+        "strict": True,
+        "schema": strict_json_schema(ReasoningOutput.model_json_schema())
+    }
+}
+
 class QuestionRequest(BaseModel):
     question: str
+    bypass_cache: bool = False
+    # Sample this many chains in one completion request and majority-vote the final answer
+    samples: int = Field(default=1, ge=1, le=MAX_SAMPLES)
+
+class BatchRequest(BaseModel):
+    requests: List[QuestionRequest]
+    concurrency: Optional[int] = None
+
+class AnalyzeRequest(BaseModel):
+    chains: List[ReasoningChain]
+    low_confidence_threshold: float = LOW_CONFIDENCE_THRESHOLD
+
+def _build_http_client() -> httpx.AsyncClient:
+    """Create the shared keep-alive connection pool used for all Azure calls."""
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("AZURE_HTTP_MAX_CONNECTIONS", "200")),
+        max_keepalive_connections=int(os.getenv("AZURE_HTTP_MAX_KEEPALIVE", "50")),
+        keepalive_expiry=float(os.getenv("AZURE_HTTP_KEEPALIVE_EXPIRY", "30")),
+    )
+    timeout = httpx.Timeout(
+        float(os.getenv("AZURE_HTTP_TIMEOUT", "120")),
+        connect=float(os.getenv("AZURE_HTTP_CONNECT_TIMEOUT", "10")),
+        pool=float(os.getenv("AZURE_HTTP_POOL_TIMEOUT", "30")),
+    )
+    return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+def _build_client(http_client: httpx.AsyncClient, config: Optional[Dict] = None) -> "AsyncAzureOpenAI":
+    """Create an async Azure OpenAI client on top of the shared pool."""
+    # The SDK is imported on startup rather than with the module, which keeps imports fast
+    from openai import AsyncAzureOpenAI
+
+    config = config or {}
+    api_key = config.get("api_key")
+    if api_key is None and config.get("api_key_env"):
+        api_key = os.getenv(config["api_key_env"])
+    return AsyncAzureOpenAI(
+        api_key=api_key or os.getenv("AZURE_OPENAI_API_KEY"),
+        api_version=config.get("api_version") or os.getenv("AZURE_OPENAI_API_VERSION", "2024-08-01-preview"),
+        azure_endpoint=config.get("endpoint") or os.getenv("AZURE_OPENAI_ENDPOINT"),
+        # Each backend's scheduler retries within its token budget;
+        # AZURE_OPENAI_MAX_RETRIES adds SDK retries on top of that
+        max_retries=int(os.getenv("AZURE_OPENAI_MAX_RETRIES", "0")),
+        http_client=http_client
+    )
+
+def _build_cache() -> Optional[ResponseCache]:
+    """Create the response cache, or None when RESPONSE_CACHE_SIZE is 0."""
+    max_entries = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+    if max_entries <= 0:
+        return None
+    return ResponseCache(
+        max_entries=max_entries,
+        ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+        path=os.getenv("RESPONSE_CACHE_PATH"),
+        disk_max_rows=int(os.getenv("RESPONSE_CACHE_DISK_MAX_ROWS", "100000")),
+        stale_ttl=float(os.getenv("RESPONSE_CACHE_STALE_TTL", "86400")),
+        encode=lambda chain: chain.model_dump_json(),
+        decode=ReasoningChain.model_validate_json
+    )
+
+def _build_rate_limit_state() -> Optional[SharedRateLimitState]:
+    """Open the rate-limit state shared by worker processes at RATE_LIMIT_STATE_PATH, or None when it is not set."""
+    path = os.getenv("RATE_LIMIT_STATE_PATH")
+    return SharedRateLimitState(path) if path else None
+
+def _build_scheduler(
+    config: Optional[Dict] = None,
+    name: str = "default",
+    shared_state: Optional[SharedRateLimitState] = None
+) -> RateLimitScheduler:
+    """Create a rate-limit scheduler from a backend's rpm/tpm or the AZURE_RPM/AZURE_TPM budgets."""
+    config = config or {}
+    rpm = config.get("rpm") or os.getenv("AZURE_RPM")
+    tpm = config.get("tpm") or os.getenv("AZURE_TPM")
+    return RateLimitScheduler(
+        requests_per_minute=float(rpm) if rpm else None,
+        tokens_per_minute=float(tpm) if tpm else None,
+        deadline=float(os.getenv("RATE_LIMIT_DEADLINE", "60")),
+        shared_state=shared_state,
+        name=name
+    )
+
+def _build_backends(
+    http_client: httpx.AsyncClient,
+    rate_limit_state: Optional[SharedRateLimitState] = None
+) -> BackendPool:
+    """
+    Build the backend pool. AZURE_BACKENDS holds a JSON list of
+    {"name", "endpoint", "api_key" | "api_key_env", "api_version",
+    "deployment", "weight", "rpm", "tpm"} objects; without it the single
+    AZURE_OPENAI_ENDPOINT / AZURE_DEPLOYMENT_NAME backend is used. Each
+    backend gets its own circuit breaker configured from CIRCUIT_*.
+    """
+    raw = os.getenv("AZURE_BACKENDS")
+    configs = json.loads(raw) if raw else [{}]
+    backends = []
+    for index, config in enumerate(configs):
+        name = config.get("name") or f"backend-{index}"
+        backends.append(Backend(
+            name=name,
+            client=_build_client(http_client, config),
+            deployment=config.get("deployment") or os.getenv("AZURE_DEPLOYMENT_NAME", "gpt-4o"),
+            weight=float(config.get("weight", 1.0)),
+            scheduler=_build_scheduler(config, name, rate_limit_state),
+            breaker=_build_breaker()
+        ))
+    return BackendPool(backends, strategy=os.getenv("BACKEND_ROUTING", "least_outstanding"))
+
+def _build_breaker() -> CircuitBreaker:
+    return CircuitBreaker(
+        failure_rate_threshold=float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5")),
+        slow_call_rate_threshold=float(os.getenv("CIRCUIT_SLOW_CALL_RATE", "1.0")),
+        slow_call_seconds=float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "60")),
+        window=int(os.getenv("CIRCUIT_WINDOW", "20")),
+        min_calls=int(os.getenv("CIRCUIT_MIN_CALLS", "5")),
+        open_seconds=float(os.getenv("CIRCUIT_OPEN_SECONDS", "30")),
+        half_open_probes=int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "1"))
+    )
+
+def _build_hedging() -> Optional[HedgePolicy]:
+    """Create the hedging policy when HEDGING_ENABLED is set; it only applies with 2+ backends."""
+    if os.getenv("HEDGING_ENABLED", "").lower() not in ("1", "true", "yes"):
+        return None
+    return HedgePolicy(
+        percentile=float(os.getenv("HEDGE_PERCENTILE", "0.9")),
+        max_ratio=float(os.getenv("HEDGE_MAX_RATIO", "0.05")),
+        initial_delay=float(os.getenv("HEDGE_INITIAL_DELAY", "2.0"))
+    )
+
+def _build_semantic_cache():
+    """
+    Create the semantic cache when SEMANTIC_CACHE_ENABLED is set; needs NumPy
+    and, for the default embedder, sentence-transformers. The threshold has
+    no default because it only means something for a given embedder.
+    """
+    if os.getenv("SEMANTIC_CACHE_ENABLED", "").lower() not in ("1", "true", "yes"):
+        return None
+    from semantic_cache import SemanticCache, load_embedder
+
+    threshold = os.getenv("SEMANTIC_CACHE_THRESHOLD")
+    if not threshold:
+        raise RuntimeError(
+            "SEMANTIC_CACHE_THRESHOLD must be set; calibrate it for SEMANTIC_CACHE_EMBEDDER "
+            "with benchmarks/semantic_calibration.py"
+        )
+    return SemanticCache(
+        embedder=load_embedder(os.getenv("SEMANTIC_CACHE_EMBEDDER", "sentence-transformers")),
+        threshold=float(threshold),
+        max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "10000")),
+        ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "3600")),
+        approximate_threshold=int(os.getenv("SEMANTIC_CACHE_APPROX_THRESHOLD", "100000"))
+    )
+
+def _build_early_stop() -> Optional[EarlyStopPolicy]:
+    """
+    Stop streamed completions early: once the final answer line is complete
+    (EARLY_STOP_FINAL_ANSWER, on by default), after EARLY_STOP_MAX_STEPS steps
+    or at a step with confidence >= EARLY_STOP_CONFIDENCE (both off by default).
+    """
+    confidence = os.getenv("EARLY_STOP_CONFIDENCE")
+    policy = EarlyStopPolicy(
+        final_answer=os.getenv("EARLY_STOP_FINAL_ANSWER", "1").lower() in ("1", "true", "yes"),
+        max_steps=int(os.getenv("EARLY_STOP_MAX_STEPS", "0")),
+        min_confidence=float(confidence) if confidence else None
+    )
+    return policy if policy.enabled else None
+
+def _build_chain_log() -> Optional[ChainLog]:
+    """Open the chain log in CHAIN_LOG_DIR, or None when it is not set."""
+    directory = os.getenv("CHAIN_LOG_DIR")
+    if not directory:
+        return None
+    try:
+        return ChainLog(
+            directory,
+            segment_bytes=int(os.getenv("CHAIN_LOG_SEGMENT_BYTES", str(64 * 1024 * 1024))),
+            fsync=os.getenv("CHAIN_LOG_FSYNC", "").lower() in ("1", "true", "yes")
+        )
+    except ChainLogLocked as e:
+        raise RuntimeError("CHAIN_LOG_DIR needs a single writer process; unset it or run one worker") from e
+
+async def _prewarm_backends(http_client: httpx.AsyncClient, backends: BackendPool) -> Dict[str, Dict]:
+    """
+    Open AZURE_PREWARM_CONNECTIONS keep-alive connections (DNS, TCP and TLS)
+    to every backend before the worker reports ready, so the first requests
+    do not pay for the handshakes. Any response, even a 404, leaves a warm
+    connection in the shared pool; failures are reported, not raised.
+    """
+    connections = int(os.getenv("AZURE_PREWARM_CONNECTIONS", "2"))
+    timeout = float(os.getenv("AZURE_PREWARM_TIMEOUT", "5"))
+    if connections <= 0:
+        return {}
+
+    async def warm(backend: Backend) -> Dict:
+        url = str(backend.client.base_url)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.gather(*(http_client.get(url) for _ in range(connections))), timeout)
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+        return {"connections": connections, "seconds": time.perf_counter() - started}
+
+    results = await asyncio.gather(*(warm(backend) for backend in backends.backends))
+    return {backend.name: result for backend, result in zip(backends.backends, results)}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Everything environment-dependent happens here rather than at import time,
+    # so importing the module is cheap and needs no configuration
+    load_dotenv()
+    app.state.batch_concurrency = int(os.getenv("BATCH_CONCURRENCY", "8"))
+    app.state.batch_max_concurrency = int(os.getenv("BATCH_MAX_CONCURRENCY", "64"))
+    app.state.fast_serialization = os.getenv("FAST_SERIALIZATION", "1").lower() in ("1", "true", "yes")
+    # Responses at least this large are compressed when the client accepts it; negative disables
+    app.state.compression_min_bytes = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "4096"))
+
+    # One connection pool per worker, opened on startup and drained on shutdown
+    exporter = load_exporter()
+    set_exporter(exporter)
+    http_client = _build_http_client()
+    rate_limit_state = _build_rate_limit_state()
+    backends = _build_backends(http_client, rate_limit_state)
+    cache = _build_cache()
+    chain_log = _build_chain_log()
+    app.state.reasoner = ChainOfThoughtReasoner(
+        deployment_name=os.getenv("AZURE_DEPLOYMENT_NAME", "gpt-4o"),
+        max_tokens=int(os.getenv("AZURE_MAX_TOKENS", "2000")),
+        cache=cache,
+        semantic_cache=_build_semantic_cache(),
+        backends=backends,
+        hedging=_build_hedging(),
+        early_stop=_build_early_stop(),
+        chain_log=chain_log,
+        structured_output=os.getenv("STRUCTURED_OUTPUT", "").lower() in ("1", "true", "yes")
+    )
+    app.state.prewarm = await _prewarm_backends(http_client, backends)
+    try:
+        yield
+    finally:
+        if cache is not None:
+            cache.close()
+        if chain_log is not None:
+            chain_log.close()
+        if rate_limit_state is not None:
+            rate_limit_state.close()
+        for backend in backends.backends:
+            await backend.client.close()
+        await http_client.aclose()
+        exporter.close()
 
 # Initialize FastAPI app
-app = FastAPI(title="Chain of Thought Reasoning API")
+app = FastAPI(title="Chain of Thought Reasoning API", lifespan=lifespan)
+app.router.route_class = TimedRoute
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 
 # Configure CORS
 app.add_middleware(
@@ -37,13 +338,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Azure OpenAI client
-client = AzureOpenAI(
-    api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-08-01-preview"),
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-)
-
 COT_PROMPT_TEMPLATE = """
 Question: {question}
 
@@ -66,113 +360,805 @@ After your chain of thought, provide a final answer starting with "Final Answer:
 Think it through step by step:
 """
 
+# With a JSON-schema response_format the schema carries the output format
+STRUCTURED_PROMPT_TEMPLATE = """
+Question: {question}
+
+Solve this step by step. For each step give your thought, the facts you rely on, your confidence (0-1) and next steps to explore, then give the final answer.
+"""
+
+SYSTEM_PROMPT = "You are a helpful AI that thinks through problems step by step."
+
+def _upstream_http_error(error: Exception) -> HTTPException:
+    """Map a failed upstream call to a response: 503 when every circuit is open, 429 when rate limited, else 500."""
+    if isinstance(error, CircuitOpenError):
+        status_code = 503
+    elif isinstance(error, RateLimitExceeded):
+        status_code = 429
+    else:
+        return HTTPException(status_code=500, detail=f"Reasoning failed: {str(error)}")
+    return HTTPException(
+        status_code=status_code,
+        detail=f"Reasoning failed: {str(error)}",
+        headers={"Retry-After": str(math.ceil(error.retry_after))}
+    )
+
+@dataclass
+class _StreamProgress:
+    """What has been read of one upstream stream; filled in by ChainOfThoughtReasoner._read_stream."""
+    watcher: Optional[EarlyStopWatcher] = None
+    chunks: List[str] = field(default_factory=list)
+    finish_reason: Optional[str] = None
+    usage: Any = None
+    first_token_at: Optional[float] = None
+
+    @property
+    def stopped(self) -> bool:
+        return self.watcher is not None and self.watcher.stopped
+
+    def outcome(self, max_tokens: int) -> Tuple[Optional[str], Optional[Dict]]:
+        """The finish_reason to report and the early-stop summary, if a stop condition was met."""
+        if self.watcher is None or self.watcher.reason is None:
+            return self.finish_reason, None
+        summary = self.watcher.summary(max_tokens, self.finish_reason)
+        return ("early_stop" if summary["stopped"] else self.finish_reason), summary
+
 class ChainOfThoughtReasoner:
-    def __init__(self, client: AzureOpenAI, deployment_name: str):
-        self.client = client
+    def __init__(
+        self,
+        client: Optional["AsyncAzureOpenAI"] = None,
+        deployment_name: str = "gpt-4o",
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        cache: Optional[ResponseCache] = None,
+        semantic_cache: Optional["SemanticCache"] = None,
+        scheduler: Optional[RateLimitScheduler] = None,
+        backends: Optional[BackendPool] = None,
+        hedging: Optional[HedgePolicy] = None,
+        structured_output: bool = False,
+        chain_log: Optional[ChainLog] = None,
+        early_stop: Optional[EarlyStopPolicy] = None
+    ):
+        # A bare client is treated as a pool of one
+        self.backends = backends or BackendPool([
+            Backend("default", client, deployment_name, scheduler=scheduler)
+        ])
         self.deployment_name = deployment_name
-        
+        self.hedging = hedging
+        self.early_stop = early_stop
+        self.structured_output = structured_output
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.cache = cache
+        self.semantic_cache = semantic_cache
+        self.chain_log = chain_log
+        self.single_flight = SingleFlight()
+        self.parse_stats = ParseStats()
+
+    def _build_messages(self, question: str, structured: bool = False) -> List[Dict]:
+        """Render the chat messages for a question, in free-text or structured output form."""
+        template = STRUCTURED_PROMPT_TEMPLATE if structured else COT_PROMPT_TEMPLATE
+        prompt = template.format(question=question)
+        return [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+
     def _parse_thought_steps(self, response: str) -> List[ThoughtStep]:
         """Extract and parse thought steps from model response."""
-        import re
-        import json
-        
-        # Find all JSON-like structures in the response
-        json_pattern = r'\{[^{}]*\}'
-        json_matches = re.finditer(json_pattern, response)
-        
-        thought_steps = []
-        for match in json_matches:
-            try:
-                step_dict = json.loads(match.group())
-                thought_step = ThoughtStep(
-                    thought=step_dict["thought"],
-                    supporting_facts=step_dict["supporting_facts"],
-                    confidence=step_dict["confidence"],
-                    next_steps=step_dict["next_steps"]
-                )
-                thought_steps.append(thought_step)
-            except (json.JSONDecodeError, KeyError) as e:
-                print(f"Error parsing thought step: {e}")
-                continue
-                
-        return thought_steps
+        return parse_thought_steps(response, ThoughtStep, self.parse_stats)
 
     def _extract_final_answer(self, response: str) -> str:
         """Extract the final answer from the model response."""
-        import re
-        final_answer_pattern = r'Final Answer:\s*(.+)(?:\n|$)'
-        match = re.search(final_answer_pattern, response, re.IGNORECASE)
-        return match.group(1).strip() if match else ""
-
-    async def reason(self, question: str) -> ReasoningChain:
-        """Generate a chain of thought reasoning process for the given question."""
-        prompt = COT_PROMPT_TEMPLATE.format(question=question)
-        
-        try:
-            response = await self.client.chat.completions.create(
-                model=self.deployment_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful AI that thinks through problems step by step."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=2000
+        return extract_final_answer(response)
+
+    def _parse_response(self, response: str) -> Tuple[List[ThoughtStep], str]:
+        """
+        Parse a complete response into steps and final answer. Structured
+        responses are decoded in one pass; anything that does not match the
+        schema (e.g. output truncated at max_tokens) falls back to scanning.
+        """
+        with span("parse_thought_steps", structured=self.structured_output, response_chars=len(response)) as parse_span:
+            if self.structured_output:
+                output = parse_structured_output(response, ReasoningOutput, self.parse_stats)
+                if output is not None:
+                    parse_span.set_attribute("steps", len(output.steps))
+                    return output.steps, output.final_answer
+            steps = self._parse_thought_steps(response)
+            parse_span.set_attributes(steps=len(steps), fallback=self.structured_output)
+            return steps, self._extract_final_answer(response)
+
+    def _response_options(self) -> Dict:
+        """Extra completion arguments for requests whose output is parsed as a whole."""
+        return {"response_format": STRUCTURED_RESPONSE_FORMAT} if self.structured_output else {}
+
+    def _build_metadata(self, thought_steps: List[ThoughtStep], finish_reason: Optional[str], backend: Backend) -> Dict:
+        """Summarize a parsed chain for the response metadata."""
+        return {
+            "num_steps": len(thought_steps),
+            "average_confidence": sum(step.confidence for step in thought_steps) / len(thought_steps) if thought_steps else 0,
+            "model": backend.deployment,
+            "backend": backend.name,
+            "finish_reason": finish_reason
+        }
+
+    def _cache_key(self, messages: List[Dict], samples: int = 1) -> str:
+        """Key a request on everything that determines the completion."""
+        return make_cache_key(self.deployment_name, json.dumps(messages), self.temperature, self.max_tokens, samples)
+
+    def _semantic_namespace(self) -> str:
+        """Scope semantic matches to the current deployment, prompt and sampling settings."""
+        template = STRUCTURED_PROMPT_TEMPLATE if self.structured_output else COT_PROMPT_TEMPLATE
+        return make_cache_key(self.deployment_name, SYSTEM_PROMPT + template, self.temperature, self.max_tokens)
+
+    async def reason(self, question: str, use_cache: bool = True, samples: int = 1) -> ReasoningChain:
+        """
+        Generate a chain of thought reasoning process for the given question.
+        With use_cache=False the cache lookup is skipped but the fresh chain
+        still replaces any cached entry. With samples > 1 the chains are
+        sampled in one request and the majority answer's chain is returned.
+        """
+        with span("reason", deployment=self.deployment_name, use_cache=use_cache, samples=samples) as reason_span:
+            with stage("render", self.deployment_name):
+                messages = self._build_messages(question, self.structured_output)
+                cache_key = self._cache_key(messages, samples)
+
+            if use_cache:
+                with stage("cache_lookup", self.deployment_name):
+                    chain = await self.cache.get(cache_key) if self.cache is not None else None
+                    # A similar question's chain was not voted on, so it cannot stand in for a sampled one
+                    if chain is None and samples == 1:
+                        chain = await self._semantic_lookup(question)
+                reason_span.set_attribute("cache_hit", chain is not None)
+                if chain is not None:
+                    return chain
+
+            # Identical requests already in flight share one upstream call
+            return await self.single_flight.do(
+                cache_key, lambda: self._reason_upstream(question, messages, cache_key, samples)
             )
-            
-            content = response.choices[0].message.content
-            
-            thought_steps = self._parse_thought_steps(content)
-            final_answer = self._extract_final_answer(content)
-            
-            metadata = {
-                "num_steps": len(thought_steps),
-                "average_confidence": sum(step.confidence for step in thought_steps) / len(thought_steps) if thought_steps else 0,
-                "model": self.deployment_name,
-                "finish_reason": response.choices[0].finish_reason
+
+    async def _semantic_lookup(self, question: str) -> Optional[ReasoningChain]:
+        """Return the chain cached for a similar question, annotated with the match."""
+        if self.semantic_cache is None:
+            return None
+        # Embedding and the vector search are CPU-bound; keep them off the event loop
+        match = await asyncio.to_thread(self.semantic_cache.lookup, question, self._semantic_namespace())
+        if match is None:
+            return None
+        chain, matched_question, similarity = match
+        return chain.model_copy(update={
+            "question": question,
+            "metadata": {
+                **chain.metadata,
+                "semantic_cache": {"matched_question": matched_question, "similarity": similarity}
             }
-            
-            return ReasoningChain(
+        })
+
+    async def _degraded_response(self, question: str, cache_key: str) -> Optional[ReasoningChain]:
+        """Best answer we can give without the upstream: an expired cache entry, then a similar question."""
+        if self.cache is not None:
+            stale = await self.cache.get(cache_key, allow_stale=True)
+            if stale is not None:
+                return stale.model_copy(update={"metadata": {**stale.metadata, "degraded": "stale_cache"}})
+        chain = await self._semantic_lookup(question)
+        if chain is not None:
+            return chain.model_copy(update={"metadata": {**chain.metadata, "degraded": "semantic_cache"}})
+        return None
+
+    async def _complete(self, messages: List[Dict], estimated_tokens: int) -> Tuple[Backend, str, Optional[str], Dict]:
+        """Run one completion, hedged when enabled; returns backend, content, finish_reason and extra metadata."""
+        started = time.perf_counter()
+        if self.hedging is not None and len(self.backends) > 1:
+            backend, content, finish_reason, extra_metadata = await self._complete_hedged(messages, estimated_tokens)
+            record_stage("upstream", time.perf_counter() - started, backend.deployment)
+            return backend, content, finish_reason, extra_metadata
+
+        backend, choices = await self._complete_choices(messages, estimated_tokens)
+        content, finish_reason = choices[0]
+        return backend, content, finish_reason, {}
+
+    async def _complete_choices(
+        self,
+        messages: List[Dict],
+        estimated_tokens: int,
+        samples: int = 1
+    ) -> Tuple[Backend, List[Tuple[str, Optional[str]]]]:
+        """Run one non-streamed completion with ``samples`` choices; returns the backend and (content, finish_reason) per choice."""
+        started = time.perf_counter()
+        # n is only sent when sampling, so single-sample requests are unchanged
+        options = {"n": samples} if samples > 1 else {}
+        with span("azure.chat_completion", streamed=False, estimated_tokens=estimated_tokens, samples=samples) as call_span:
+            backend, raw_response = await self.backends.call(
+                lambda backend: self._settle_on_cancel(
+                    backend,
+                    messages,
+                    estimated_tokens,
+                    backend.client.chat.completions.with_raw_response.create(
+                        model=backend.deployment,
+                        messages=messages,
+                        temperature=self.temperature,
+                        max_tokens=self.max_tokens,
+                        **options,
+                        **self._response_options()
+                    )
+                ),
+                estimated_tokens
+            )
+            response = raw_response.parse()
+            call_span.set_attributes(
+                backend=backend.name,
+                deployment=backend.deployment,
+                finish_reason=response.choices[0].finish_reason,
+                prompt_tokens=response.usage.prompt_tokens if response.usage else None,
+                completion_tokens=response.usage.completion_tokens if response.usage else None,
+                total_tokens=response.usage.total_tokens if response.usage else None
+            )
+        elapsed = time.perf_counter() - started
+        record_stage("upstream", elapsed, backend.deployment)
+        backend.scheduler.settle(estimated_tokens, response.usage.total_tokens if response.usage else None)
+        record_upstream(backend.deployment, tokens=response.usage.completion_tokens if response.usage else None, seconds=elapsed)
+        return backend, [(choice.message.content or "", choice.finish_reason) for choice in response.choices]
+
+    async def _stream_completion(
+        self,
+        backend: Backend,
+        messages: List[Dict],
+        on_first_token: Callable[[], None],
+        estimated_tokens: int
+    ) -> Tuple[str, Optional[str], Optional[Dict]]:
+        """
+        Stream a completion, calling on_first_token when content starts.
+        Reads to the end unless the early-stop policy ends it first; returns
+        the content, finish_reason and the early-stop summary, if any. The
+        backend's token reservation is settled when the stream ends or is
+        cancelled; on errors the scheduler gives it back.
+        """
+        progress = _StreamProgress(self.early_stop.watcher() if self.early_stop is not None else None)
+        # The content is parsed once it is complete; steps are only tracked here for the watcher
+        parser = ThoughtStepParser(ThoughtStep) if progress.watcher is not None else None
+        with span("azure.chat_completion", streamed=True, backend=backend.name, deployment=backend.deployment) as call_span:
+            started = time.perf_counter()
+            stream = await self._settle_on_cancel(
+                backend,
+                messages,
+                estimated_tokens,
+                backend.client.chat.completions.create(
+                    model=backend.deployment,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True,
+                    **self._response_options()
+                )
+            )
+            reader = self._read_stream(backend, stream, messages, estimated_tokens, started, progress, parser, in_scheduler=True)
+            async with aclosing(reader) as chunks:
+                async for _ in chunks:
+                    if len(progress.chunks) == 1:
+                        on_first_token()
+            if progress.first_token_at is not None:
+                call_span.set_attribute("ttft_ms", (progress.first_token_at - started) * 1000)
+            finish_reason, early_stop = progress.outcome(self.max_tokens)
+            if progress.stopped:
+                call_span.set_attributes(early_stop=early_stop["reason"], tokens_saved_upper_bound=early_stop["tokens_saved_upper_bound"])
+            call_span.set_attributes(chunks=len(progress.chunks), finish_reason=finish_reason)
+            return "".join(progress.chunks), finish_reason, early_stop
+
+    async def _read_stream(
+        self,
+        backend: Backend,
+        stream,
+        messages: List[Dict],
+        estimated_tokens: int,
+        started: float,
+        progress: _StreamProgress,
+        parser: Optional[ThoughtStepParser],
+        in_scheduler: bool
+    ) -> AsyncIterator[List]:
+        """
+        Read an upstream stream, recording it in ``progress``, and yield the
+        steps ``parser`` closed with each content chunk. Stops early once the
+        watcher's condition is met and more content follows. However reading
+        ends the response is closed, and the backend's token reservation is
+        settled for what was streamed; only when it fails ``in_scheduler``
+        (inside RateLimitScheduler.run) is that left to the scheduler.
+        """
+        watcher = progress.watcher
+        settle = True
+        try:
+            async for chunk in stream:
+                progress.usage = getattr(chunk, "usage", None) or progress.usage
+                # Azure sends content-filter results as chunks without choices
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.finish_reason is not None:
+                    progress.finish_reason = choice.finish_reason
+                text = choice.delta.content
+                if not text:
+                    continue
+                if watcher is not None and watcher.reason is not None:
+                    # Past the stop condition: cut only if the model was going on
+                    if watcher.after_stop(text):
+                        break
+                    continue
+                if progress.first_token_at is None:
+                    progress.first_token_at = time.perf_counter()
+                progress.chunks.append(text)
+                steps = parser.feed(text) if parser is not None else []
+                if watcher is not None:
+                    watcher.feed(text, [step.confidence for step in steps], parser.pending)
+                yield steps
+        except Exception:
+            settle = not in_scheduler
+            raise
+        finally:
+            # Closing the response also stops generation upstream
+            await stream.response.aclose()
+            if settle:
+                backend.scheduler.settle(estimated_tokens, self._streamed_tokens(messages, len(progress.chunks), progress.usage))
+        if progress.first_token_at is not None:
+            # One content chunk is roughly one token
+            record_upstream(
+                backend.deployment,
+                progress.first_token_at - started,
+                len(progress.chunks),
+                time.perf_counter() - progress.first_token_at
+            )
+
+    async def _settle_on_cancel(self, backend: Backend, messages: List[Dict], estimated_tokens: int, call: Awaitable[T]) -> T:
+        """
+        Await an upstream call made through the backend's scheduler. The
+        scheduler gives a failed call's reservation back, but not a cancelled
+        one (e.g. a losing hedge still waiting for response headers), so that
+        is settled here for the prompt, which the service was already sent.
+        """
+        try:
+            return await call
+        except asyncio.CancelledError:
+            backend.scheduler.settle(estimated_tokens, self._streamed_tokens(messages, 0, None))
+            raise
+
+    def _streamed_tokens(self, messages: List[Dict], chunks: int, usage) -> int:
+        """Tokens a stream used: its usage when the service reports it, else the prompt estimate plus one per content chunk."""
+        if usage is not None and usage.total_tokens is not None:
+            return usage.total_tokens
+        return estimate_tokens(messages, 0) + chunks
+
+    async def _complete_hedged(self, messages: List[Dict], estimated_tokens: int) -> Tuple[Backend, str, Optional[str], Dict]:
+        """
+        Stream from one backend; if no token arrives within the policy's delay
+        and the hedge budget allows, race a duplicate on another backend and
+        cancel whichever loses.
+        """
+        policy = self.hedging
+        policy.start_request()
+        started = time.monotonic()
+        first_token = asyncio.Event()
+        primary_backends = []
+
+        def on_primary_token():
+            if not first_token.is_set():
+                policy.observe_first_token(time.monotonic() - started)
+                first_token.set()
+
+        def primary_attempt(backend: Backend):
+            primary_backends.append(backend.name)
+            return self._stream_completion(backend, messages, on_primary_token, estimated_tokens)
+
+        tasks = {asyncio.create_task(self.backends.call(primary_attempt, estimated_tokens)): "primary"}
+        try:
+            waiter = asyncio.create_task(first_token.wait())
+            try:
+                await asyncio.wait({*tasks, waiter}, timeout=policy.delay(), return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiter.cancel()
+
+            if not first_token.is_set() and not any(task.done() for task in tasks) and policy.try_hedge():
+                hedge = self.backends.call(
+                    lambda backend: self._stream_completion(backend, messages, lambda: None, estimated_tokens),
+                    estimated_tokens,
+                    exclude=primary_backends
+                )
+                tasks[asyncio.create_task(hedge)] = "hedge"
+
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    backend, (content, finish_reason, early_stop) = task.result()
+                    if tasks[task] == "hedge":
+                        policy.stats.hedge_wins += 1
+                    extra_metadata = {"hedged": len(tasks) > 1, "hedge_winner": tasks[task]}
+                    if early_stop is not None:
+                        extra_metadata["early_stop"] = early_stop
+                    return backend, content, finish_reason, extra_metadata
+            raise error
+        finally:
+            # Cancelling the loser closes its upstream stream
+            for task in tasks:
+                task.cancel()
+
+    async def _reason_once(self, question: str, messages: List[Dict], estimated_tokens: int) -> Tuple[ReasoningChain, Backend]:
+        """Run one completion and parse it into a chain."""
+        backend, content, finish_reason, extra_metadata = await self._complete(messages, estimated_tokens)
+
+        with stage("parse", backend.deployment):
+            thought_steps, final_answer = self._parse_response(content)
+            metadata = self._build_metadata(thought_steps, finish_reason, backend)
+            metadata.update(extra_metadata)
+
+            chain = ReasoningChain(
                 question=question,
                 steps=thought_steps,
                 final_answer=final_answer,
                 metadata=metadata
             )
-            
+        return chain, backend
+
+    def _vote_chains(
+        self,
+        question: str,
+        choices: List[Tuple[str, Optional[str]]],
+        backend: Backend
+    ) -> ReasoningChain:
+        """Parse every sampled choice and return the chain chosen by majority vote on the final answer."""
+        parsed = [self._parse_response(content) for content, _ in choices]
+        scores = [
+            sum(step.confidence for step in steps) / len(steps) if steps else 0.0
+            for steps, _ in parsed
+        ]
+        result = vote([final_answer for _, final_answer in parsed], scores)
+        # With no final answer anywhere, fall back to the most confident sample
+        selected = result.winner if result.winner is not None else max(range(len(parsed)), key=scores.__getitem__)
+        thought_steps, final_answer = parsed[selected]
+        metadata = self._build_metadata(thought_steps, choices[selected][1], backend)
+        metadata["self_consistency"] = result.to_dict(len(choices))
+        return ReasoningChain(question=question, steps=thought_steps, final_answer=final_answer, metadata=metadata)
+
+    async def _reason_upstream(self, question: str, messages: List[Dict], cache_key: str, samples: int = 1) -> ReasoningChain:
+        """Call the model, parse the chain and populate the caches."""
+        # The prompt is paid once however many samples are drawn
+        estimated_tokens = estimate_tokens(messages, self.max_tokens * samples)
+        try:
+            if samples > 1:
+                # Sampling needs the n parameter, so it skips hedging's streamed path
+                backend, choices = await self._complete_choices(messages, estimated_tokens, samples)
+                with stage("parse", backend.deployment):
+                    chain = self._vote_chains(question, choices, backend)
+            else:
+                chain, backend = await self._reason_once(question, messages, estimated_tokens)
+        except CircuitOpenError as e:
+            # Every backend is failing: answer from cache if we can, else fail fast
+            fallback = await self._degraded_response(question, cache_key)
+            if fallback is not None:
+                return fallback
+            raise _upstream_http_error(e)
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Reasoning failed: {str(e)}")
+            raise _upstream_http_error(e)
 
-# Initialize reasoner
-reasoner = ChainOfThoughtReasoner(
-    client=client,
-    deployment_name=os.getenv("AZURE_DEPLOYMENT_NAME", "gpt-4o")
-)
+        if self.chain_log is not None:
+            with stage("chain_log", backend.deployment):
+                # File writes block; keep them off the event loop
+                chain.metadata["chain_id"] = await asyncio.to_thread(
+                    self.chain_log.append, question, backend.deployment, chain.model_dump_json().encode("utf-8")
+                )
+        with stage("cache_write", backend.deployment):
+            if self.cache is not None:
+                await self.cache.set(cache_key, chain)
+            if self.semantic_cache is not None:
+                await asyncio.to_thread(self.semantic_cache.add, question, chain, self._semantic_namespace())
+        return chain
+
+    async def open_reason_stream(self, question: str) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        Start streaming the reasoning process for the given question and
+        return its events. The upstream call is made here, so rate-limit and
+        circuit errors are raised before the first event, not by the iterator.
+        """
+        with stage("render", self.deployment_name):
+            messages = self._build_messages(question)
+        started = time.perf_counter()
+        estimated_tokens = estimate_tokens(messages, self.max_tokens)
+        backend, stream = await self.backends.call(
+            lambda backend: self._settle_on_cancel(
+                backend,
+                messages,
+                estimated_tokens,
+                backend.client.chat.completions.create(
+                    model=backend.deployment,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    stream=True
+                )
+            ),
+            estimated_tokens
+        )
+        return self._stream_events(question, messages, backend, stream, started, estimated_tokens)
+
+    async def reason_stream(self, question: str) -> AsyncIterator[Tuple[str, Dict]]:
+        """Stream the reasoning process for the given question; see _stream_events."""
+        async for event in await self.open_reason_stream(question):
+            yield event
+
+    async def _stream_events(
+        self,
+        question: str,
+        messages: List[Dict],
+        backend: Backend,
+        stream,
+        started: float,
+        estimated_tokens: int
+    ) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        Yield ("step", step) for every thought step as soon as its JSON object
+        closes, then a single ("final", {...}) event with the answer and metadata.
+        Always uses the free-text format, whose steps can be emitted one by one.
+        The token reservation is settled however the stream ends.
+        """
+        parser = ThoughtStepParser(ThoughtStep)
+        progress = _StreamProgress(self.early_stop.watcher() if self.early_stop is not None else None)
+        thought_steps = []
+        try:
+            reader = self._read_stream(backend, stream, messages, estimated_tokens, started, progress, parser, in_scheduler=False)
+            async with aclosing(reader) as chunks:
+                async for new_steps in chunks:
+                    for step in new_steps:
+                        thought_steps.append(step)
+                        yield "step", step.model_dump()
+            # After an early stop any open object is the start of an unwanted step
+            if not progress.stopped:
+                for step in parser.close():
+                    thought_steps.append(step)
+                    yield "step", step.model_dump()
+        finally:
+            self.parse_stats.merge(parser.stats)
+            record_stage("upstream", time.perf_counter() - started, backend.deployment)
+
+        finish_reason, early_stop = progress.outcome(self.max_tokens)
+        metadata = self._build_metadata(thought_steps, finish_reason, backend)
+        if early_stop is not None:
+            metadata["early_stop"] = early_stop
+        yield "final", {
+            "question": question,
+            "final_answer": self._extract_final_answer("".join(progress.chunks)),
+            "metadata": metadata
+        }
+
+def get_reasoner(request: Request) -> ChainOfThoughtReasoner:
+    """Return the reasoner created in the app lifespan."""
+    return request.app.state.reasoner
 
 @app.get("/")
 async def read_root():
     return {"status": "ok", "message": "Chain of Thought Reasoning API"}
 
+def _encoded_response(http_request: Request, body: Union[bytes, memoryview], headers: Optional[Dict[str, str]] = None) -> Response:
+    """Return an encoded body, compressed as negotiated with the client."""
+    min_bytes = http_request.app.state.compression_min_bytes
+    return encoded_response(
+        body,
+        http_request.headers.get("accept-encoding", ""),
+        min_bytes if min_bytes >= 0 else None,
+        headers
+    )
+
 @app.post("/api/reason", response_model=ReasoningChain)
-async def create_reasoning_chain(request: QuestionRequest):
+async def create_reasoning_chain(
+    request: QuestionRequest,
+    http_request: Request,
+    reasoner: ChainOfThoughtReasoner = Depends(get_reasoner)
+):
     try:
-        result = await reasoner.reason(request.question)
-        return result
+        result = await reasoner.reason(request.question, use_cache=not request.bypass_cache, samples=request.samples)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not http_request.app.state.fast_serialization:
+        return result
+    # The reasoner built and validated the chain already; returning a Response
+    # skips FastAPI's response_model round trip (dump, re-validate, encode)
+    return _encoded_response(http_request, dumps(result))
+
+@app.post("/api/reason/stream")
+async def stream_reasoning_chain(
+    request: QuestionRequest,
+    reasoner: ChainOfThoughtReasoner = Depends(get_reasoner)
+):
+    """Stream thought steps as server-sent events while the model generates them."""
+    if request.samples > 1:
+        raise HTTPException(status_code=422, detail="samples is not supported when streaming; use /api/reason")
+    # Open the upstream stream first, so failures before the first byte get a real status and Retry-After
+    try:
+        events = await reasoner.open_reason_stream(request.question)
+    except Exception as e:
+        raise _upstream_http_error(e)
+
+    async def event_stream():
+        try:
+            async for event, data in events:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': f'Reasoning failed: {str(e)}'})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _run_batch(
+    reasoner: ChainOfThoughtReasoner,
+    requests: List[QuestionRequest],
+    concurrency: int
+) -> AsyncIterator[str]:
+    """Reason over a batch with a fixed worker pool, yielding NDJSON lines in completion order."""
+    pending: asyncio.Queue = asyncio.Queue()
+    for index, item in enumerate(requests):
+        pending.put_nowait((index, item))
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker():
+        while True:
+            try:
+                index, item = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                chain = await reasoner.reason(item.question, use_cache=not item.bypass_cache, samples=item.samples)
+                line = {"index": index, "result": chain.model_dump()}
+            except Exception as e:
+                # One failing item is reported in place and does not stop the batch
+                line = {"index": index, "error": getattr(e, "detail", str(e))}
+            await results.put(json.dumps(line) + "\n")
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(requests)))]
+    try:
+        for _ in range(len(requests)):
+            yield await results.get()
+    finally:
+        # Stop outstanding work if the client goes away mid-batch
+        for task in workers:
+            task.cancel()
+
+@app.post("/api/reason/batch")
+async def batch_reasoning_chains(
+    request: BatchRequest,
+    http_request: Request,
+    reasoner: ChainOfThoughtReasoner = Depends(get_reasoner)
+):
+    """Reason over many questions with bounded concurrency, streaming NDJSON results."""
+    state = http_request.app.state
+    concurrency = max(1, min(request.concurrency or state.batch_concurrency, state.batch_max_concurrency))
+    return StreamingResponse(
+        _run_batch(reasoner, request.requests, concurrency),
+        media_type="application/x-ndjson"
+    )
+
+@app.post("/api/analyze", response_class=FastJSONResponse)
+async def analyze_reasoning_chains(request: Union[AnalyzeRequest, ReasoningChain], http_request: Request):
+    """
+    Analyze one chain (returning its analysis) or {"chains": [...]}
+    (returning per-chain analyses plus a summary over every step).
+    """
+    if isinstance(request, ReasoningChain):
+        return analyze_chain(request)
+    # Large batches are CPU-bound; keep them off the event loop
+    analysis = await asyncio.to_thread(analyze_chains, request.chains, request.low_confidence_threshold)
+    return _encoded_response(http_request, dumps(analysis))
+
+def _chain_response(reasoner: ChainOfThoughtReasoner, record, http_request: Request) -> Response:
+    """Serve a logged chain's stored JSON bytes without decoding them."""
+    if reasoner.chain_log is None:
+        raise HTTPException(status_code=404, detail="Chain log is not enabled")
+    if record is None:
+        raise HTTPException(status_code=404, detail="Chain not found")
+    chain_id, payload = record
+    return _encoded_response(http_request, payload, {"X-Chain-Id": str(chain_id)})
+
+@app.get("/api/chains/{chain_id}")
+async def get_chain(chain_id: int, http_request: Request, reasoner: ChainOfThoughtReasoner = Depends(get_reasoner)):
+    """Return a logged chain by id; the id is in the metadata of /api/reason responses."""
+    record = None
+    if reasoner.chain_log is not None:
+        # Reads wait on the log lock, which appends hold through writes and fsync
+        record = await asyncio.to_thread(reasoner.chain_log.get, chain_id)
+    return _chain_response(reasoner, record, http_request)
+
+@app.get("/api/chains")
+async def find_chain(
+    question: str,
+    http_request: Request,
+    deployment: Optional[str] = None,
+    reasoner: ChainOfThoughtReasoner = Depends(get_reasoner)
+):
+    """
+    Return the most recent logged chain for a question (compared case- and
+    whitespace-insensitively). Chains are logged under the deployment that
+    answered them; without ``deployment`` every backend's deployment is searched.
+    """
+    record = None
+    if reasoner.chain_log is not None:
+        deployments = [deployment] if deployment else sorted({b.deployment for b in reasoner.backends.backends})
+
+        def newest():
+            records = [reasoner.chain_log.latest(question, name) for name in deployments]
+            return max((r for r in records if r is not None), key=lambda r: r[0], default=None)
+
+        record = await asyncio.to_thread(newest)
+    return _chain_response(reasoner, record, http_request)
+
+@app.get("/api/cache/stats")
+async def cache_stats(reasoner: ChainOfThoughtReasoner = Depends(get_reasoner)):
+    return {
+        "exact": reasoner.cache.stats_dict() if reasoner.cache is not None else {"enabled": False},
+        "semantic": reasoner.semantic_cache.stats_dict() if reasoner.semantic_cache is not None else {"enabled": False}
+    }
+
+@app.get("/api/backends")
+async def backend_stats(reasoner: ChainOfThoughtReasoner = Depends(get_reasoner)):
+    stats = reasoner.backends.stats_dict()
+    stats["hedging"] = reasoner.hedging.stats_dict() if reasoner.hedging is not None else {"enabled": False}
+    return stats
+
+@app.get("/metrics")
+async def metrics():
+    """Stage, upstream and HTTP latency histograms in the Prometheus text format."""
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/api/health")
-async def health_check():
+async def health_check(http_request: Request, reasoner: ChainOfThoughtReasoner = Depends(get_reasoner)):
     return {
         "status": "healthy",
         "azure_endpoint": os.getenv("AZURE_OPENAI_ENDPOINT") is not None,
-        "deployment_name": os.getenv("AZURE_DEPLOYMENT_NAME")
+        "deployment_name": os.getenv("AZURE_DEPLOYMENT_NAME"),
+        "parse_stats": reasoner.parse_stats.to_dict(),
+        "backends": {
+            "total": len(reasoner.backends),
+            "healthy": sum(backend.healthy for backend in reasoner.backends.backends)
+        },
+        "single_flight": {"in_flight": len(reasoner.single_flight), **reasoner.single_flight.stats.to_dict()},
+        "chain_log": reasoner.chain_log.stats_dict() if reasoner.chain_log is not None else {"enabled": False},
+        "prewarm": http_request.app.state.prewarm
     }
 
+def configure_workers() -> None:
+    """
+    Point every worker process at the same SQLite files for the response
+    cache's disk tier and the rate-limit state (in SHARED_STATE_DIR, or a new
+    temporary directory), unless RESPONSE_CACHE_PATH / RATE_LIMIT_STATE_PATH
+    are set explicitly. The files are created here, before the workers start.
+    The semantic cache, single-flight and circuit breakers stay per worker.
+    """
+    state_dir = os.getenv("SHARED_STATE_DIR") or tempfile.mkdtemp(prefix="cot-workers-")
+    os.makedirs(state_dir, exist_ok=True)
+    os.environ.setdefault("RESPONSE_CACHE_PATH", os.path.join(state_dir, "responses.sqlite"))
+    os.environ.setdefault("RATE_LIMIT_STATE_PATH", os.path.join(state_dir, "rate_limits.sqlite"))
+    ResponseCache(path=os.environ["RESPONSE_CACHE_PATH"]).close()
+    SharedRateLimitState(os.environ["RATE_LIMIT_STATE_PATH"]).close()
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    load_dotenv()
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", "8000"))
+    workers = int(os.getenv("WORKERS", "1"))
+    if workers > 1:
+        configure_workers()
+        # Each worker process imports this module and runs its own lifespan and event loop
+        uvicorn.run("main:app", host=host, port=port, workers=workers)
+    else:
+        uvicorn.run(app, host=host, port=port)
\ No newline at end of file
@@ -0,0 +1,207 @@
+import asyncio
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi.routing import APIRoute
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_RATE_BUCKETS = (5, 10, 20, 40, 60, 80, 100, 150, 200, 300, 500)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with a fixed label set."""
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts with a final +Inf bucket, sum)
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(counts), total[0]) for key, (counts, total) in self._series.items()]
+        for key, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                bucket_labels = _format_labels(self.label_names, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[Histogram] = []
+
+    def histogram(self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Everything in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "cot_stage_seconds", "Time spent in each reasoning pipeline stage.", ("stage", "deployment")
+)
+UPSTREAM_TTFT_SECONDS = REGISTRY.histogram(
+    "cot_upstream_ttft_seconds", "Time to first content token of streamed upstream completions.", ("deployment",)
+)
+UPSTREAM_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "cot_upstream_tokens_per_second", "Completion tokens per second of upstream calls.", ("deployment",),
+    buckets=TOKEN_RATE_BUCKETS
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "cot_http_request_seconds", "HTTP request latency until the response starts.", ("route", "method", "status")
+)
+
+
+class RequestTimings:
+    """Stage durations of one HTTP request, rendered as a Server-Timing header."""
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+        self.endpoint_finished: Optional[float] = None
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages.append((stage, seconds))
+
+    def header(self) -> str:
+        totals: Dict[str, float] = {}
+        for stage, seconds in self.stages:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
+
+
+_current_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current_timings.get()
+
+
+def record_stage(stage: str, seconds: float, deployment: str = "") -> None:
+    """Observe a stage duration and add it to the current request's Server-Timing."""
+    STAGE_SECONDS.observe(seconds, stage=stage, deployment=deployment)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def stage(name: str, deployment: str = "") -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started, deployment)
+
+
+def record_upstream(deployment: str, ttft: Optional[float] = None, tokens: Optional[int] = None, seconds: Optional[float] = None) -> None:
+    """Observe time-to-first-token and/or the completion token rate of one upstream call."""
+    if ttft is not None:
+        UPSTREAM_TTFT_SECONDS.observe(ttft, deployment=deployment)
+    if tokens and seconds:
+        UPSTREAM_TOKENS_PER_SECOND.observe(tokens / seconds, deployment=deployment)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that times every HTTP request, collects the stages the
+    request recorded and adds them to the response as a Server-Timing
+    header. The time between the endpoint returning (see TimedRoute) and the
+    response starting is reported as the "serialize" stage.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                if timings.endpoint_finished is not None:
+                    record_stage("serialize", now - timings.endpoint_finished)
+                timings.add("total", now - started)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header().encode("latin-1")))
+                message = {**message, "headers": headers}
+                route = scope.get("route")
+                HTTP_REQUEST_SECONDS.observe(
+                    now - started,
+                    route=getattr(route, "path", "unmatched"),
+                    method=scope["method"],
+                    status=str(message["status"])
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timings.reset(token)
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that notes when its endpoint returns, so MetricsMiddleware can time response serialization."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if asyncio.iscoroutinefunction(endpoint):
+            original = endpoint
+
+            @functools.wraps(original)
+            async def endpoint(*args, **endpoint_kwargs):
+                try:
+                    return await original(*args, **endpoint_kwargs)
+                finally:
+                    timings = _current_timings.get()
+                    if timings is not None:
+                        timings.endpoint_finished = time.perf_counter()
+
+        super().__init__(path, endpoint, **kwargs)
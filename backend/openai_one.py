@@ -1,9 +1,10 @@
-import json
-import re
 import os
 from typing import List, Dict, Optional
 from dataclasses import dataclass
 from openai import AzureOpenAI
+from chain_analysis import analyze_chain
+from rate_limit import RateLimitScheduler, estimate_tokens
+from step_parser import ParseStats, extract_final_answer, parse_thought_steps
 
 @dataclass
 class ThoughtStep:
@@ -25,14 +26,25 @@ class AzureChainOfThoughtReasoner:
         azure_endpoint: str,
         azure_api_key: str,
         deployment_name: str,
-        api_version: str = "2024-08-01-preview"
+        api_version: str = "2024-08-01-preview",
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        scheduler: Optional[RateLimitScheduler] = None
     ):
         self.client = AzureOpenAI(
             azure_endpoint=azure_endpoint,
             api_key=azure_api_key,
-            api_version=api_version
+            api_version=api_version,
+            # reason() retries through scheduler.run_sync, which reads the
+            # retry headers and keeps every attempt inside the token budget;
+            # SDK retries on top would re-send outside it
+            max_retries=0
         )
+        self.scheduler = scheduler or RateLimitScheduler()
         self.deployment_name = deployment_name
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.parse_stats = ParseStats()
         
         # Prompt template for eliciting structured reasoning
         self.cot_prompt_template = """
@@ -57,53 +69,42 @@ class AzureChainOfThoughtReasoner:
         Think it through step by step:
         """
 
+    def _build_messages(self, question: str) -> List[Dict]:
+        """Render the chat messages for a question."""
+        prompt = self.cot_prompt_template.format(question=question)
+        return [
+            {"role": "system", "content": "You are a helpful AI that thinks through problems step by step."},
+            {"role": "user", "content": prompt}
+        ]
+
     def _parse_thought_steps(self, response: str) -> List[ThoughtStep]:
         """Extract and parse thought steps from model response."""
-        # Find all JSON-like structures in the response
-        json_pattern = r'\{[^{}]*\}'
-        json_matches = re.finditer(json_pattern, response)
-        
-        thought_steps = []
-        for match in json_matches:
-            try:
-                step_dict = json.loads(match.group())
-                thought_step = ThoughtStep(
-                    thought=step_dict["thought"],
-                    supporting_facts=step_dict["supporting_facts"],
-                    confidence=step_dict["confidence"],
-                    next_steps=step_dict["next_steps"]
-                )
-                thought_steps.append(thought_step)
-            except (json.JSONDecodeError, KeyError) as e:
-                print(f"Error parsing thought step: {e}")
-                continue
-                
-        return thought_steps
+        return parse_thought_steps(response, ThoughtStep, self.parse_stats)
 
     def _extract_final_answer(self, response: str) -> str:
         """Extract the final answer from the model response."""
-        final_answer_pattern = r'Final Answer:\s*(.+)(?:\n|$)'
-        match = re.search(final_answer_pattern, response, re.IGNORECASE)
-        return match.group(1).strip() if match else ""
+        return extract_final_answer(response)
 
     def reason(self, question: str) -> ReasoningChain:
         """
         Generate a chain of thought reasoning process for the given question.
         Returns a ReasoningChain object containing the full reasoning process.
         """
-        # Prepare the prompt
-        prompt = self.cot_prompt_template.format(question=question)
+        messages = self._build_messages(question)
+        estimated_tokens = estimate_tokens(messages, self.max_tokens)
         
-        # Get model response
-        response = self.client.chat.completions.create(
-            model=self.deployment_name,
-            messages=[
-                {"role": "system", "content": "You are a helpful AI that thinks through problems step by step."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2000
+        # Get model response, waiting for rate-limit budget and retrying 429s
+        raw_response = self.scheduler.run_sync(
+            lambda: self.client.chat.completions.with_raw_response.create(
+                model=self.deployment_name,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens
+            ),
+            estimated_tokens
         )
+        response = raw_response.parse()
+        self.scheduler.settle(estimated_tokens, response.usage.total_tokens if response.usage else None)
         
         content = response.choices[0].message.content
         
@@ -116,7 +117,8 @@ class AzureChainOfThoughtReasoner:
             "num_steps": len(thought_steps),
             "average_confidence": sum(step.confidence for step in thought_steps) / len(thought_steps) if thought_steps else 0,
             "model": self.deployment_name,
-            "finish_reason": response.choices[0].finish_reason
+            "finish_reason": response.choices[0].finish_reason,
+            "total_tokens": response.usage.total_tokens if response.usage else None
         }
         
         return ReasoningChain(
@@ -128,22 +130,7 @@ class AzureChainOfThoughtReasoner:
 
     def analyze_reasoning_chain(self, chain: ReasoningChain) -> Dict:
         """
-        Analyze the quality and characteristics of a reasoning chain.
+        Analyze the quality and characteristics of a reasoning chain. For
+        many chains at once use ``chain_analysis.analyze_chains``.
         """
-        if not chain.steps:
-            return {
-                "error": "No reasoning steps found in the chain"
-            }
-            
-        analysis = {
-            "chain_length": len(chain.steps),
-            "average_confidence": chain.metadata["average_confidence"],
-            "fact_usage": sum(len(step.supporting_facts) for step in chain.steps),
-            "branching_factor": sum(len(step.next_steps) for step in chain.steps) / len(chain.steps),
-            "low_confidence_steps": [
-                i for i, step in enumerate(chain.steps) 
-                if step.confidence < 0.7
-            ],
-            "finish_reason": chain.metadata.get("finish_reason")
-        }
-        return analysis
\ No newline at end of file
+        return analyze_chain(chain)
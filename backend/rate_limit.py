@@ -0,0 +1,512 @@
+import asyncio
+import random
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Mapping, Optional, Tuple, TypeVar, Union
+
+
+T = TypeVar("T")
+
+
+def estimate_tokens(messages: List[Dict], max_tokens: int) -> int:
+    """Rough upper bound on a request's token cost: ~4 characters per prompt token plus the completion budget."""
+    prompt_chars = sum(len(message.get("content") or "") for message in messages)
+    return prompt_chars // 4 + 4 * len(messages) + max_tokens
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket holding up to ``capacity`` tokens and refilling
+    at ``rate`` tokens per second. A request larger than the capacity is let
+    through once the bucket is full, leaving it in debt, so it cannot block
+    forever.
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, budget: float) -> "TokenBucket":
+        return cls(capacity=budget, rate=budget / 60.0)
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+    def try_acquire(self, amount: float) -> float:
+        """Take ``amount`` tokens if possible; otherwise return the seconds to wait before retrying."""
+        with self._lock:
+            self._refill(time.monotonic())
+            needed = min(amount, self.capacity)
+            if self._tokens >= needed:
+                self._tokens -= amount
+                return 0.0
+            return (needed - self._tokens) / self.rate
+
+    def acquire(self, amount: float) -> None:
+        """Block the calling thread until ``amount`` tokens are taken."""
+        while True:
+            wait = self.try_acquire(amount)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def clamp(self, amount: float) -> None:
+        """Cap the available tokens, e.g. at what the server says is left."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, amount)
+
+    def refund(self, amount: float) -> None:
+        """Return tokens that were reserved but not used (negative amounts charge extra)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class SharedRateLimitState:
+    """
+    Token buckets and 429 pauses kept in a SQLite (WAL) file, so that worker
+    processes on one host draw from one per-minute budget instead of each
+    assuming the whole quota, and a 429 seen by one worker pauses them all.
+    Every update is a short IMMEDIATE transaction; times are wall-clock so
+    they compare across processes. The calls block (on disk and on other
+    workers' transactions), so async callers run them in a thread; the last
+    values seen are cached for cheap estimates on the event loop.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS pauses (name TEXT PRIMARY KEY, until REAL NOT NULL)")
+        self._lock = threading.Lock()
+        self._paused_until: Dict[str, float] = {}
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _tokens(self, row: Optional[Tuple[float, float]], capacity: float, rate: float, now: float) -> float:
+        if row is None:
+            return capacity
+        return min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+
+    def update_bucket(
+        self,
+        name: str,
+        capacity: float,
+        rate: float,
+        update: Callable[[float], Tuple[float, T]],
+    ) -> Tuple[T, float, float]:
+        """
+        Refill the named bucket and apply ``update(tokens) -> (tokens, result)``
+        atomically; returns the result and the new tokens with their time.
+        """
+        with self._transaction() as db:
+            now = time.time()
+            row = db.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+            tokens, result = update(self._tokens(row, capacity, rate, now))
+            db.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)", (name, tokens, now))
+        return result, tokens, now
+
+    def bucket(self, name: str, capacity: float, rate: float) -> "SharedTokenBucket":
+        return SharedTokenBucket(self, name, capacity, rate)
+
+    def pause(self, name: str, seconds: float) -> None:
+        """Hold off admission for ``name`` in every process for at least ``seconds``."""
+        until = time.time() + seconds
+        self._paused_until[name] = max(self._paused_until.get(name, 0.0), until)
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO pauses (name, until) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET until = max(until, excluded.until)",
+                (name, until),
+            )
+
+    def pause_remaining(self, name: str) -> float:
+        with self._lock:
+            row = self._db.execute("SELECT until FROM pauses WHERE name = ?", (name,)).fetchone()
+        if row is not None:
+            self._paused_until[name] = row[0]
+        return row[0] - time.time() if row is not None else 0.0
+
+    def cached_pause_remaining(self, name: str) -> float:
+        """``pause_remaining`` as of the last time this process read or set it; does not touch the file."""
+        return self._paused_until.get(name, 0.0) - time.time()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class SharedTokenBucket:
+    """
+    TokenBucket whose state lives in a SharedRateLimitState, so all
+    processes share it. ``try_acquire`` goes to the file; ``refund`` and
+    ``clamp`` only record the change, which is applied with the next
+    ``try_acquire``, and ``available`` estimates from the last state seen,
+    so neither blocks.
+    """
+
+    def __init__(self, state: SharedRateLimitState, name: str, capacity: float, rate: float):
+        self.state = state
+        self.name = name
+        self.capacity = capacity
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._pending_refund = 0.0
+        self._pending_clamp: Optional[float] = None
+        self._seen_tokens = capacity
+        self._seen_at = time.time()
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            tokens = min(self.capacity, self._seen_tokens + (time.time() - self._seen_at) * self.rate)
+            tokens = min(self.capacity, tokens + self._pending_refund)
+            return tokens if self._pending_clamp is None else min(tokens, self._pending_clamp)
+
+    def _take_pending(self) -> Tuple[float, Optional[float]]:
+        with self._lock:
+            pending = self._pending_refund, self._pending_clamp
+            self._pending_refund, self._pending_clamp = 0.0, None
+        return pending
+
+    def try_acquire(self, amount: float) -> float:
+        """Take ``amount`` tokens if possible; otherwise return the seconds to wait before retrying."""
+        refund, clamp = self._take_pending()
+
+        def take(tokens: float) -> Tuple[float, float]:
+            tokens = min(self.capacity, tokens + refund)
+            if clamp is not None:
+                tokens = min(tokens, clamp)
+            needed = min(amount, self.capacity)
+            if tokens >= needed:
+                return tokens - amount, 0.0
+            return tokens, (needed - tokens) / self.rate
+
+        try:
+            wait, tokens, now = self.state.update_bucket(self.name, self.capacity, self.rate, take)
+        except BaseException:
+            # Keep the changes for the next attempt
+            self.refund(refund)
+            if clamp is not None:
+                self.clamp(clamp)
+            raise
+        with self._lock:
+            self._seen_tokens, self._seen_at = tokens, now
+        return wait
+
+    def acquire(self, amount: float) -> None:
+        while True:
+            wait = self.try_acquire(amount)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def flush(self) -> None:
+        """Write pending refunds and clamps to the file (blocking); on failure they stay pending."""
+        try:
+            self.try_acquire(0)
+        except sqlite3.Error:
+            pass
+
+    def clamp(self, amount: float) -> None:
+        with self._lock:
+            self._pending_clamp = amount if self._pending_clamp is None else min(self._pending_clamp, amount)
+
+    def refund(self, amount: float) -> None:
+        with self._lock:
+            self._pending_refund += amount
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request cannot be admitted or retried within its deadline."""
+
+    def __init__(self, retry_after: float, message: str = "Rate limit exceeded"):
+        super().__init__(f"{message}; retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Parse rate-limit reset values such as "1s", "6m0s", "20ms" or a bare number of seconds."""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+def retry_delay_from_headers(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds the server asked us to wait, from Retry-After(-ms) or x-ratelimit-reset-* headers."""
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000.0
+        except ValueError:
+            pass
+    if headers.get("retry-after"):
+        value = headers["retry-after"]
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    resets = [
+        parse_duration(headers[name])
+        for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+        if headers.get(name)
+    ]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+def is_retryable_error(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    # Imported here so importing this module does not pull in the SDK; only reached on errors
+    from openai import APIConnectionError
+    return isinstance(error, APIConnectionError)
+
+
+@dataclass
+class SchedulerStats:
+    requests: int = 0
+    throttled: int = 0
+    rate_limited: int = 0
+    retries: int = 0
+    gave_up: int = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class RateLimitScheduler:
+    """
+    Admission control and retry policy shared by the reasoners.
+
+    Requests are admitted against per-minute request and token buckets using
+    an up-front token estimate, which is settled against actual usage
+    afterwards. A 429 pauses admission for every caller for as long as the
+    Retry-After / x-ratelimit-reset-* headers ask, and retryable failures are
+    retried with full-jitter exponential backoff until the per-call deadline.
+    ``run`` is for coroutines and ``run_sync`` for blocking calls; both share
+    the same state, so a scheduler can be used from threads and the event loop.
+    With ``retry=False`` a failure is raised after one attempt (still pausing
+    admission on a 429) so the caller can fail over elsewhere.
+
+    With ``shared_state`` the buckets and pauses live in a file shared by
+    every worker process, keyed by ``name``; ``run`` then admits and backs
+    off in a worker thread, and ``headroom`` uses the last state it saw, so
+    nothing on the event loop waits on SQLite.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        deadline: float = 60.0,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        shared_state: Optional[SharedRateLimitState] = None,
+        name: str = "default",
+    ):
+        self.name = name
+        self.shared_state = shared_state
+        self.request_bucket = self._bucket("requests", requests_per_minute)
+        self.token_bucket = self._bucket("tokens", tokens_per_minute)
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = SchedulerStats()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _bucket(self, kind: str, per_minute: Optional[float]) -> Optional[Union[TokenBucket, SharedTokenBucket]]:
+        if not per_minute:
+            return None
+        if self.shared_state is not None:
+            return self.shared_state.bucket(f"{self.name}:{kind}", per_minute, per_minute / 60.0)
+        return TokenBucket.per_minute(per_minute)
+
+    def _pause_remaining(self, cached: bool = False) -> float:
+        if self.shared_state is not None:
+            if cached:
+                return self.shared_state.cached_pause_remaining(self.name)
+            return self.shared_state.pause_remaining(self.name)
+        return self._paused_until - time.monotonic()
+
+    def _pause(self, seconds: float) -> None:
+        if self.shared_state is not None:
+            self.shared_state.pause(self.name, seconds)
+            return
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def headroom(self) -> float:
+        """Fraction of the tighter budget still available; 0 while paused by a 429."""
+        if self._pause_remaining(cached=True) > 0:
+            return 0.0
+        fractions = [
+            bucket.available / bucket.capacity
+            for bucket in (self.request_bucket, self.token_bucket)
+            if bucket is not None
+        ]
+        return max(0.0, min(fractions)) if fractions else 1.0
+
+    def _try_admit(self, estimated_tokens: int) -> float:
+        """Reserve capacity for one request, or return how long to wait first."""
+        pause = self._pause_remaining()
+        if pause > 0:
+            return pause
+        if self.request_bucket is not None:
+            wait = self.request_bucket.try_acquire(1)
+            if wait > 0:
+                return wait
+        if self.token_bucket is not None:
+            wait = self.token_bucket.try_acquire(estimated_tokens)
+            if wait > 0:
+                if self.request_bucket is not None:
+                    self.request_bucket.refund(1)
+                return wait
+        return 0.0
+
+    def _admission_wait(self, estimated_tokens: int, deadline: float) -> float:
+        wait = self._try_admit(estimated_tokens)
+        if wait > 0:
+            self.stats.throttled += 1
+            if time.monotonic() + wait > deadline:
+                self.stats.gave_up += 1
+                raise RateLimitExceeded(wait, "Request budget exhausted")
+        return wait
+
+    def _retry_delay(self, error: Exception, attempt: int, estimated_tokens: int, deadline: float, retry: bool) -> float:
+        """Decide how long to back off after a failure, or re-raise if we should stop."""
+        # The failed request used no quota; give its reservation back
+        self.settle(estimated_tokens, 0)
+        if not is_retryable_error(error):
+            raise error
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        delay = backoff
+        response = getattr(error, "response", None)
+        if getattr(error, "status_code", None) == 429:
+            self.stats.rate_limited += 1
+            hinted = retry_delay_from_headers(response.headers) if response is not None else None
+            if hinted is not None:
+                delay = max(delay, hinted + random.uniform(0, self.base_delay))
+                # Everyone else should hold off too, not just this caller
+                self._pause(hinted)
+        if not retry or time.monotonic() + delay > deadline:
+            self.stats.gave_up += 1
+            if getattr(error, "status_code", None) == 429:
+                raise RateLimitExceeded(delay) from error
+            raise error
+        self.stats.retries += 1
+        return delay
+
+    def _on_success(self, result: Any) -> None:
+        headers = getattr(result, "headers", None)
+        if headers is not None:
+            self.observe_headers(headers)
+
+    def observe_headers(self, headers: Mapping[str, str]) -> None:
+        """Never assume more headroom than the server reports remaining."""
+        for name, bucket in (
+            ("x-ratelimit-remaining-requests", self.request_bucket),
+            ("x-ratelimit-remaining-tokens", self.token_bucket),
+        ):
+            if bucket is not None and headers.get(name):
+                try:
+                    bucket.clamp(float(headers[name]))
+                except ValueError:
+                    pass
+
+    def settle(self, estimated_tokens: int, used_tokens: Optional[int]) -> None:
+        """Replace a request's estimated token cost with its actual usage."""
+        if self.token_bucket is not None and used_tokens is not None:
+            self.token_bucket.refund(estimated_tokens - used_tokens)
+            if isinstance(self.token_bucket, SharedTokenBucket):
+                # Hand the refund to the other workers now rather than at our next admission
+                try:
+                    asyncio.get_running_loop().run_in_executor(None, self.token_bucket.flush)
+                except RuntimeError:
+                    self.token_bucket.flush()
+
+    async def _off_loop(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run a step that touches the shared state in a thread; local state is cheap enough to use inline."""
+        if self.shared_state is None:
+            return fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+    async def run(self, fn: Callable[[], Awaitable[T]], estimated_tokens: int = 0, retry: bool = True) -> T:
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            wait = await self._off_loop(self._admission_wait, estimated_tokens, deadline)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            self.stats.requests += 1
+            try:
+                result = await fn()
+            except Exception as e:
+                await asyncio.sleep(await self._off_loop(self._retry_delay, e, attempt, estimated_tokens, deadline, retry))
+                attempt += 1
+                continue
+            self._on_success(result)
+            return result
+
+    def run_sync(self, fn: Callable[[], T], estimated_tokens: int = 0, retry: bool = True) -> T:
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            wait = self._admission_wait(estimated_tokens, deadline)
+            if wait > 0:
+                time.sleep(wait)
+                continue
+            self.stats.requests += 1
+            try:
+                result = fn()
+            except Exception as e:
+                time.sleep(self._retry_delay(e, attempt, estimated_tokens, deadline, retry))
+                attempt += 1
+                continue
+            self._on_success(result)
+            return result
@@ -0,0 +1,62 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+_NUMBER = re.compile(r"^[-+]?(?:\d{1,3}(?:,\d{3})+|\d+)?(?:\.\d+)?$")
+_SURROUNDING = re.compile(r"^[\s\"'`*$(\[]+|[\s\"'`*.!;:%)\]]+$")
+_WHITESPACE = re.compile(r"\s+")
+_ANSWER_PREFIX = re.compile(r"^(?:the\s+)?(?:final\s+)?answer\s+is\s*:?\s*", re.IGNORECASE)
+
+
+def normalize_answer(answer: str) -> str:
+    """
+    Reduce a final answer to a key for voting: case, whitespace, quoting,
+    trailing punctuation and a leading "the answer is" are ignored, and
+    numbers compare by value ("1,000", "1000.0" and "$1000" are equal).
+    """
+    text = _ANSWER_PREFIX.sub("", answer.strip())
+    text = _SURROUNDING.sub("", text)
+    text = _WHITESPACE.sub(" ", text).lower()
+    if text and _NUMBER.match(text) and any(char.isdigit() for char in text):
+        value = float(text.replace(",", ""))
+        return repr(int(value)) if value.is_integer() else repr(value)
+    return text
+
+
+@dataclass
+class Vote:
+    """Result of a majority vote over sampled answers."""
+    winner: Optional[int]
+    agreement: float
+    clusters: List[Dict]
+
+    def to_dict(self, samples: int) -> Dict:
+        return {"samples": samples, "agreement": self.agreement, "selected_sample": self.winner, "answers": self.clusters}
+
+
+def vote(answers: Sequence[str], scores: Sequence[float]) -> Vote:
+    """
+    Cluster answers by ``normalize_answer`` and pick the largest cluster;
+    ties go to the cluster with the higher mean score. Within the winning
+    cluster the highest-scoring sample is selected. Empty answers (no final
+    answer was found) never win, but count against ``agreement``, which is
+    the winning cluster's share of all samples.
+    """
+    members: Dict[str, List[int]] = {}
+    for index, answer in enumerate(answers):
+        key = normalize_answer(answer)
+        if key:
+            members.setdefault(key, []).append(index)
+    if not members:
+        return Vote(winner=None, agreement=0.0, clusters=[])
+
+    def rank(indices: List[int]):
+        return len(indices), sum(scores[index] for index in indices) / len(indices)
+
+    ordered = sorted(members.values(), key=rank, reverse=True)
+    winner = max(ordered[0], key=lambda index: scores[index])
+    clusters = [
+        {"answer": answers[indices[0]].strip(), "votes": len(indices), "samples": indices}
+        for indices in ordered
+    ]
+    return Vote(winner=winner, agreement=len(ordered[0]) / len(answers), clusters=clusters)
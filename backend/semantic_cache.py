@@ -0,0 +1,445 @@
+import asyncio
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+# An embedder maps a batch of texts to a (len(texts), dim) float array
+Embedder = Callable[[Sequence[str]], np.ndarray]
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+_NEGATIONS = frozenset({"not", "no", "never", "nor", "neither", "none", "nothing", "nobody", "nowhere", "without", "cannot"})
+
+
+def question_signature(question: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    The negations and numbers in a question. Embeddings barely move when one
+    of them changes ("is it safe" / "is it not safe", "15% of 80" / "80% of
+    15") although the answer does, so a semantic match requires them to agree.
+    """
+    text = question.lower().replace("\u2019", "'").replace("n't", " not")
+    negations = sorted("not" if word == "cannot" else word for word in _TOKEN_PATTERN.findall(text) if word in _NEGATIONS)
+    return tuple(negations), tuple(_NUMBER_PATTERN.findall(text))
+
+
+class HashingEmbedder:
+    """
+    Dependency-free local embedder: signed feature hashing of words, word
+    bigrams and character trigrams. It only measures word overlap, so no
+    threshold separates rephrasings from questions that differ in one word
+    ("delete" / "rename a git branch"); use it for tests and benchmarks, not
+    as the embedder of a production cache.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN_PATTERN.findall(text.lower())
+        features = list(words)
+        features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                # crc32 is stable across processes, unlike hash()
+                h = zlib.crc32(feature.encode("utf-8"))
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return vectors
+
+
+class SentenceTransformerEmbedder:
+    """Embedder backed by a local sentence-transformers model, if installed."""
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(list(texts)), dtype=np.float32)
+
+
+def load_embedder(spec: str) -> Embedder:
+    """Build an embedder from "sentence-transformers[:model]" or "hashing[:dim]"."""
+    name, _, arg = spec.partition(":")
+    if name == "hashing":
+        return HashingEmbedder(int(arg) if arg else 512)
+    if name == "sentence-transformers":
+        return SentenceTransformerEmbedder(arg or "all-MiniLM-L6-v2")
+    raise ValueError(f"Unknown embedder: {spec}")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def fit_clusters(
+    vectors: np.ndarray,
+    slots: np.ndarray,
+    iterations: int = 5,
+    sample_size: int = 20_000,
+) -> Tuple[np.ndarray, List[set], np.ndarray]:
+    """
+    Fit coarse centroids on a sample of ``slots`` with a few rounds of
+    spherical k-means and assign every slot; returns the centroids, the
+    slots of each cluster and each slot's cluster. Only reads ``vectors``,
+    so it can run in a worker thread.
+    """
+    n_clusters = max(1, int(np.sqrt(len(slots))))
+    rng = np.random.default_rng(0)
+    sample = vectors[rng.choice(slots, size=min(sample_size, len(slots)), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=min(n_clusters, len(sample)), replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(len(centroids)):
+            members = sample[assignment == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+
+    clusters: List[set] = [set() for _ in range(len(centroids))]
+    assignment = np.empty(len(slots), dtype=np.int64)
+    # Assign in blocks to bound the size of the score matrix
+    for start in range(0, len(slots), 8192):
+        block = slots[start:start + 8192]
+        assignment[start:start + 8192] = np.argmax(vectors[block] @ centroids.T, axis=1)
+        for slot, cluster in zip(block.tolist(), assignment[start:start + 8192].tolist()):
+            clusters[cluster].add(slot)
+    return centroids, clusters, assignment
+
+
+class VectorIndex:
+    """
+    Cosine-similarity index over a preallocated float32 matrix.
+
+    Slots are reused after removal and masked out of searches. Below
+    ``approximate_threshold`` live entries every search is a single
+    matrix-vector product; above it the index uses coarse k-means centroids
+    and only scores the ``nprobe`` closest clusters. Building the clusters
+    is left to the owner (``rebuild_due``): ``build_clusters`` does it in
+    place, or ``cluster_snapshot`` / ``fit_clusters`` / ``install_clusters``
+    split it so the fit can run off the event loop while the index is used.
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024, approximate_threshold: int = 100_000, nprobe: int = 8):
+        self.dim = dim
+        self.approximate_threshold = approximate_threshold
+        self.nprobe = nprobe
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._namespaces = np.zeros(capacity, dtype=np.int64)
+        # Bumped whenever a slot is written or freed, to spot slots that changed during a rebuild
+        self._versions = np.zeros(capacity, dtype=np.int64)
+        self._free: List[int] = []
+        self._high_water = 0
+        self._size = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._clusters: List[set] = []
+        self._slot_cluster = np.full(capacity, -1, dtype=np.int64)
+        self._built_at_size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def approximate(self) -> bool:
+        return self._centroids is not None
+
+    @property
+    def rebuild_due(self) -> bool:
+        """Whether the clusters should be (re)built: past the threshold, or doubled since the last build."""
+        if self._centroids is None:
+            return self._size >= self.approximate_threshold
+        return self._size >= 2 * self._built_at_size
+
+    def _grow(self) -> None:
+        capacity = len(self._vectors) * 2
+        for name, fill in (("_vectors", 0), ("_valid", False), ("_namespaces", 0), ("_versions", 0), ("_slot_cluster", -1)):
+            old = getattr(self, name)
+            new = np.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _assign(self, slot: int) -> None:
+        cluster = int(np.argmax(self._centroids @ self._vectors[slot]))
+        self._clusters[cluster].add(slot)
+        self._slot_cluster[slot] = cluster
+
+    def add(self, vector: np.ndarray, namespace: int = 0) -> int:
+        """Insert a normalized vector and return its slot."""
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._high_water == len(self._vectors):
+                self._grow()
+            slot = self._high_water
+            self._high_water += 1
+        self._vectors[slot] = vector
+        self._valid[slot] = True
+        self._namespaces[slot] = namespace
+        self._versions[slot] += 1
+        self._size += 1
+        if self._centroids is not None:
+            self._assign(slot)
+        return slot
+
+    def remove(self, slot: int) -> None:
+        if not self._valid[slot]:
+            return
+        self._valid[slot] = False
+        self._versions[slot] += 1
+        self._free.append(slot)
+        self._size -= 1
+        cluster = self._slot_cluster[slot]
+        if cluster >= 0:
+            self._clusters[cluster].discard(slot)
+            self._slot_cluster[slot] = -1
+
+    def cluster_snapshot(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """The vectors, live slots and slot versions to fit clusters on; the vectors are not copied."""
+        slots = np.flatnonzero(self._valid[:self._high_water])
+        return self._vectors, slots, self._versions[:self._high_water].copy()
+
+    def install_clusters(
+        self,
+        slots: np.ndarray,
+        versions: np.ndarray,
+        centroids: np.ndarray,
+        clusters: List[set],
+        assignment: np.ndarray,
+    ) -> None:
+        """Swap in clusters fitted on a snapshot, reassigning the slots written or freed since."""
+        self._centroids = centroids
+        self._clusters = clusters
+        self._slot_cluster[:] = -1
+        self._slot_cluster[slots] = assignment
+        changed = np.flatnonzero(self._versions[:len(versions)] != versions).tolist()
+        for slot in changed:
+            cluster = self._slot_cluster[slot]
+            if cluster >= 0:
+                clusters[cluster].discard(slot)
+                self._slot_cluster[slot] = -1
+        pending = np.asarray(changed + list(range(len(versions), self._high_water)), dtype=np.int64)
+        pending = pending[self._valid[pending]]
+        for start in range(0, len(pending), 8192):
+            block = pending[start:start + 8192]
+            assignment = np.argmax(self._vectors[block] @ centroids.T, axis=1)
+            for slot, cluster in zip(block.tolist(), assignment.tolist()):
+                clusters[cluster].add(slot)
+            self._slot_cluster[block] = assignment
+        self._built_at_size = len(slots)
+
+    def build_clusters(self) -> None:
+        """Fit and install the clusters in place."""
+        vectors, slots, versions = self.cluster_snapshot()
+        self.install_clusters(slots, versions, *fit_clusters(vectors, slots))
+
+    def search(self, vector: np.ndarray, namespace: int = 0) -> Tuple[int, float]:
+        """Return the (slot, similarity) of the closest entry, or (-1, -1.0)."""
+        if self._size == 0:
+            return -1, -1.0
+        if self._centroids is not None:
+            probes = np.argsort(self._centroids @ vector)[-self.nprobe:]
+            candidates = np.fromiter(
+                (slot for c in probes for slot in self._clusters[c]), dtype=np.int64
+            )
+            if len(candidates) == 0:
+                return -1, -1.0
+            candidates = candidates[self._namespaces[candidates] == namespace]
+            if len(candidates) == 0:
+                return -1, -1.0
+            scores = self._vectors[candidates] @ vector
+            best = int(np.argmax(scores))
+            return int(candidates[best]), float(scores[best])
+
+        n = self._high_water
+        scores = self._vectors[:n] @ vector
+        scores[~self._valid[:n] | (self._namespaces[:n] != namespace)] = -np.inf
+        best = int(np.argmax(scores))
+        if not np.isfinite(scores[best]):
+            return -1, -1.0
+        return best, float(scores[best])
+
+
+@dataclass
+class SemanticCacheStats:
+    lookups: int = 0
+    hits: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    guard_rejections: int = 0
+
+
+class SemanticCache(Generic[T]):
+    """
+    Near-duplicate question cache: returns the stored value for the most
+    similar previous question when cosine similarity clears ``threshold``.
+
+    Entries are scoped by a namespace string (deployment, sampling settings)
+    so a hit never crosses configurations. With ``guard`` a match must also
+    have the same ``question_signature``. The threshold depends on the
+    embedder (calibrate it with benchmarks/semantic_calibration.py); the best
+    similarity of every lookup is recorded so it can be tuned on real traffic.
+
+    ``lookup`` and ``add`` embed and search with NumPy, so callers on an event
+    loop run them in a worker thread; a lock guards the index and entries,
+    and the question is embedded before taking it.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        threshold: float,
+        max_entries: int = 10_000,
+        ttl: float = 3600.0,
+        approximate_threshold: int = 100_000,
+        histogram_bins: int = 20,
+        guard: bool = True,
+    ):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.guard = guard
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.approximate_threshold = approximate_threshold
+        self.stats = SemanticCacheStats()
+        self._index: Optional[VectorIndex] = None
+        self._namespace_ids: Dict[str, int] = {}
+        self._entries: Dict[int, Tuple[str, T, float]] = {}
+        self._signatures: Dict[int, Tuple] = {}
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._histogram = np.zeros(histogram_bins, dtype=np.int64)
+        self._recent_similarities: Deque[float] = deque(maxlen=10_000)
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._rebuild: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _embed(self, text: str) -> np.ndarray:
+        return _normalize(np.asarray(self.embedder([text]), dtype=np.float32))[0]
+
+    def _namespace(self, namespace: str) -> int:
+        return self._namespace_ids.setdefault(namespace, len(self._namespace_ids))
+
+    def _record_similarity(self, similarity: float) -> None:
+        clipped = min(max(similarity, 0.0), 1.0)
+        bins = len(self._histogram)
+        self._histogram[min(int(clipped * bins), bins - 1)] += 1
+        self._recent_similarities.append(similarity)
+
+    def lookup(self, question: str, namespace: str = "") -> Optional[Tuple[T, str, float]]:
+        """Return (value, matched_question, similarity) for a near-duplicate, if any."""
+        with self._lock:
+            self.stats.lookups += 1
+            if self._index is None or len(self._index) == 0:
+                return None
+        vector = self._embed(question)
+        with self._lock:
+            slot, similarity = self._index.search(vector, self._namespace(namespace))
+            if slot < 0:
+                return None
+            self._record_similarity(similarity)
+            if similarity < self.threshold:
+                return None
+            if self.guard and self._signatures[slot] != question_signature(question):
+                self.stats.guard_rejections += 1
+                return None
+            matched_question, value, expires_at = self._entries[slot]
+            if expires_at < time.time():
+                self._remove(slot)
+                self.stats.expirations += 1
+                return None
+            self._lru.move_to_end(slot)
+            self.stats.hits += 1
+            return value, matched_question, similarity
+
+    def add(self, question: str, value: T, namespace: str = "") -> None:
+        """Index a question and its value, evicting the least recently used entry when full."""
+        if self.max_entries <= 0:
+            return
+        vector = self._embed(question)
+        signature = question_signature(question)
+        with self._lock:
+            if self._index is None:
+                self._index = VectorIndex(len(vector), approximate_threshold=self.approximate_threshold)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._lru)))
+                self.stats.evictions += 1
+            slot = self._index.add(vector, self._namespace(namespace))
+            self._entries[slot] = (question, value, time.time() + self.ttl)
+            self._signatures[slot] = signature
+            self._lru[slot] = None
+            rebuild = self._index.rebuild_due and not self._rebuilding
+            self._rebuilding = self._rebuilding or rebuild
+        if not rebuild:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Not on an event loop (a worker thread or a script): fit here
+            self._fit_clusters()
+        else:
+            self._rebuild = loop.create_task(asyncio.to_thread(self._fit_clusters))
+
+    def _fit_clusters(self) -> None:
+        """Fit the clusters on a snapshot outside the lock and swap them in; searches keep using the old ones meanwhile."""
+        try:
+            with self._lock:
+                index = self._index
+                vectors, slots, versions = index.cluster_snapshot()
+            fitted = fit_clusters(vectors, slots)
+            with self._lock:
+                index.install_clusters(slots, versions, *fitted)
+        finally:
+            self._rebuilding = False
+
+    def _remove(self, slot: int) -> None:
+        self._index.remove(slot)
+        del self._entries[slot]
+        del self._signatures[slot]
+        del self._lru[slot]
+
+    def stats_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            similarities = np.asarray(self._recent_similarities, dtype=np.float64)
+            histogram = self._histogram.copy()
+        percentiles = {}
+        if len(similarities):
+            for p in (50, 90, 95, 99):
+                percentiles[f"p{p}"] = float(np.percentile(similarities, p))
+        bins = len(histogram)
+        return {
+            "lookups": self.stats.lookups,
+            "hits": self.stats.hits,
+            "hit_rate": self.stats.hits / self.stats.lookups if self.stats.lookups else 0.0,
+            "evictions": self.stats.evictions,
+            "expirations": self.stats.expirations,
+            "guard_rejections": self.stats.guard_rejections,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "approximate": self._index.approximate if self._index is not None else False,
+            "similarity_percentiles": percentiles,
+            "similarity_histogram": {
+                f"{i / bins:.2f}-{(i + 1) / bins:.2f}": int(count)
+                for i, count in enumerate(histogram)
+            },
+        }
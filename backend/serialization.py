@@ -0,0 +1,103 @@
+import gzip
+import json
+from typing import Any, Dict, Optional, Union
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used without it
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional; only gzip is offered without it
+    brotli = None
+
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode a response body. Models are serialized straight to JSON by
+    pydantic-core, without building an intermediate dict; anything else goes
+    through orjson when it is installed.
+    """
+    if isinstance(content, BaseModel):
+        return content.model_dump_json().encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with ``dumps``."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class BufferResponse(Response):
+    """
+    Response whose body may be a memoryview (e.g. a slice of a memory-mapped
+    file), handed to the server as is instead of being copied to bytes first.
+    """
+
+    def render(self, content: Any) -> Union[bytes, memoryview]:
+        if isinstance(content, memoryview):
+            return content
+        return super().render(content)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick "br" or "gzip" from an Accept-Encoding header, or None for identity."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip()] = weight
+
+    candidates = ("br", "gzip") if brotli is not None else ("gzip",)
+    best = None
+    for coding in candidates:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > 0 and (best is None or weight > best[1]):
+            best = (coding, weight)
+    return best[0] if best else None
+
+
+def compress(body: Union[bytes, memoryview], encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def encoded_response(
+    body: Union[bytes, memoryview],
+    accept_encoding: str = "",
+    min_compress_bytes: Optional[int] = None,
+    headers: Optional[Dict[str, str]] = None,
+    media_type: str = "application/json"
+) -> Response:
+    """
+    Wrap an encoded body in a Response, compressed with the client's
+    preferred encoding when it is at least ``min_compress_bytes`` long
+    (None disables compression). An uncompressed memoryview body is sent
+    without copying.
+    """
+    headers = dict(headers or {})
+    if min_compress_bytes is not None and len(body) >= min_compress_bytes:
+        headers["Vary"] = "Accept-Encoding"
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding is not None:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+    return BufferResponse(content=body, media_type=media_type, headers=headers)
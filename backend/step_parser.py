@@ -0,0 +1,258 @@
+import json
+import re
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Type, TypeVar
+
+T = TypeVar("T")
+
+STEP_FIELDS = ("thought", "supporting_facts", "confidence", "next_steps")
+
+# Characters that change scanner state inside an object / inside a string
+_OBJECT_TOKENS = re.compile(r'[{}"]')
+_STRING_TOKENS = re.compile(r'["\\]')
+_FINAL_ANSWER_PATTERN = re.compile(r'Final Answer:\s*(.+)(?:\n|$)', re.IGNORECASE)
+
+
+@dataclass
+class ParseStats:
+    """Counters describing what the parser saw, in place of per-failure prints."""
+    objects: int = 0
+    steps: int = 0
+    decode_errors: int = 0
+    invalid_steps: int = 0
+    unterminated: int = 0
+
+    @property
+    def failures(self) -> int:
+        return self.decode_errors + self.invalid_steps + self.unterminated
+
+    def merge(self, other: "ParseStats") -> None:
+        """Add another parser's counters into this one."""
+        self.objects += other.objects
+        self.steps += other.steps
+        self.decode_errors += other.decode_errors
+        self.invalid_steps += other.invalid_steps
+        self.unterminated += other.unterminated
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+def _is_str_list(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def _confidence(value: Any) -> Optional[float]:
+    """
+    A step's confidence, or None if it is not a number. Numeric strings such
+    as "0.85" are converted, as pydantic's lax mode does; booleans are not.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def validate_step(step_dict: Any) -> bool:
+    """Check that a decoded object has the fields and types of a thought step."""
+    if not isinstance(step_dict, dict):
+        return False
+    return (
+        isinstance(step_dict.get("thought"), str)
+        and _is_str_list(step_dict.get("supporting_facts"))
+        and _confidence(step_dict.get("confidence")) is not None
+        and _is_str_list(step_dict.get("next_steps"))
+    )
+
+
+def extract_final_answer(response: str) -> str:
+    """Extract the final answer from the model response."""
+    match = _FINAL_ANSWER_PATTERN.search(response)
+    return match.group(1).strip() if match else ""
+
+
+class ThoughtStepParser:
+    """
+    Single-pass, incremental parser for thought steps embedded in model output.
+
+    Text is fed in arbitrary chunks; every top-level JSON object is tracked with
+    a brace/string/escape aware scanner and decoded once when it closes, so
+    nested objects and braces inside strings are handled and each character is
+    inspected a bounded number of times. Decoded objects that look like thought
+    steps are turned into steps with ``step_factory``; everything else is
+    counted in ``stats``.
+    """
+
+    def __init__(self, step_factory: Callable[..., T]):
+        self.step_factory = step_factory
+        self.stats = ParseStats()
+        # Text of the open object, one piece per chunk, joined once when it closes
+        self._parts: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def pending(self) -> bool:
+        """True while a JSON object is open, i.e. the text fed so far ends inside one."""
+        return self._depth > 0
+
+    def feed(self, chunk: str) -> List[T]:
+        """Add a chunk of text and return the steps whose JSON object closed in it."""
+        if not chunk:
+            return []
+        return list(self._scan(chunk))
+
+    def close(self) -> List[T]:
+        """
+        Finish parsing. If an object is still open (for example a stray "{" in
+        prose), rescan the text after it once so later steps are not lost.
+        """
+        steps: List[T] = []
+        if self._depth > 0:
+            self.stats.unterminated += 1
+            text = "".join(self._parts)
+            self._reset_object()
+            steps.extend(self._scan(text[1:]))
+        if self._depth > 0:
+            self.stats.unterminated += 1
+            self._reset_object()
+        return steps
+
+    def parse(self, response: str) -> List[T]:
+        """Parse a complete response in one call."""
+        steps = self.feed(response)
+        steps.extend(self.close())
+        return steps
+
+    def _reset_object(self) -> None:
+        self._parts = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def _scan(self, text: str) -> Iterator[T]:
+        length = len(text)
+        pos = 0
+        # Where the open object's text starts in this chunk
+        start = 0
+        if self._escaped:
+            # The previous chunk ended in a backslash inside a string; skip the escaped character
+            self._escaped = False
+            pos = 1
+        while pos < length:
+            if self._depth == 0:
+                pos = text.find("{", pos)
+                if pos < 0:
+                    break
+                start = pos
+                self._depth = 1
+                pos += 1
+            elif self._in_string:
+                match = _STRING_TOKENS.search(text, pos)
+                if match is None:
+                    break
+                if match.group() == "\\":
+                    if match.end() >= length:
+                        self._escaped = True
+                        break
+                    pos = match.end() + 1
+                else:
+                    self._in_string = False
+                    pos = match.end()
+            else:
+                match = _OBJECT_TOKENS.search(text, pos)
+                if match is None:
+                    break
+                token = match.group()
+                pos = match.end()
+                if token == '"':
+                    self._in_string = True
+                elif token == "{":
+                    self._depth += 1
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self._parts.append(text[start:pos])
+                        decoded = "".join(self._parts)
+                        self._reset_object()
+                        yield from self._decode(decoded)
+
+        # Keep only the open object's text; everything else can no longer be part of one
+        if self._depth > 0:
+            self._parts.append(text[start:])
+
+    def _decode(self, text: str) -> Iterator[T]:
+        self.stats.objects += 1
+        try:
+            decoded = json.loads(text)
+        except json.JSONDecodeError:
+            self.stats.decode_errors += 1
+            return
+
+        # Accept a wrapper object such as {"steps": [...]} as well as bare steps
+        if isinstance(decoded, dict) and "thought" not in decoded and isinstance(decoded.get("steps"), list):
+            candidates = decoded["steps"]
+        else:
+            candidates = [decoded]
+
+        for step_dict in candidates:
+            if not validate_step(step_dict):
+                self.stats.invalid_steps += 1
+                continue
+            self.stats.steps += 1
+            fields = {field: step_dict[field] for field in STEP_FIELDS}
+            fields["confidence"] = _confidence(fields["confidence"])
+            yield self.step_factory(**fields)
+
+
+def parse_thought_steps(response: str, step_factory: Callable[..., T], stats: Optional[ParseStats] = None) -> List[T]:
+    """Parse every thought step in a complete response, optionally accumulating counters."""
+    parser = ThoughtStepParser(step_factory)
+    steps = parser.parse(response)
+    if stats is not None:
+        stats.merge(parser.stats)
+    return steps
+
+
+def strict_json_schema(schema: Any) -> Any:
+    """
+    Copy a JSON schema into the form strict structured outputs accept: every
+    object is closed (no additional properties) and lists all its properties
+    as required.
+    """
+    if isinstance(schema, list):
+        return [strict_json_schema(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    strict = {key: strict_json_schema(value) for key, value in schema.items()}
+    if strict.get("type") == "object" and isinstance(strict.get("properties"), dict):
+        strict["additionalProperties"] = False
+        strict["required"] = list(strict["properties"])
+    return strict
+
+
+def parse_structured_output(response: str, model: Type[T], stats: Optional[ParseStats] = None) -> Optional[T]:
+    """
+    Decode and validate a response produced under a JSON-schema
+    response_format in a single pass with ``model.model_validate_json``.
+    ``model`` must have a ``steps`` list. Returns None when the response does
+    not match the schema, e.g. because it was cut off at max_tokens.
+    """
+    if stats is None:
+        stats = ParseStats()
+    stats.objects += 1
+    try:
+        output = model.model_validate_json(response)
+    except ValueError:
+        # pydantic's ValidationError (invalid JSON included) is a ValueError
+        stats.decode_errors += 1
+        return None
+    stats.steps += len(output.steps)
+    return output
@@ -0,0 +1,82 @@
+"""In-process stand-in for AsyncAzureOpenAI's chat completions, for tests."""
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+
+def steps_response(answer: str = "42", steps: int = 2) -> str:
+    """A free-text response with ``steps`` thought steps and a final answer."""
+    body = "".join(
+        json.dumps({"thought": f"step {n}", "supporting_facts": ["f"], "confidence": 0.8, "next_steps": []}) + "\n"
+        for n in range(steps)
+    )
+    return f"{body}Final Answer: {answer}\n"
+
+
+class FakeStream:
+    """An async iterator of streamed chunks with the ``response.aclose()`` the reasoner calls."""
+
+    def __init__(self, chunks: List[str], chunk_delay: float, finish_reason: str):
+        self._chunks = chunks
+        self._chunk_delay = chunk_delay
+        self._finish_reason = finish_reason
+        self.closed = False
+        self.response = SimpleNamespace(aclose=self._aclose)
+
+    async def _aclose(self) -> None:
+        self.closed = True
+
+    async def __aiter__(self):
+        for text in self._chunks:
+            if self._chunk_delay:
+                await asyncio.sleep(self._chunk_delay)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text), finish_reason=None)])
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None), finish_reason=self._finish_reason)])
+
+
+class FakeCompletions:
+    """
+    ``create`` answers with ``content`` after ``header_delay`` seconds,
+    streamed in ``chunk_size`` character chunks when stream=True. With
+    ``samples`` the n choices of a non-streamed call take their content from
+    it in turn. Every call's keyword arguments are kept in ``calls``.
+    """
+
+    def __init__(self, content: str, header_delay: float = 0.0, chunk_size: int = 8, chunk_delay: float = 0.0,
+                 error: Optional[Exception] = None, samples: Optional[List[str]] = None):
+        self.content = content
+        self.header_delay = header_delay
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.error = error
+        self.samples = samples or [content]
+        self.calls: List[Dict] = []
+        self.streams: List[FakeStream] = []
+        self.with_raw_response = SimpleNamespace(create=self._create_raw)
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.header_delay:
+            await asyncio.sleep(self.header_delay)
+        if self.error is not None:
+            raise self.error
+        if kwargs.get("stream"):
+            chunks = [self.content[i:i + self.chunk_size] for i in range(0, len(self.content), self.chunk_size)]
+            stream = FakeStream(chunks, self.chunk_delay, "stop")
+            self.streams.append(stream)
+            return stream
+        choices = [
+            SimpleNamespace(message=SimpleNamespace(content=self.samples[i % len(self.samples)]), finish_reason="stop")
+            for i in range(kwargs.get("n", 1))
+        ]
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=50, total_tokens=150)
+        return SimpleNamespace(choices=choices, usage=usage)
+
+    async def _create_raw(self, **kwargs):
+        response = await self.create(**kwargs)
+        return SimpleNamespace(headers={}, parse=lambda: response)
+
+
+def fake_client(content: str, **options) -> SimpleNamespace:
+    return SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(content, **options)))
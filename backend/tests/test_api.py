@@ -0,0 +1,166 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backends import Backend, BackendPool
+from cache import ResponseCache
+from fake_openai import fake_client, steps_response
+from main import ChainOfThoughtReasoner, app
+from rate_limit import RateLimitScheduler
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def serve():
+    """Serve the app with a reasoner on the fake client, without running the lifespan."""
+    def start(content: str = steps_response(), fast_serialization: bool = True, compression_min_bytes: int = -1,
+              scheduler: RateLimitScheduler = None, **options):
+        backend = Backend("a", fake_client(content, **options), "a-deployment", scheduler=scheduler)
+        app.state.reasoner = ChainOfThoughtReasoner(backends=BackendPool([backend]), cache=ResponseCache())
+        app.state.fast_serialization = fast_serialization
+        app.state.compression_min_bytes = compression_min_bytes
+        app.state.batch_concurrency = 4
+        app.state.batch_max_concurrency = 8
+        return TestClient(app), backend.client.chat.completions
+
+    yield start
+    for name in ("reasoner", "fast_serialization", "compression_min_bytes", "batch_concurrency", "batch_max_concurrency"):
+        if hasattr(app.state, name):
+            delattr(app.state, name)
+
+
+@pytest.mark.parametrize("fast_serialization", [True, False])
+def test_reason_returns_the_chain(serve, fast_serialization):
+    client, completions = serve(fast_serialization=fast_serialization)
+    response = client.post("/api/reason", json={"question": "What is 6 x 7?"})
+
+    assert response.status_code == 200
+    chain = response.json()
+    assert chain["question"] == "What is 6 x 7?"
+    assert chain["final_answer"] == "42"
+    assert [step["thought"] for step in chain["steps"]] == ["step 0", "step 1"]
+    assert chain["metadata"]["model"] == "a-deployment"
+    assert len(completions.calls) == 1
+
+
+def test_reason_serves_repeats_from_the_cache_unless_bypassed(serve):
+    client, completions = serve()
+    first = client.post("/api/reason", json={"question": "q"}).json()
+    assert client.post("/api/reason", json={"question": "q"}).json() == first
+    assert len(completions.calls) == 1
+    client.post("/api/reason", json={"question": "q", "bypass_cache": True})
+    assert len(completions.calls) == 2
+
+
+def test_reason_compresses_large_responses(serve):
+    client, _ = serve(compression_min_bytes=0)
+    response = client.post("/api/reason", json={"question": "q"}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["final_answer"] == "42"
+
+
+def test_reason_reports_upstream_failures(serve):
+    client, _ = serve(error=UpstreamError(400))
+    response = client.post("/api/reason", json={"question": "q"})
+    assert response.status_code == 500
+    assert response.json()["detail"].startswith("Reasoning failed")
+
+
+def test_reason_validates_the_request(serve):
+    client, completions = serve()
+    assert client.post("/api/reason", json={"question": "q", "samples": 0}).status_code == 422
+    assert client.post("/api/reason", json={}).status_code == 422
+    assert completions.calls == []
+
+
+def read_events(response):
+    """Parse a server-sent event stream into (event, data) pairs."""
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_sends_steps_then_the_final_answer(serve):
+    client, completions = serve(steps_response(steps=3))
+    response = client.post("/api/reason/stream", json={"question": "q"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = read_events(response)
+    assert [event for event, _ in events] == ["step", "step", "step", "final"]
+    assert events[1][1]["thought"] == "step 1"
+    final = events[-1][1]
+    assert (final["question"], final["final_answer"]) == ("q", "42")
+    assert final["metadata"]["num_steps"] == 3
+    assert completions.calls[0]["stream"] is True
+    assert completions.streams[0].closed
+
+
+def test_stream_failures_before_the_first_byte_get_a_status(serve):
+    client, _ = serve(error=UpstreamError(400))
+    response = client.post("/api/reason/stream", json={"question": "q"})
+    assert response.status_code == 500
+    assert response.json()["detail"].startswith("Reasoning failed")
+
+    client, _ = serve(scheduler=RateLimitScheduler(requests_per_minute=1, deadline=0.0))
+    assert client.post("/api/reason/stream", json={"question": "q"}).status_code == 200
+    limited = client.post("/api/reason/stream", json={"question": "q"})
+    assert limited.status_code == 429
+    assert int(limited.headers["retry-after"]) > 0
+
+
+def test_stream_refuses_sampling(serve):
+    client, completions = serve()
+    response = client.post("/api/reason/stream", json={"question": "q", "samples": 3})
+    assert response.status_code == 422
+    assert completions.calls == []
+
+
+def test_batch_streams_one_line_per_item_and_reports_failures_in_place(serve):
+    client, completions = serve()
+    create = completions.create
+
+    async def failing_create(**kwargs):
+        if "fail" in kwargs["messages"][-1]["content"]:
+            raise UpstreamError(400)
+        return await create(**kwargs)
+
+    completions.create = failing_create
+    questions = ["q0", "please fail", "q2", "q3"]
+    response = client.post("/api/reason/batch", json={"requests": [{"question": q} for q in questions]})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = {line["index"]: line for line in map(json.loads, response.text.splitlines())}
+    assert sorted(lines) == [0, 1, 2, 3]
+    assert lines[1]["error"].startswith("Reasoning failed")
+    assert [lines[i]["result"]["question"] for i in (0, 2, 3)] == ["q0", "q2", "q3"]
+
+
+def test_batch_concurrency_is_capped(serve):
+    client, completions = serve(header_delay=0.02)
+    create = completions.create
+    in_flight = [0, 0]
+
+    async def counting_create(**kwargs):
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight)
+        try:
+            return await create(**kwargs)
+        finally:
+            in_flight[0] -= 1
+
+    completions.create = counting_create
+    body = {"requests": [{"question": f"q{n}"} for n in range(20)], "concurrency": 100}
+    lines = client.post("/api/reason/batch", json=body).text.splitlines()
+
+    assert len(lines) == 20
+    assert in_flight[1] == app.state.batch_max_concurrency
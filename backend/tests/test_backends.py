@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from backends import Backend, BackendPool
+from circuit_breaker import CircuitBreaker
+from rate_limit import RateLimitScheduler
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def make_backend(name: str, requests_per_minute=None, open_seconds: float = 30.0) -> Backend:
+    return Backend(
+        name,
+        client=None,
+        deployment=f"{name}-deployment",
+        scheduler=RateLimitScheduler(requests_per_minute=requests_per_minute, deadline=0.0),
+        breaker=CircuitBreaker(min_calls=1, open_seconds=open_seconds),
+    )
+
+
+def failing(status_code: int):
+    async def call(backend: Backend) -> str:
+        raise UpstreamError(status_code)
+    return call
+
+
+def test_client_errors_are_raised_without_counting_against_the_backend():
+    backend = make_backend("a")
+    with pytest.raises(UpstreamError):
+        asyncio.run(BackendPool([backend]).call(failing(400)))
+    assert backend.breaker.state == CircuitBreaker.CLOSED
+    assert (backend.requests, backend.errors) == (1, 0)
+
+
+def test_fails_over_to_the_next_backend():
+    first, second = make_backend("a"), make_backend("b")
+    pool = BackendPool([first, second])
+    calls = []
+
+    async def call(backend: Backend) -> str:
+        calls.append(backend.name)
+        if len(calls) == 1:
+            raise UpstreamError(500)
+        return backend.name
+
+    backend, result = asyncio.run(pool.call(call))
+    assert backend.name == result == calls[1] != calls[0]
+    assert pool.backends[[b.name for b in pool.backends].index(calls[0])].errors == 1
+    assert all(b.outstanding == 0 for b in pool.backends)
+
+
+
+def test_cancelled_calls_are_counted_apart_from_requests():
+    backend = make_backend("a")
+    pool = BackendPool([backend])
+
+    async def slow(backend: Backend) -> str:
+        await asyncio.sleep(5)
+        return "late"
+
+    async def run():
+        task = asyncio.create_task(pool.call(slow))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await pool.call(lambda backend: asyncio.sleep(0, "ok"))
+
+    asyncio.run(run())
+    stats = backend.stats_dict()
+    assert (stats["requests"], stats["errors"], stats["cancelled"]) == (1, 0, 1)
+    assert stats["outstanding"] == 0
+    assert backend.breaker.state == CircuitBreaker.CLOSED
+
+def test_least_outstanding_prefers_the_idle_backend():
+    busy, idle = make_backend("busy"), make_backend("idle")
+    busy.outstanding = 3
+    assert BackendPool([busy, idle]).select().name == "idle"
+
+
+def test_remaining_quota_prefers_the_backend_with_headroom():
+    spent, fresh = make_backend("spent", requests_per_minute=2), make_backend("fresh", requests_per_minute=2)
+    spent.scheduler.request_bucket.try_acquire(2)
+    assert BackendPool([spent, fresh], strategy="remaining_quota").select().name == "fresh"
+
+
+def test_select_skips_excluded_and_open_backends():
+    first, second = make_backend("a"), make_backend("b")
+    second.breaker.record(False, 0.1)
+    pool = BackendPool([first, second])
+    assert pool.select().name == "a"
+    assert pool.select(exclude=["a"]) is None
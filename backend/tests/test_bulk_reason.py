@@ -0,0 +1,61 @@
+import json
+
+from bulk_reason import BulkRunner, completed_ids, read_questions
+from openai_one import ReasoningChain
+
+
+class StubReasoner:
+    def reason(self, question: str) -> ReasoningChain:
+        if "fail" in question:
+            raise RuntimeError("upstream error")
+        return ReasoningChain(question=question, steps=[], final_answer="42", metadata={})
+
+    def analyze_reasoning_chain(self, chain: ReasoningChain) -> dict:
+        return {"total_steps": len(chain.steps)}
+
+
+def write_lines(path, lines):
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_bad_lines_get_error_records_and_the_job_goes_on(tmp_path):
+    source = tmp_path / "requests.jsonl"
+    write_lines(source, [
+        json.dumps({"request_id": "user-001", "title": "Title", "body": "Body"}),
+        "{not json",
+        "",
+        json.dumps({"request_id": "user-002", "title": "No body"}),
+        json.dumps(["a", "list"]),
+        json.dumps({"request_id": "user-003", "title": "fail", "body": "Body"}),
+    ])
+    output = tmp_path / "results.jsonl"
+
+    counts = BulkRunner(StubReasoner(), concurrency=2).run(
+        read_questions(str(source), "request_id", ["title", "body"]), str(output), set()
+    )
+    assert counts == {"completed": 1, "failed": 4, "skipped": 0}
+    records = {record.get("id") or record["line"]: record for record in read_records(output)}
+    assert records["user-001"]["chain"]["question"] == "Title\n\nBody"
+    assert records[2]["error"].startswith("invalid JSON")
+    assert records["user-002"] == {"id": "user-002", "line": 4, "error": "missing or non-string field(s): body"}
+    assert records[5]["error"] == "not a JSON object"
+    assert records["user-003"]["error"] == "upstream error"
+
+
+def test_rerun_skips_completed_ids_and_repairs_a_torn_line(tmp_path):
+    source = tmp_path / "questions.jsonl"
+    write_lines(source, [json.dumps({"id": n, "question": f"question {n}"}) for n in range(4)])
+    output = tmp_path / "results.jsonl"
+    runner = BulkRunner(StubReasoner())
+    runner.run(read_questions(str(source), "id", ["question"]), str(output), set())
+    with open(output, "a", encoding="utf-8") as f:
+        f.write('{"id": "9", "chain"')
+
+    assert completed_ids(str(output)) == {"0", "1", "2", "3"}
+    counts = runner.run(read_questions(str(source), "id", ["question"]), str(output), completed_ids(str(output)))
+    assert counts == {"completed": 0, "failed": 0, "skipped": 4}
+    assert output.read_text(encoding="utf-8").endswith('"chain"\n')
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+from cache import ResponseCache, make_cache_key
+
+
+def test_cache_key_depends_on_every_setting():
+    key = make_cache_key("gpt-4o", "prompt", 0.7, 2000)
+    assert len(key) == 64
+    assert key == make_cache_key("gpt-4o", "prompt", 0.7, 2000, samples=1)
+    others = {
+        make_cache_key("gpt-4o-mini", "prompt", 0.7, 2000),
+        make_cache_key("gpt-4o", "prompt!", 0.7, 2000),
+        make_cache_key("gpt-4o", "prompt", 0.2, 2000),
+        make_cache_key("gpt-4o", "prompt", 0.7, 1000),
+        make_cache_key("gpt-4o", "prompt", 0.7, 2000, samples=5),
+    }
+    assert key not in others and len(others) == 5
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+
+    async def run():
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        assert await cache.get("a") == 1
+        await cache.set("c", 3)
+        return [await cache.get(key) for key in ("a", "b", "c")]
+
+    assert asyncio.run(run()) == [1, None, 3]
+    assert cache.stats.evictions == 1
+    assert cache.stats.to_dict()["hit_rate"] == 3 / 4
+
+
+def test_expired_entries_are_only_served_stale():
+    cache = ResponseCache(ttl=-1.0)
+
+    async def run():
+        await cache.set("a", {"answer": 42})
+        return await cache.get("a"), await cache.get("a", allow_stale=True)
+
+    assert asyncio.run(run()) == (None, {"answer": 42})
+    assert (cache.stats.expirations, cache.stats.stale_hits) == (1, 1)
+
+
+def test_disk_tier_survives_a_restart_and_promotes_into_memory(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first = ResponseCache(path=path)
+    asyncio.run(first.set("a", {"answer": 42}))
+    first.close()
+
+    second = ResponseCache(path=path)
+    assert len(second) == 0
+    assert asyncio.run(second.get("a")) == {"answer": 42}
+    assert (second.stats.disk_hits, len(second)) == (1, 1)
+    second.close()
+
+
+def test_disk_tier_is_pruned_to_its_row_budget(tmp_path):
+    cache = ResponseCache(max_entries=0, path=str(tmp_path / "cache.sqlite"), disk_max_rows=10)
+
+    async def run():
+        for n in range(25):
+            await cache.set(f"key {n}", n)
+            # Distinct expiry times so the oldest rows are the ones dropped
+            time.sleep(0.001)
+        return [await cache.get(f"key {n}") for n in range(25)]
+
+    values = asyncio.run(run())
+    rows = cache._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    assert rows <= 10 + cache._prune_every
+    assert values[-1] == 24 and values[0] is None
+    assert cache.stats.disk_pruned >= 15 - cache._prune_every
+    cache.close()
@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from chain_analysis import StepColumns, analyze_chain, analyze_chains, analyze_columns
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_chain(confidences, finish_reason="stop"):
+    steps = [
+        SimpleNamespace(confidence=c, supporting_facts=["f"] * n, next_steps=["s"] * (n % 2))
+        for n, c in enumerate(confidences)
+    ]
+    return SimpleNamespace(steps=steps, metadata={"finish_reason": finish_reason})
+
+
+CHAINS = [
+    make_chain([0.9, 0.5, 0.8, 0.6]),
+    make_chain([]),
+    make_chain([0.3], finish_reason="length"),
+    make_chain([0.75, 0.95, 0.7, 0.1, 0.99, 0.4]),
+]
+
+
+def test_batch_matches_the_single_chain_analysis():
+    result = analyze_chains(CHAINS)
+    for chain, batched in zip(CHAINS, result["chains"]):
+        single = analyze_chain(chain)
+        assert batched.keys() == single.keys()
+        for key, value in single.items():
+            assert batched[key] == (pytest.approx(value) if isinstance(value, (float, dict)) else value)
+
+
+def test_single_chain_analysis():
+    analysis = analyze_chain(CHAINS[0])
+    assert analysis["chain_length"] == 4
+    assert analysis["average_confidence"] == pytest.approx(0.7)
+    assert analysis["fact_usage"] == 0 + 1 + 2 + 3
+    assert analysis["branching_factor"] == 0.5
+    assert analysis["low_confidence_steps"] == [1, 3]
+    assert analysis["confidence_percentiles"]["p50"] == 0.8
+    assert analyze_chain(CHAINS[1]) == {"error": "No reasoning steps found in the chain"}
+
+
+def test_summary_covers_every_step():
+    summary = analyze_chains(CHAINS)["summary"]
+    assert (summary["chains"], summary["empty_chains"], summary["steps"]) == (4, 1, 11)
+    assert summary["low_confidence_steps"] == 5
+    assert summary["mean_chain_length"] == pytest.approx(11 / 3)
+
+    empty = analyze_columns(StepColumns.from_chains([]))
+    assert empty == {"chains": [], "summary": {
+        "chains": 0, "empty_chains": 0, "steps": 0, "low_confidence_steps": 0, "fact_usage": 0,
+    }}
+
+
+def test_single_chain_path_does_not_import_numpy():
+    check = (
+        "import sys\n"
+        "from types import SimpleNamespace\n"
+        "from chain_analysis import analyze_chain\n"
+        "analyze_chain(SimpleNamespace(steps=[], metadata={}))\n"
+        "assert 'numpy' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", check], cwd=BACKEND_DIR, check=True)
@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import chain_log
+from chain_log import ChainLog, ChainLogLocked
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def payload(n: int) -> bytes:
+    return b'{"question": "q%d", "steps": []}' % n
+
+
+def test_append_get_and_latest(tmp_path):
+    log = ChainLog(str(tmp_path))
+    first = log.append("What is 2+2?", "gpt-4o", payload(1))
+    second = log.append("  what is 2+2? ", "gpt-4o", payload(2))
+    other = log.append("What is 2+2?", "gpt-4o-mini", payload(3))
+    assert first < second < other
+
+    chain_id, data = log.get(first)
+    assert (chain_id, bytes(data)) == (first, payload(1))
+    chain_id, data = log.latest("WHAT IS 2+2?", "gpt-4o")
+    assert (chain_id, bytes(data)) == (second, payload(2))
+    assert bytes(log.latest("What is 2+2?", "gpt-4o-mini")[1]) == payload(3)
+    assert log.get(other + 1) is None
+    assert log.latest("Unknown?", "gpt-4o") is None
+    log.close()
+
+
+def test_reopen_keeps_chains_and_ids(tmp_path):
+    log = ChainLog(str(tmp_path))
+    ids = [log.append(f"question {n}", "gpt-4o", payload(n)) for n in range(5)]
+    log.close()
+
+    log = ChainLog(str(tmp_path))
+    assert [bytes(log.get(chain_id)[1]) for chain_id in ids] == [payload(n) for n in range(5)]
+    assert log.append("question 5", "gpt-4o", payload(5)) == ids[-1] + 1
+    log.close()
+
+
+def test_torn_write_is_cut_off_on_reopen(tmp_path):
+    # A child process appends and dies without closing: the indexes are never flushed
+    crash = (
+        "import os, sys\n"
+        "from chain_log import ChainLog\n"
+        "log = ChainLog(sys.argv[1])\n"
+        "for n in range(3):\n"
+        "    log.append(f'question {n}', 'gpt-4o', b'{\"question\": \"q%d\", \"steps\": []}' % n)\n"
+        "os._exit(0)\n"
+    )
+    subprocess.run([sys.executable, "-c", crash, str(tmp_path)], cwd=BACKEND_DIR, check=True)
+    segment = os.path.join(tmp_path, "segment-000001.log")
+    intact = os.path.getsize(segment)
+    # ...and the last record is only partly written
+    with open(segment, "ab") as f:
+        f.write(b"\x00\x01\x02partial record")
+
+    log = ChainLog(str(tmp_path))
+    assert os.path.getsize(segment) == intact
+    assert [bytes(log.get(chain_id)[1]) for chain_id in (1, 2, 3)] == [payload(n) for n in range(3)]
+    assert log.append("question 3", "gpt-4o", payload(3)) == 4
+    assert bytes(log.get(4)[1]) == payload(3)
+    log.close()
+
+
+def test_directory_has_a_single_owner(tmp_path):
+    log = ChainLog(str(tmp_path))
+    log.append("question", "gpt-4o", payload(1))
+    with pytest.raises(ChainLogLocked):
+        ChainLog(str(tmp_path))
+    assert chain_log.main(["compact", str(tmp_path)]) == 1
+    log.close()
+
+    assert chain_log.main(["compact", str(tmp_path)]) == 0
+    reopened = ChainLog(str(tmp_path))
+    assert bytes(reopened.get(1)[1]) == payload(1)
+    reopened.close()
+
+
+def test_segments_roll_over_and_compact_keeps_the_latest_chain(tmp_path):
+    log = ChainLog(str(tmp_path), segment_bytes=256)
+    ids = [log.append(f"question {n % 3}", "gpt-4o", payload(n)) for n in range(12)]
+    assert log.stats_dict()["segments"] > 1
+    assert [bytes(log.get(chain_id)[1]) for chain_id in ids] == [payload(n) for n in range(12)]
+
+    log.compact()
+    for n in range(3):
+        chain_id, data = log.latest(f"question {n}", "gpt-4o")
+        assert (chain_id, bytes(data)) == (ids[9 + n], payload(9 + n))
+    log.close()
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from chain_analysis import analyze_chains
+from chain_store import ChainStore
+from main import ReasoningChain, ThoughtStep
+
+
+def make_chain(question, confidences, finish_reason="stop"):
+    steps = [
+        ThoughtStep(thought=f"{question} step {n}", supporting_facts=["shared fact", f"fact {n}"],
+                    confidence=c, next_steps=["next"] * n)
+        for n, c in enumerate(confidences)
+    ]
+    return ReasoningChain(question=question, steps=steps, final_answer="42", metadata={"finish_reason": finish_reason})
+
+
+CHAINS = [
+    make_chain("first", [0.9, 0.7, 0.8]),
+    make_chain("second", []),
+    make_chain("third", [0.65, 0.95], finish_reason="length"),
+]
+
+
+@pytest.fixture
+def store():
+    return ChainStore.from_chains(CHAINS, ThoughtStep, ReasoningChain)
+
+
+def test_chains_round_trip(store):
+    assert (len(store), store.num_steps) == (3, 5)
+    assert store.to_chains() == CHAINS
+    assert store[-1] == CHAINS[2]
+    with pytest.raises(IndexError):
+        store[3]
+    # Repeated strings are stored once
+    assert store.strings.strings.count("shared fact") == 1
+
+
+def test_confidence_filters(store):
+    assert store.any_step_below(0.7).tolist() == [2]
+    assert store.all_steps_at_least(0.7).tolist() == [0]
+    assert store.min_confidence()[1] == np.inf
+    assert store.max_confidence().tolist()[2] == pytest.approx(0.95)
+
+
+def test_analyze_matches_chain_analysis(store):
+    stored = store.analyze()
+    direct = analyze_chains(CHAINS)
+    for key, value in direct["summary"].items():
+        expected = pytest.approx(value, rel=1e-6) if not isinstance(value, dict) else {
+            name: pytest.approx(v, rel=1e-6) for name, v in value.items()
+        }
+        assert stored["summary"][key] == expected
+    for ours, theirs in zip(stored["chains"], direct["chains"]):
+        assert ours.keys() == theirs.keys()
+        assert ours.get("low_confidence_steps") == theirs.get("low_confidence_steps")
+        assert ours.get("finish_reason") == theirs.get("finish_reason")
+
+
+def test_columns_are_copies_that_survive_appends(store):
+    confidence = store.confidence
+    store.append(make_chain("fourth", [0.5]))
+    assert len(confidence) == 5
+    assert store.step_offsets.tolist() == [0, 3, 3, 5, 6]
+    assert store.stats_dict()["chains"] == 4
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from backends import Backend, BackendPool, counts_against_backend, is_local_rejection
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from rate_limit import RateLimitExceeded, RateLimitScheduler
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def make_backend(name: str, requests_per_minute=None, open_seconds: float = 30.0) -> Backend:
+    return Backend(
+        name,
+        client=None,
+        deployment=f"{name}-deployment",
+        scheduler=RateLimitScheduler(requests_per_minute=requests_per_minute, deadline=0.0),
+        breaker=CircuitBreaker(min_calls=1, open_seconds=open_seconds),
+    )
+
+
+async def ok(backend: Backend) -> str:
+    return backend.name
+
+
+def failing(status_code: int):
+    async def call(backend: Backend) -> str:
+        raise UpstreamError(status_code)
+    return call
+
+
+def test_breaker_opens_on_failure_rate_and_recovers_through_a_probe():
+    breaker = CircuitBreaker(window=4, min_calls=4, open_seconds=0.0)
+    for success in (True, False, True, False):
+        breaker.before_call()
+        breaker.record(success, 0.1)
+    assert breaker.transitions["closed->open"] == 1
+    # open_seconds=0: the next check moves to half-open and allows one probe
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    assert not breaker.available()
+    breaker.record(True, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_open_breaker_rejects_calls():
+    breaker = CircuitBreaker(min_calls=1)
+    breaker.record(False, 0.1)
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert 0 < error.value.retry_after <= breaker.open_seconds
+    assert breaker.rejected == 1
+
+
+def test_local_and_upstream_rate_limits_are_told_apart():
+    local = RateLimitExceeded(1.0)
+    upstream = RateLimitExceeded(1.0)
+    upstream.__cause__ = UpstreamError(429)
+    assert is_local_rejection(local) and not counts_against_backend(local)
+    assert not is_local_rejection(upstream) and counts_against_backend(upstream)
+    assert counts_against_backend(UpstreamError(503))
+    assert not counts_against_backend(UpstreamError(400))
+
+
+def test_local_rejection_does_not_open_the_breaker():
+    backend = make_backend("a", requests_per_minute=1)
+    pool = BackendPool([backend])
+    assert asyncio.run(pool.call(ok))[1] == "a"
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(pool.call(ok))
+    assert backend.breaker.state == CircuitBreaker.CLOSED
+    assert (backend.requests, backend.errors) == (1, 0)
+
+
+def test_local_rejection_releases_a_half_open_probe():
+    backend = make_backend("a", requests_per_minute=1, open_seconds=0.0)
+    backend.scheduler.request_bucket.try_acquire(1)
+    backend.breaker.record(False, 0.1)
+    assert backend.breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(BackendPool([backend]).call(ok))
+    assert backend.breaker.available()
+
+
+def test_upstream_failure_opens_the_breaker():
+    backend = make_backend("a")
+    pool = BackendPool([backend])
+    with pytest.raises(UpstreamError):
+        asyncio.run(pool.call(failing(503)))
+    assert backend.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(pool.call(ok))
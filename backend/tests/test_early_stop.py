@@ -0,0 +1,50 @@
+from early_stop import EarlyStopPolicy
+
+
+def run(chunks, policy=None, in_object=False):
+    watcher = (policy or EarlyStopPolicy()).watcher()
+    reasons = [watcher.feed(chunk, [], in_object) for chunk in chunks]
+    return watcher, reasons
+
+
+def test_final_answer_line_meets_the_condition_across_split_marker():
+    watcher, reasons = run(["steps...\nFinal Ans", "wer:", " 4", "2", "\n"])
+    assert reasons == [None, None, None, None, "final_answer"]
+
+
+def test_marker_inside_a_step_is_ignored():
+    watcher, reasons = run(['{"thought": "Final Answer: 1\\n"', "}"], in_object=True)
+    assert reasons == [None, None]
+
+
+def test_blank_line_after_marker_does_not_end_the_answer():
+    watcher, reasons = run(["Final Answer:", "\n", "  ", "42\n"])
+    assert reasons == [None, None, None, "final_answer"]
+
+
+def test_no_savings_when_the_model_stops_on_its_own():
+    watcher, _ = run(["Final Answer: 42\n"])
+    assert not watcher.after_stop("\n")
+    summary = watcher.summary(max_tokens=100, upstream_finish_reason="stop")
+    assert summary["reason"] == "final_answer"
+    assert not summary["stopped"]
+    assert summary["upstream_finish_reason"] == "stop"
+    assert summary["tokens_saved_upper_bound"] is None
+
+
+def test_savings_when_content_follows_the_answer():
+    watcher, _ = run(["Final Answer: 42\n"])
+    assert watcher.after_stop("Extra")
+    summary = watcher.summary(max_tokens=100, upstream_finish_reason=None)
+    assert summary["stopped"]
+    assert summary["tokens_saved_upper_bound"] == 99
+
+
+def test_step_conditions():
+    watcher = EarlyStopPolicy(final_answer=False, max_steps=2).watcher()
+    assert watcher.feed("x", [0.1], False) is None
+    assert watcher.feed("y", [0.2], False) == "max_steps"
+
+    watcher = EarlyStopPolicy(final_answer=False, min_confidence=0.9).watcher()
+    assert watcher.feed("x", [0.5, 0.95], False) == "confidence"
+    assert watcher.steps == 2
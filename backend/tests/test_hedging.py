@@ -0,0 +1,90 @@
+import asyncio
+
+from backends import Backend, BackendPool
+from fake_openai import fake_client, steps_response
+from hedging import HedgePolicy
+from main import ChainOfThoughtReasoner
+from rate_limit import RateLimitScheduler
+
+TOKENS_PER_MINUTE = 6000
+
+
+def make_backend(name: str, weight: float = 1.0, **options) -> Backend:
+    return Backend(
+        name,
+        fake_client(steps_response(), **options),
+        f"{name}-deployment",
+        weight=weight,
+        scheduler=RateLimitScheduler(tokens_per_minute=TOKENS_PER_MINUTE),
+    )
+
+
+def reserved(backend: Backend) -> float:
+    """Tokens still taken from the backend's budget; max_tokens alone is 2000."""
+    return TOKENS_PER_MINUTE - backend.scheduler.token_bucket.available
+
+
+def test_delay_tracks_the_first_token_percentile():
+    policy = HedgePolicy(percentile=0.9, initial_delay=2.0, min_delay=0.1, min_samples=10)
+    for n in range(9):
+        policy.observe_first_token(n / 10)
+    assert policy.delay() == 2.0
+    policy.observe_first_token(0.9)
+    assert policy.delay() == 0.9
+
+    fast = HedgePolicy(min_delay=0.1, min_samples=1)
+    fast.observe_first_token(0.01)
+    assert fast.delay() == 0.1
+
+
+def test_budget_keeps_hedges_below_the_ratio():
+    policy = HedgePolicy(max_ratio=0.25, burst=2.0)
+    granted = 0
+    for _ in range(100):
+        policy.start_request()
+        granted += policy.try_hedge()
+    assert granted == 25
+    assert policy.stats_dict()["hedge_rate"] == 0.25
+    assert policy.stats.budget_denied == 75
+
+    saved = HedgePolicy(max_ratio=0.5, burst=2.0)
+    for _ in range(10):
+        saved.start_request()
+    assert [saved.try_hedge() for _ in range(3)] == [True, True, False]
+
+
+def test_no_hedge_without_budget():
+    slow = make_backend("slow", weight=2.0, header_delay=0.1)
+    fast = make_backend("fast")
+    policy = HedgePolicy(initial_delay=0.01, max_ratio=0.0)
+    reasoner = ChainOfThoughtReasoner(backends=BackendPool([slow, fast]), hedging=policy)
+
+    chain = asyncio.run(reasoner.reason("q", use_cache=False))
+    assert chain.metadata["model"] == "slow-deployment"
+    assert chain.metadata["hedged"] is False
+    assert fast.client.chat.completions.calls == []
+    assert policy.stats.budget_denied == 1
+
+
+def test_hedge_cancelled_before_headers_settles_its_reservation():
+    # The heavier backend is picked first and never sends headers in time
+    slow = make_backend("slow", weight=2.0, header_delay=5.0)
+    fast = make_backend("fast")
+    policy = HedgePolicy(initial_delay=0.05, max_ratio=1.0)
+    reasoner = ChainOfThoughtReasoner(backends=BackendPool([slow, fast]), hedging=policy)
+
+    async def run():
+        chain = await reasoner.reason("q", use_cache=False)
+        # Let the cancelled primary unwind
+        await asyncio.sleep(0.01)
+        return chain
+
+    chain = asyncio.run(run())
+    assert chain.metadata["hedge_winner"] == "hedge"
+    assert chain.metadata["model"] == "fast-deployment"
+    assert (policy.stats.hedges, policy.stats.hedge_wins) == (1, 1)
+    assert len(slow.client.chat.completions.calls) == 1
+    assert slow.client.chat.completions.streams == []
+    assert (slow.requests, slow.cancelled, fast.requests) == (0, 1, 1)
+    assert reserved(slow) < 1000
+    assert reserved(fast) < 1000
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from rate_limit import (
+    RateLimitExceeded,
+    RateLimitScheduler,
+    TokenBucket,
+    parse_duration,
+    retry_delay_from_headers,
+)
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code: int, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+def test_token_bucket_admits_up_to_capacity_then_asks_to_wait():
+    bucket = TokenBucket(capacity=2, rate=1.0)
+    assert bucket.try_acquire(1) == 0.0
+    assert bucket.try_acquire(1) == 0.0
+    assert 0 < bucket.try_acquire(1) <= 1.0
+    bucket.refund(1)
+    assert bucket.try_acquire(1) == 0.0
+
+
+def test_oversized_request_is_admitted_from_a_full_bucket():
+    bucket = TokenBucket(capacity=10, rate=1.0)
+    assert bucket.try_acquire(25) == 0.0
+    assert bucket.available < 0
+
+
+def test_clamp_caps_available_tokens():
+    bucket = TokenBucket(capacity=100, rate=0.001)
+    bucket.clamp(5)
+    assert bucket.available == pytest.approx(5, abs=0.01)
+
+
+def test_retry_delay_from_headers():
+    assert retry_delay_from_headers({"retry-after-ms": "1500"}) == 1.5
+    assert retry_delay_from_headers({"retry-after": "7"}) == 7.0
+    assert retry_delay_from_headers({"x-ratelimit-reset-requests": "1s", "x-ratelimit-reset-tokens": "6m0s"}) == 360.0
+    assert retry_delay_from_headers({}) is None
+    assert parse_duration("20ms") == pytest.approx(0.02)
+
+
+def test_scheduler_gives_up_when_the_budget_is_spent():
+    scheduler = RateLimitScheduler(requests_per_minute=1, deadline=0.0)
+    scheduler.run_sync(lambda: "ok")
+    with pytest.raises(RateLimitExceeded) as error:
+        scheduler.run_sync(lambda: "ok")
+    assert error.value.__cause__ is None
+    assert scheduler.stats.gave_up == 1
+
+
+def test_upstream_429_pauses_admission_and_chains_the_cause():
+    scheduler = RateLimitScheduler(deadline=0.0)
+
+    async def call():
+        raise UpstreamError(429, {"retry-after": "20"})
+
+    with pytest.raises(RateLimitExceeded) as error:
+        asyncio.run(scheduler.run(call, retry=False))
+    assert isinstance(error.value.__cause__, UpstreamError)
+    assert scheduler.headroom() == 0.0
+    assert scheduler.stats.rate_limited == 1
+
+
+def test_client_errors_give_the_reservation_back():
+    scheduler = RateLimitScheduler(tokens_per_minute=6000)
+
+    async def call():
+        raise UpstreamError(400)
+
+    with pytest.raises(UpstreamError):
+        asyncio.run(scheduler.run(call, estimated_tokens=2500))
+    assert scheduler.token_bucket.available > 5900
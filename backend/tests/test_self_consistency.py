@@ -0,0 +1,45 @@
+import asyncio
+
+from backends import Backend, BackendPool
+from cache import ResponseCache
+from fake_openai import fake_client, steps_response
+from main import ChainOfThoughtReasoner
+from self_consistency import normalize_answer, vote
+
+
+def test_equivalent_answers_normalize_alike():
+    assert normalize_answer("The answer is: $1,000.") == normalize_answer("1000.0") == "1000"
+    assert normalize_answer(" 0.50 ") == "0.5"
+    assert normalize_answer('"Paris"!') == normalize_answer("paris") == "paris"
+    assert normalize_answer("") == ""
+
+
+def test_majority_wins_and_empty_answers_count_against_agreement():
+    result = vote(["42", "41", "42.0", "", "forty-two"], [0.5, 0.9, 0.8, 1.0, 0.7])
+    assert result.winner == 2
+    assert result.agreement == 2 / 5
+    assert [(c["answer"], c["votes"]) for c in result.clusters] == [("42", 2), ("41", 1), ("forty-two", 1)]
+    assert vote(["", ""], [0.5, 0.5]).winner is None
+
+
+def test_ties_go_to_the_higher_mean_score():
+    assert vote(["a", "b", "b", "a"], [0.9, 0.2, 0.3, 0.8]).winner == 0
+
+
+def test_sampled_request_returns_the_majority_chain():
+    answers = ["41", "42", "42", "42", "43"]
+    client = fake_client(steps_response(), samples=[steps_response(answer) for answer in answers])
+    backend = Backend("a", client, "a-deployment")
+    reasoner = ChainOfThoughtReasoner(backends=BackendPool([backend]), cache=ResponseCache())
+
+    chain = asyncio.run(reasoner.reason("q", samples=5))
+    assert chain.final_answer == "42"
+    consistency = chain.metadata["self_consistency"]
+    assert (consistency["samples"], consistency["agreement"]) == (5, 0.6)
+    assert consistency["selected_sample"] in (1, 2, 3)
+    assert client.chat.completions.calls[0]["n"] == 5
+    # A sampled chain is cached under its own key
+    assert asyncio.run(reasoner.reason("q", samples=5)) == chain
+    assert len(client.chat.completions.calls) == 1
+    assert "self_consistency" not in asyncio.run(reasoner.reason("q")).metadata
+    assert len(client.chat.completions.calls) == 2
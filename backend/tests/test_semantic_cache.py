@@ -0,0 +1,80 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from semantic_cache import HashingEmbedder, SemanticCache, VectorIndex, question_signature
+
+
+def make_cache(**options) -> SemanticCache:
+    return SemanticCache(HashingEmbedder(), threshold=0.6, **options)
+
+
+def test_near_duplicate_hits_within_its_namespace():
+    cache = make_cache()
+    cache.add("How do I rename a git branch?", "answer", "gpt-4o")
+
+    value, matched, similarity = cache.lookup("how do I rename a git branch", "gpt-4o")
+    assert (value, matched) == ("answer", "How do I rename a git branch?")
+    assert similarity > 0.6
+    assert cache.lookup("how do I rename a git branch", "gpt-4o-mini") is None
+    assert cache.lookup("What is the capital of France?", "gpt-4o") is None
+    assert cache.stats.hits == 1
+
+
+def test_guard_rejects_a_changed_number_or_negation():
+    assert question_signature("Isn't it safe?") == (("not",), ())
+    cache = make_cache(guard=True)
+    cache.add("What is 15% of 80?", "12")
+    assert cache.lookup("What is 15% of 90?") is None
+    assert cache.stats.guard_rejections == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = make_cache(max_entries=2)
+    cache.add("first question about apples", 1)
+    cache.add("second question about pears", 2)
+    assert cache.lookup("first question about apples") is not None
+    cache.add("third question about plums", 3)
+
+    assert len(cache) == 2
+    assert cache.stats.evictions == 1
+    assert cache.lookup("second question about pears") is None
+    assert cache.lookup("first question about apples")[0] == 1
+
+
+def test_approximate_search_finds_the_exact_entry():
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(400, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = VectorIndex(16, capacity=8, approximate_threshold=100, nprobe=4)
+    for vector in vectors:
+        index.add(vector)
+    assert index.rebuild_due
+    index.build_clusters()
+
+    assert index.approximate
+    assert index.search(vectors[123]) == (123, np.float32(vectors[123] @ vectors[123]))
+
+
+def test_adds_and_lookups_from_worker_threads():
+    cache = make_cache(approximate_threshold=50)
+    questions = [f"question number {n} about topic {n * 7}" for n in range(200)]
+
+    async def run():
+        await asyncio.gather(*(asyncio.to_thread(cache.add, q, n) for n, q in enumerate(questions)))
+        if cache._rebuild is not None:
+            await cache._rebuild
+        return await asyncio.gather(*(asyncio.to_thread(cache.lookup, q) for q in questions[:20]))
+
+    matches = asyncio.run(run())
+    assert len(cache) == 200
+    assert cache.stats_dict()["approximate"]
+    assert [match[0] for match in matches] == list(range(20))
+
+
+def test_script_callers_build_clusters_in_place():
+    cache = make_cache(approximate_threshold=10)
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda n: cache.add(f"question {n} about item {n}", n), range(30)))
+    assert cache.stats_dict()["approximate"]
@@ -0,0 +1,61 @@
+import gzip
+import json
+
+import pytest
+
+import serialization
+from main import ReasoningChain
+from serialization import BufferResponse, dumps, encoded_response, negotiate_encoding
+
+CHAIN = ReasoningChain(question="q", steps=[], final_answer="42", metadata={"finish_reason": "stop"})
+
+
+def test_dumps_encodes_models_and_plain_values():
+    assert json.loads(dumps(CHAIN)) == CHAIN.model_dump()
+    assert json.loads(dumps({"answer": "café", "n": [1, 2]})) == {"answer": "café", "n": [1, 2]}
+
+
+def test_negotiation_follows_the_quality_values(monkeypatch):
+    monkeypatch.setattr(serialization, "brotli", None)
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("br") is None
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("*;q=0.5") == "gzip"
+    assert negotiate_encoding("") is None
+
+    monkeypatch.setattr(serialization, "brotli", object())
+    assert negotiate_encoding("gzip, br") == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert negotiate_encoding("br;q=bogus, gzip") == "gzip"
+
+
+def test_bodies_are_compressed_only_past_the_threshold(monkeypatch):
+    monkeypatch.setattr(serialization, "brotli", None)
+    body = dumps({"steps": ["a long repeated thought"] * 50})
+
+    response = encoded_response(body, "gzip", min_compress_bytes=100, headers={"X-Chain-Id": "7"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["x-chain-id"] == "7"
+    assert gzip.decompress(response.body) == body
+
+    small = encoded_response(b"{}", "gzip", min_compress_bytes=100)
+    assert "content-encoding" not in small.headers and "vary" not in small.headers
+    assert "content-encoding" not in encoded_response(body, "gzip", min_compress_bytes=None).headers
+    identity = encoded_response(body, "identity", min_compress_bytes=100)
+    assert "content-encoding" not in identity.headers and identity.headers["vary"] == "Accept-Encoding"
+
+
+def test_memoryview_bodies_are_sent_without_copying():
+    view = memoryview(b'{"answer": "42"}')
+    response = encoded_response(view, "gzip", min_compress_bytes=None)
+    assert isinstance(response, BufferResponse)
+    assert response.body is view
+    assert response.headers["content-length"] == str(len(view))
+
+
+@pytest.mark.skipif(serialization.brotli is None, reason="brotli is not installed")
+def test_brotli_round_trip():
+    body = dumps({"steps": ["thought"] * 100})
+    response = encoded_response(body, "br", min_compress_bytes=0)
+    assert serialization.brotli.decompress(response.body) == body
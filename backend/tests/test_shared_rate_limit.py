@@ -0,0 +1,72 @@
+import asyncio
+import os
+
+import pytest
+
+from rate_limit import RateLimitExceeded, RateLimitScheduler, SharedRateLimitState
+
+
+@pytest.fixture
+def state_path(tmp_path):
+    return os.path.join(tmp_path, "rate_limits.sqlite")
+
+
+def test_shared_bucket_is_one_budget_across_processes(state_path):
+    states = [SharedRateLimitState(state_path) for _ in range(2)]
+    buckets = [state.bucket("default:requests", 3, 3 / 60.0) for state in states]
+    admitted = sum(buckets[i % 2].try_acquire(1) == 0.0 for i in range(6))
+    assert admitted == 3
+    for state in states:
+        state.close()
+
+
+def test_shared_refund_is_visible_to_other_processes_after_flush(state_path):
+    first, second = SharedRateLimitState(state_path), SharedRateLimitState(state_path)
+    mine = first.bucket("default:tokens", 100, 0.001)
+    theirs = second.bucket("default:tokens", 100, 0.001)
+    assert mine.try_acquire(100) == 0.0
+    mine.refund(60)
+    assert theirs.try_acquire(50) > 0
+    mine.flush()
+    assert theirs.try_acquire(50) == 0.0
+    first.close()
+    second.close()
+
+
+def test_shared_pause_applies_to_every_process(state_path):
+    first, second = SharedRateLimitState(state_path), SharedRateLimitState(state_path)
+    first.pause("default", 30)
+    assert first.cached_pause_remaining("default") > 29
+    assert second.cached_pause_remaining("default") <= 0
+    assert second.pause_remaining("default") > 29
+    assert second.cached_pause_remaining("default") > 29
+    first.close()
+    second.close()
+
+
+def test_settle_outside_a_loop_writes_the_refund_through(state_path):
+    first, second = SharedRateLimitState(state_path), SharedRateLimitState(state_path)
+    scheduler = RateLimitScheduler(tokens_per_minute=100, shared_state=first)
+    scheduler.run_sync(lambda: None, estimated_tokens=60)
+    scheduler.settle(60, 10)
+    assert second.bucket("default:tokens", 100, 100 / 60.0).try_acquire(90) == 0.0
+    first.close()
+    second.close()
+
+
+def test_shared_scheduler_admits_off_the_event_loop(state_path):
+    state = SharedRateLimitState(state_path)
+    scheduler = RateLimitScheduler(requests_per_minute=2, shared_state=state, deadline=0.0)
+
+    async def call():
+        return "ok"
+
+    async def main():
+        results = [await scheduler.run(call) for _ in range(2)]
+        with pytest.raises(RateLimitExceeded):
+            await scheduler.run(call)
+        return results
+
+    assert asyncio.run(main()) == ["ok", "ok"]
+    assert scheduler.headroom() == pytest.approx(0.0, abs=0.01)
+    state.close()
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_task():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)), flight.do("other", fetch))
+        return results, len(flight)
+
+    results, in_flight = asyncio.run(run())
+    assert results == ["answer"] * 6
+    assert len(calls) == 2 and in_flight == 0
+    assert flight.stats.to_dict() == {"calls": 2, "coalesced": 4, "abandoned": 0}
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream")
+
+    async def run():
+        results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+        retry = await flight.do("key", lambda: asyncio.sleep(0, "ok"))
+        return results, retry
+
+    results, retry = asyncio.run(run())
+    assert [type(r) for r in results] == [ValueError, ValueError]
+    assert retry == "ok"
+
+
+def test_cancelled_waiter_leaves_the_call_to_the_others():
+    flight = SingleFlight()
+    started = []
+
+    async def fetch():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def run():
+        first = asyncio.create_task(flight.do("key", fetch))
+        second = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "answer"
+    assert len(started) == 1
+    assert flight.stats.abandoned == 0
+
+
+def test_call_is_cancelled_once_every_waiter_is_gone():
+    flight = SingleFlight()
+    cancelled = []
+
+    async def fetch():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def run():
+        waiter = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.sleep(0)
+        return len(flight)
+
+    assert asyncio.run(run()) == 0
+    assert cancelled == [1]
+    assert flight.stats.abandoned == 1
@@ -0,0 +1,102 @@
+import json
+from dataclasses import dataclass
+from typing import List
+
+from step_parser import ThoughtStepParser, extract_final_answer, parse_thought_steps, validate_step
+
+
+@dataclass
+class Step:
+    thought: str
+    supporting_facts: List[str]
+    confidence: float
+    next_steps: List[str]
+
+
+def step_json(thought: str = "t", confidence=0.5) -> str:
+    return json.dumps({"thought": thought, "supporting_facts": ["f"], "confidence": confidence, "next_steps": ["n"]})
+
+
+RESPONSE = (
+    "Let me think.\n"
+    + step_json('a "quoted" {brace} and \\ backslash', 0.9)
+    + "\nthen {\"not\": {\"a\": \"step\"}}\n"
+    + step_json("second", 0.4)
+    + "\nFinal Answer: 42\n"
+)
+
+
+def feed_in_chunks(text: str, size: int) -> List[Step]:
+    parser = ThoughtStepParser(Step)
+    steps = []
+    for i in range(0, len(text), size):
+        steps.extend(parser.feed(text[i:i + size]))
+    steps.extend(parser.close())
+    return steps
+
+
+def test_parses_steps_and_counts_other_objects():
+    parser = ThoughtStepParser(Step)
+    steps = parser.parse(RESPONSE)
+    assert [step.thought for step in steps] == ['a "quoted" {brace} and \\ backslash', "second"]
+    assert [step.confidence for step in steps] == [0.9, 0.4]
+    assert parser.stats.objects == 3
+    assert parser.stats.steps == 2
+    assert parser.stats.invalid_steps == 1
+
+
+def test_any_chunking_gives_the_same_steps():
+    expected = parse_thought_steps(RESPONSE, Step)
+    for size in (1, 2, 3, 7, 64):
+        assert feed_in_chunks(RESPONSE, size) == expected
+
+
+def test_escape_split_across_chunks():
+    text = '{"thought": "a\\\\", "supporting_facts": [], "confidence": 1, "next_steps": []}'
+    split = text.index("\\") + 1
+    parser = ThoughtStepParser(Step)
+    assert parser.feed(text[:split]) == []
+    assert parser.pending
+    steps = parser.feed(text[split:])
+    assert [step.thought for step in steps] == ["a\\"]
+    assert not parser.pending
+
+
+def test_wrapper_object_with_steps_list():
+    steps = parse_thought_steps(json.dumps({"steps": [json.loads(step_json("one")), json.loads(step_json("two"))]}), Step)
+    assert [step.thought for step in steps] == ["one", "two"]
+
+
+def test_stray_brace_does_not_hide_later_steps():
+    parser = ThoughtStepParser(Step)
+    steps = parser.parse("a { stray brace\n" + step_json("kept"))
+    assert [step.thought for step in steps] == ["kept"]
+    assert parser.stats.unterminated == 1
+
+
+def test_decode_errors_are_counted():
+    parser = ThoughtStepParser(Step)
+    assert parser.parse("{not json}") == []
+    assert parser.stats.decode_errors == 1
+
+
+def test_numeric_string_confidence_is_converted():
+    steps = parse_thought_steps(step_json(confidence="0.85"), Step)
+    assert [step.confidence for step in steps] == [0.85]
+
+
+def test_invalid_confidences_are_rejected():
+    for confidence in ("high", True, None, [0.5]):
+        assert not validate_step(json.loads(step_json(confidence=confidence)))
+
+
+def test_large_object_in_small_chunks():
+    text = step_json("x" * 200_000)
+    steps = feed_in_chunks(text, 4)
+    assert len(steps) == 1
+    assert len(steps[0].thought) == 200_000
+
+
+def test_extract_final_answer():
+    assert extract_final_answer(RESPONSE) == "42"
+    assert extract_final_answer("no answer") == ""
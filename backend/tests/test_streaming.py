@@ -0,0 +1,82 @@
+import asyncio
+
+from backends import Backend, BackendPool
+from early_stop import EarlyStopPolicy
+from fake_openai import fake_client, steps_response
+from hedging import HedgePolicy
+from main import ChainOfThoughtReasoner
+from rate_limit import RateLimitScheduler
+
+TOKENS_PER_MINUTE = 6000
+
+
+def make_backend(name: str, content: str, **options) -> Backend:
+    return Backend(
+        name,
+        fake_client(content, **options),
+        f"{name}-deployment",
+        scheduler=RateLimitScheduler(tokens_per_minute=TOKENS_PER_MINUTE),
+    )
+
+
+def reserved(backend: Backend) -> float:
+    """Tokens still taken from the backend's budget; max_tokens alone is 2000."""
+    return TOKENS_PER_MINUTE - backend.scheduler.token_bucket.available
+
+
+async def collect(reasoner: ChainOfThoughtReasoner, question: str):
+    return [event async for event in reasoner.reason_stream(question)]
+
+
+def test_sse_stream_emits_steps_then_final_and_settles():
+    backend = make_backend("a", steps_response(steps=3))
+    reasoner = ChainOfThoughtReasoner(backends=BackendPool([backend]))
+    events = asyncio.run(collect(reasoner, "q"))
+
+    assert [kind for kind, _ in events] == ["step", "step", "step", "final"]
+    final = events[-1][1]
+    assert final["final_answer"] == "42"
+    assert final["metadata"]["finish_reason"] == "stop"
+    assert "early_stop" not in final["metadata"]
+    assert backend.client.chat.completions.streams[0].closed
+    assert reserved(backend) < 1000
+
+
+def test_sse_stream_is_cut_after_the_final_answer():
+    backend = make_backend("a", steps_response() + "Some explanation nobody asked for.")
+    reasoner = ChainOfThoughtReasoner(backends=BackendPool([backend]), early_stop=EarlyStopPolicy())
+    final = asyncio.run(collect(reasoner, "q"))[-1][1]
+
+    assert final["final_answer"] == "42"
+    assert final["metadata"]["finish_reason"] == "early_stop"
+    assert final["metadata"]["early_stop"]["upstream_finish_reason"] is None
+    assert backend.client.chat.completions.streams[0].closed
+    assert reserved(backend) < 1000
+
+
+def test_early_stop_without_trailing_content_reports_the_real_finish_reason():
+    backend = make_backend("a", steps_response())
+    reasoner = ChainOfThoughtReasoner(backends=BackendPool([backend]), early_stop=EarlyStopPolicy())
+    metadata = asyncio.run(collect(reasoner, "q"))[-1][1]["metadata"]
+
+    assert metadata["finish_reason"] == "stop"
+    assert not metadata["early_stop"]["stopped"]
+    assert metadata["early_stop"]["tokens_saved_upper_bound"] is None
+
+
+def test_hedged_completion_shares_the_stream_reader():
+    backends = [make_backend(name, steps_response() + "Trailing text.") for name in ("a", "b")]
+    reasoner = ChainOfThoughtReasoner(
+        backends=BackendPool(backends),
+        hedging=HedgePolicy(initial_delay=1.0),
+        early_stop=EarlyStopPolicy(),
+    )
+    chain = asyncio.run(reasoner.reason("q", use_cache=False))
+
+    assert [step.thought for step in chain.steps] == ["step 0", "step 1"]
+    assert chain.final_answer == "42"
+    assert chain.metadata["finish_reason"] == "early_stop"
+    assert chain.metadata["hedged"] is False
+    answered = next(b for b in backends if b.client.chat.completions.calls)
+    assert answered.client.chat.completions.streams[0].closed
+    assert all(reserved(b) < 1000 for b in backends)
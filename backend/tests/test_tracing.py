@@ -0,0 +1,45 @@
+import json
+import time
+
+import pytest
+
+from tracing import JsonFileExporter, NoopExporter, set_exporter, span
+
+
+@pytest.fixture
+def exporter(tmp_path):
+    exporter = JsonFileExporter(str(tmp_path / "traces.jsonl"), flush_interval=60.0, batch_size=4)
+    set_exporter(exporter)
+    yield exporter
+    set_exporter(NoopExporter())
+    exporter.close()
+
+
+def read_spans(exporter):
+    with open(exporter.path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_spans_are_queued_and_written_on_close(exporter):
+    with span("reason", deployment="gpt-4o"):
+        with pytest.raises(ValueError), span("upstream"):
+            raise ValueError("boom")
+    assert read_spans(exporter) == []
+
+    exporter.close()
+    child, parent = read_spans(exporter)
+    assert (child["name"], parent["name"]) == ("upstream", "reason")
+    assert child["parent_id"] == parent["span_id"]
+    assert child["trace_id"] == parent["trace_id"]
+    assert child["status"] == "error" and parent["status"] == "ok"
+    assert parent["attributes"] == {"deployment": "gpt-4o"}
+
+
+def test_a_full_batch_is_written_without_waiting_for_the_interval(exporter):
+    for n in range(4):
+        with span(f"span {n}"):
+            pass
+    deadline = time.monotonic() + 5.0
+    while len(read_spans(exporter)) < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [record["name"] for record in read_spans(exporter)] == [f"span {n}" for n in range(4)]
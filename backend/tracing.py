@@ -0,0 +1,202 @@
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Optional
+
+
+class Span:
+    """A timed operation with attributes; child spans started inside it share its trace id."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_time", "duration", "attributes", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start_time = time.time()
+        self.duration: Optional[float] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": self.duration * 1000 if self.duration is not None else None,
+            "attributes": self.attributes,
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span while tracing is off, so call sites never check."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class NoopExporter:
+    """Drops every span; with it installed ``span`` does no timing or allocation."""
+
+    enabled = False
+
+    def export(self, span: Span) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class JsonFileExporter:
+    """
+    Appends finished spans to a file as JSON lines. ``export`` only queues
+    the span; a background thread serializes and writes the queue every
+    ``flush_interval`` seconds, or sooner once ``batch_size`` spans wait, so
+    request handlers never block on the file. Past ``max_queued`` spans the
+    oldest are dropped and counted in ``dropped``.
+    """
+
+    enabled = True
+
+    def __init__(self, path: str, flush_interval: float = 1.0, batch_size: int = 512, max_queued: int = 100_000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._file = open(path, "a", encoding="utf-8")
+        self._queue: Deque[Dict[str, Any]] = deque(maxlen=max_queued)
+        self._wakeup = threading.Condition()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="trace-exporter", daemon=True)
+        self._writer.start()
+
+    def export(self, span: Span) -> None:
+        record = span.to_dict()
+        with self._wakeup:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(record)
+            if len(self._queue) >= self.batch_size:
+                self._wakeup.notify()
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._wakeup:
+                if not self._closed and len(self._queue) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+                records = list(self._queue)
+                self._queue.clear()
+                closed = self._closed
+            if records:
+                self._file.write("".join(json.dumps(record, default=str) + "\n" for record in records))
+                self._file.flush()
+            if closed:
+                return
+
+    def close(self) -> None:
+        """Write the queued spans and close the file."""
+        with self._wakeup:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify()
+        self._writer.join()
+        self._file.close()
+
+
+def load_exporter(name: Optional[str] = None, path: Optional[str] = None):
+    """Build an exporter from TRACE_EXPORTER ("none" or "json") and TRACE_FILE."""
+    name = (name if name is not None else os.getenv("TRACE_EXPORTER", "none")).lower()
+    if name in ("", "none", "noop"):
+        return NoopExporter()
+    if name == "json":
+        return JsonFileExporter(path or os.getenv("TRACE_FILE", "traces.jsonl"))
+    raise ValueError(f"Unknown trace exporter: {name}")
+
+
+_exporter = NoopExporter()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def set_exporter(exporter) -> None:
+    """Install the exporter every span is sent to."""
+    global _exporter
+    _exporter = exporter
+
+
+def get_exporter():
+    return _exporter
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """
+    Trace the enclosed block as a child of the current span. Works across
+    awaits, since the current span lives in a contextvar. Exceptions are
+    recorded on the span and re-raised.
+    """
+    exporter = _exporter
+    if not exporter.enabled:
+        yield _NOOP_SPAN
+        return
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        _current_span.reset(token)
+        exporter.export(current)
+
+
+class TracingMiddleware:
+    """ASGI middleware that wraps every HTTP request in a root span."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with span("http.request", method=scope["method"], path=scope["path"]) as request_span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    request_span.set_attribute("status", message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+            route = scope.get("route")
+            if route is not None:
+                request_span.set_attribute("route", getattr(route, "path", None))